@@ -7,6 +7,7 @@ setup(
        'sondra.auth',
        'sondra.commands',
        'sondra.application',
+       'sondra.client',
        'sondra.collection',
        'sondra.document',
        'sondra.suite',
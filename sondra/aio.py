@@ -0,0 +1,173 @@
+"""asyncio support for RethinkDB queries.
+
+The asyncio flavor of the RethinkDB driver multiplexes queries over a connection: many queries can be in flight on
+one connection at once, and each is answered as soon as the server is done with it. An :class:`AsyncConnectionPool`
+therefore shares a small number of connections between all coroutines instead of checking them out, and lets many
+thousands of queries wait on the server without a thread apiece::
+
+    doc = await coll.aget(key)
+    async for doc in coll.query.filter({'owner': user}).aiter():
+        ...
+    await coll.asave(docs)
+
+An async pool belongs to the event loop it is first used on. It needs the asyncio flavor of the driver, which ships
+with rethinkdb 2.3 and later.
+"""
+import asyncio
+import logging
+
+from rethinkdb import net
+
+try:
+    from rethinkdb.asyncio_net.net_asyncio import Connection as AsyncioConnection
+except ImportError:
+    AsyncioConnection = None
+    logging.warning("The RethinkDB driver has no asyncio support. Async queries will not be supported.")
+
+
+async def in_thread(suite, fn, *args, executor=None, **kwargs):
+    """Run blocking work in an executor thread, giving the thread's pooled connections back when it is done.
+
+    Args:
+        suite (Suite): The suite whose connections the work uses.
+        fn (callable): The blocking function.
+        *args: Passed to ``fn``
+        executor (concurrent.futures.Executor): Defaults to the event loop's default executor.
+        **kwargs: Passed to ``fn``
+
+    Returns:
+        The return value of ``fn``.
+    """
+    def run():
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            suite.release_connections()
+
+    return await asyncio.get_event_loop().run_in_executor(executor, run)
+
+
+class AsyncConnectionPool(object):
+    """A pool of asyncio RethinkDB connections shared by all coroutines.
+
+    Connections are opened on first use, and reopened if they are found closed. Queries are spread over the
+    connections in turn.
+
+    Args:
+        name (str): The name of the connection in the suite's ``connection_config``.
+        size (int=4): The number of connections to open.
+        max_in_flight (int=10000): The most queries that will be waiting on the server at once. Further queries wait
+            for one of these to finish before they are sent.
+        **connect_kwargs: Passed to ``rethinkdb.connect``
+    """
+    def __init__(self, name, size=4, max_in_flight=10000, **connect_kwargs):
+        self.name = name
+        self.size = max(size, 1)
+        self.max_in_flight = max_in_flight
+        self.connect_kwargs = connect_kwargs
+        self.log = logging.getLogger(self.__class__.__name__ + '.' + name)
+
+        self._connections = [None] * self.size
+        self._next = 0
+        self._locks = None
+        self._in_flight = None
+
+    def _ensure_primitives(self):
+        if self._locks is None:
+            self._locks = [asyncio.Lock() for _ in range(self.size)]
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+
+    async def connection(self):
+        """The next connection in turn, opening or reopening it as needed.
+
+        The connection is shared, so it must not be closed by the caller.
+        """
+        if AsyncioConnection is None:
+            raise ImportError("Async queries need rethinkdb 2.3 or later, which has asyncio support")
+
+        self._ensure_primitives()
+        i = self._next
+        self._next = (i + 1) % self.size
+
+        conn = self._connections[i]
+        if conn is not None and conn.is_open():
+            return conn
+
+        async with self._locks[i]:
+            conn = self._connections[i]
+            if conn is None:
+                conn = await net.make_connection(AsyncioConnection, **self.connect_kwargs)
+            elif not conn.is_open():
+                self.log.warning("Connection '{0}' was closed. Reconnecting.".format(self.name))
+                conn = await conn.reconnect(noreply_wait=False)
+            self._connections[i] = conn
+        return conn
+
+    async def run(self, query, **kwargs):
+        """Run a query on the pool.
+
+        Args:
+            query (ReQL): The query.
+            **kwargs: Passed to ``query.run``
+
+        Returns:
+            The result of the query. Sequences are returned as an asyncio cursor.
+        """
+        self._ensure_primitives()
+        async with self._in_flight:
+            conn = await self.connection()
+            return await query.run(conn, **kwargs)
+
+    async def close(self):
+        """Close every open connection in the pool."""
+        connections, self._connections = self._connections, [None] * self.size
+        for conn in connections:
+            if conn is not None and conn.is_open():
+                await conn.close(noreply_wait=False)
+
+
+class AsyncDocumentIterator(object):
+    """Iterate asynchronously over the documents a query returns. See :meth:`sondra.collection.Collection.aq`.
+
+    The query is run when iteration starts. If iteration is abandoned early, call :meth:`close` to release the
+    server-side cursor.
+    """
+    def __init__(self, coll, query):
+        self.coll = coll
+        self.query = query
+        self._cursor = None
+        self._results = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            doc = await self._next_raw()
+            if not self.coll.expired(doc):
+                return self.coll._from_db(doc)
+
+    async def _next_raw(self):
+        if self._cursor is None and self._results is None:
+            result = await self.coll.async_read_pool.run(self.query)
+            if isinstance(result, net.Cursor):
+                self._cursor = result
+            else:
+                self._results = iter(result if isinstance(result, list) else [result])
+
+        if self._cursor is not None:
+            if not await self._cursor.fetch_next():
+                raise StopAsyncIteration
+            doc = await self._cursor.next()
+        else:
+            try:
+                doc = next(self._results)
+            except StopIteration:
+                raise StopAsyncIteration
+
+        return doc
+
+    async def close(self):
+        if self._cursor is not None:
+            await self._cursor.close()
+            self._cursor = None
@@ -8,7 +8,9 @@ from sondra.api.query_set import QuerySet
 from sondra.api.ref import Reference
 
 from sondra import formatters
+from sondra.aio import in_thread
 from sondra.api.expose import method_schema
+from sondra.collection import operators
 from sondra.exceptions import ValidationError
 
 
@@ -21,7 +23,9 @@ class APIRequest(object):
         'json': formatters.JSON(),
         'html': formatters.HTML(),
         'schema': formatters.Schema(),
-        'geojson': formatters.GeoJSON()
+        'geojson': formatters.GeoJSON(),
+        'changes': formatters.ServerSentEvents(),
+        'sync': formatters.JSON(),
     }
     DEFAULT_FORMAT = 'json'
 
@@ -62,6 +66,7 @@ class APIRequest(object):
         self.formatter_kwargs = {}
         self.query = None
         self.additional_filters = []
+        self.document_authorizers = []
 
         self.reference = Reference(
             self.suite,
@@ -110,17 +115,64 @@ class APIRequest(object):
             },
         }
 
-        if kind in decision_tree:
+        if format == 'changes':
+            return self.formats[format](self.reference, self.get_changes(), **self.formatter_kwargs)
+        elif format == 'sync':
+            return self.formats[format](self.reference, self.get_sync(), **self.formatter_kwargs)
+        elif kind in decision_tree:
             action = decision_tree[kind][method]
             return self.formats[format](self.reference, action(), **self.formatter_kwargs)
         else:
             return self.formats[format](self.reference, self.reference.value, **self.formatter_kwargs)
 
 
+    async def acall(self, executor=None):
+        """Execute the request without blocking the event loop.
+
+        Collection listings and creates, and document reads and deletes, run their queries on the asyncio connection
+        pool. Every other request, and the formatting of results, runs in a thread of ``executor``.
+
+        Args:
+            executor (concurrent.futures.Executor): Where to run blocking work. Defaults to the event loop's default
+                executor.
+
+        Returns:
+            A tuple of mimetype and response, as returned by the formatter.
+        """
+        kind = self.reference.kind
+        format = self.reference.format
+        decision_tree = {
+            'collection': {
+                'GET': self.aget_collection_items,
+                'POST': self.aadd_collection_items,
+            },
+            'document': {
+                'GET': self.aget_document,
+                'DELETE': self.adelete_document,
+            },
+        }
+
+        if format == 'changes':
+            bare_keys = bool(self.formatter_kwargs.get('bare_keys', False))
+            return 'text/event-stream', self.formats[format].astream(self.get_changes(), bare_keys)
+
+        action = decision_tree.get(kind, {}).get(self.request_method)
+        if action is None or format in {'help', 'schema', 'sync'}:
+            return await self.in_thread(self, executor=executor)
+        else:
+            result = await action()
+            return await self.in_thread(self.formats[format], self.reference, result, executor=executor,
+                                        **self.formatter_kwargs)
+
+    async def in_thread(self, fn, *args, executor=None, **kwargs):
+        """Run blocking work in an executor thread. See :func:`sondra.aio.in_thread`."""
+        return await in_thread(self.suite, fn, *args, executor=executor, **kwargs)
+
     def _parse_query(self):
         self.formatter_kwargs = self.reference.kwargs
         if 'format' in self.formatter_kwargs:
             del self.formatter_kwargs['format']
+        self.read_mode = self.formatter_kwargs.pop('read_mode', None)
 
         self.objects = []
 
@@ -174,12 +226,16 @@ class APIRequest(object):
         self.return_changes = self.api_arguments.get('return_changes', 'false').lower() != 'false'
         self.dereference = self.api_arguments.get('dereference', 'false').lower() != 'false'
         self.delete_all = self.api_arguments.get('delete_all', 'false').lower() != 'false'
+        self.update_all = self.api_arguments.get('update_all', 'false').lower() != 'false'
         self.conflict = self.api_arguments.get('conflict', {
             'POST': "error",
             'PUT': "replace",
             'PATCH': "replace"
         }.get(self.request_method, 'error'))
 
+        if self.read_mode and self.request_method != 'GET':
+            raise ValidationError("read_mode only applies to GET requests")
+
     def validate(self):
         target = self.reference.value
 
@@ -195,7 +251,7 @@ class APIRequest(object):
                 if not isinstance(object, str):
                     jsonschema.validate(object, schema)
         else:
-            pass  # TODO validate individual keys
+            pass  # patched values are validated against their own property schemas by Collection.patch
 
     def method_call(self):
         instance, method = self.reference.value
@@ -223,24 +279,62 @@ class APIRequest(object):
 
         return ret
 
+    def authorize_documents(self, docs):
+        """Keep only the documents that every function in ``document_authorizers`` allows.
+
+        Request processors add these functions to check a listing in one batch rather than a document at a time.
+        Each is called with a list of documents and returns the list of those allowed.
+        """
+        for authorize in self.document_authorizers:
+            if not docs:
+                break
+            docs = list(authorize(docs))
+        return docs
+
+    def _check_raw_results_allowed(self):
+        if self.document_authorizers:
+            raise PermissionError("Aggregations are not allowed on {0}, as access is checked per document.".format(
+                self.reference.url))
+
     def get_collection_items(self):
         coll = self.reference.get_collection()
         if self.reference.format in {'schema', 'help'}:
             return coll
 
-        qs = QuerySet(coll)
-        q = qs.get_query(self.api_arguments, self.objects)
-        for f in self.additional_filters:
-            q = q.filter(f)
+        qs = QuerySet(coll, coll.read_table(self.read_mode))
+        q = qs.get_query(self.api_arguments, self.objects, self.additional_filters)
 
         if qs.use_raw_results:
-            results = q.run(coll.application.connection)
+            self._check_raw_results_allowed()
+            results = q.run(coll.read_connection)
             try:
                 return [x for x in results]
             except:
                 return {"_": results}
         else:
-            return [x for x in coll.q(q)]
+            return self.authorize_documents([x for x in coll.q(q)])
+
+    async def aget_collection_items(self):
+        coll = self.reference.get_collection()
+        qs = QuerySet(coll, coll.read_table(self.read_mode))
+        q = qs.get_query(self.api_arguments, self.objects, self.additional_filters)
+
+        if qs.use_raw_results:
+            self._check_raw_results_allowed()
+            results = await coll.async_read_pool.run(q)
+            if isinstance(results, dict):
+                return {"_": results}
+            elif isinstance(results, list):
+                return results
+            elif hasattr(results, 'fetch_next'):
+                ret = []
+                while await results.fetch_next():
+                    ret.append(await results.next())
+                return ret
+            else:
+                return {"_": results}
+        else:
+            return self.authorize_documents([x async for x in coll.aq(q)])
 
     def add_collection_items(self):
         coll = self.reference.get_collection()
@@ -250,17 +344,47 @@ class APIRequest(object):
 
     def update_collection_items(self):
         coll = self.reference.get_collection()
-        docs = []
-        for k, updates in self.objects:
-            doc = coll[k]
-            for prop, value in updates.items():
-                doc[prop] = value
+        if not any(coll.primary_key in obj for obj in self.objects):
+            return self.update_filtered_collection_items()
+        if not all(coll.primary_key in obj for obj in self.objects):
+            raise ValidationError("Every object in an update must have a {0}, or none of them".format(
+                coll.primary_key))
 
-            docs.append(doc)
+        updates = {}
+        for obj in self.objects:
+            updates.setdefault(obj[coll.primary_key], {}).update(self._patch_updates(obj))
+
+        if any(isinstance(v, operators.FieldOperator) for u in updates.values() for v in u.values()):
+            return coll.patch_many(updates, durability=self.durability, return_changes=self.return_changes)
+
+        docs = coll.get_many(list(updates.keys()))
+        for doc in docs:
+            for prop, value in updates[doc.id].items():
+                doc[prop] = value
 
         ret = coll.save(docs, conflict=self.conflict, durability=self.durability, return_changes=self.return_changes)
         return ret
 
+    def update_filtered_collection_items(self):
+        coll = self.reference.get_collection()
+        updates = {}
+        for obj in self.objects:
+            updates.update(self._patch_updates(obj))
+
+        qs = QuerySet(coll)
+        q = qs.get_query(self.api_arguments, filters=self.additional_filters)
+
+        if not self.update_all and not qs.is_restricted(self.api_arguments):
+            raise PermissionError("Cannot update all collection items without a specific request.")
+
+        return coll.patch_query(q, updates, durability=self.durability, return_changes=self.return_changes)
+
+    async def aadd_collection_items(self):
+        coll = self.reference.get_collection()
+        docs = [coll.doc(obj) for obj in self.objects]
+        await coll.asave(docs, conflict="error")
+        return [v.id for v in docs]
+
     def replace_collection_items(self):
         coll = self.reference.get_collection()
         docs = []
@@ -276,22 +400,68 @@ class APIRequest(object):
         coll = self.reference.get_collection()
 
         qs = QuerySet(coll)
-        q = qs.get_query(self.api_arguments, self.objects)
-        for f in self.additional_filters:
-            q = q.filter(f)
+        q = qs.get_query(self.api_arguments, self.objects, self.additional_filters)
 
-        print("Delete collection items")
-        print(q)
         if not self.delete_all and not qs.is_restricted(self.api_arguments, self.objects):
             raise PermissionError("Cannot delete all collection items without a specific request.")
 
-        print([x for x in q.run(coll.application.connection)])
-        return q.delete(durability=self.durability, return_changes=self.return_changes).run(coll.application.connection)
+        return coll.delete_query(q, durability=self.durability, return_changes=self.return_changes)
+
+    def get_changes(self):
+        """Open a changefeed on the collection or document, filtered as a GET of the same URL would be.
+
+        The feed starts with the current results if ``include_initial`` is set or the client is resuming with a
+        ``Last-Event-ID`` header. ``squash`` is passed through to the changefeed. Documents are checked with
+        ``document_authorizers`` as they change, so a document the client may not see is never streamed.
+        """
+        if self.request_method != 'GET' or self.reference.kind not in {'collection', 'document'}:
+            raise ValidationError("Changes can only be requested with a GET of a collection or document")
+
+        coll = self.reference.get_collection()
+        if self.reference.kind == 'document':
+            q = coll.read_table(self.read_mode).get(self.reference.doc)
+        else:
+            qs = QuerySet(coll, coll.read_table(self.read_mode))
+            q = qs.get_changes_query(self.api_arguments, self.objects, self.additional_filters)
+
+        resuming = bool(self.headers and self.headers.get('Last-Event-ID'))
+        include_initial = resuming or str(self.api_arguments.get('include_initial', 'false')).lower() != 'false'
+        squash = self.api_arguments.get('squash', False)
+        if isinstance(squash, str):
+            squash = squash.lower() != 'false'
+
+        return coll.changes(q, include_initial=include_initial, squash=squash,
+                            authorize=self.authorize_documents if self.document_authorizers else None)
+
+    def get_sync(self):
+        """Get what changed in the collection since the checkpoint in ``since``, limited to what a GET of the
+        collection would return. See :meth:`sondra.collection.Collection.sync`
+        """
+        if self.request_method != 'GET' or self.reference.kind != 'collection':
+            raise ValidationError("Sync can only be requested with a GET of a collection")
+
+        coll = self.reference.get_collection()
+        if not coll.sync_field:
+            raise ValidationError("{0} does not support sync".format(coll.url))
+
+        limit = self.api_arguments.get('limit', None)
+        if limit is not None:
+            limit = min(int(limit), coll.sync_page_size)
+
+        return coll.sync(since=self.api_arguments.get('since', None), limit=limit, filters=self.additional_filters,
+                         authorize=self.authorize_documents if self.document_authorizers else None)
 
     def get_document(self):
+        if self.read_mode and self.reference.doc != '*':
+            return self.reference.get_collection().get_many([self.reference.doc], read_mode=self.read_mode)[0]
         doc = self.reference.get_document()
         return doc
 
+    async def aget_document(self):
+        if self.reference.doc == '*':
+            return None
+        return await self.reference.get_collection().aget(self.reference.doc, read_mode=self.read_mode)
+
     def set_document(self):
         doc = self.reference.get_document()
         id = doc.id
@@ -301,20 +471,44 @@ class APIRequest(object):
         return ret
 
     def update_document(self):
-        doc = self.reference.get_document()
         coll = self.reference.get_collection()
+        updates = {}
         for obj in self.objects:
-            if coll.primary_key in obj:
-                del obj[coll.primary_key]
-            for k, v in obj.items():
-                doc[k] = v
-        ret = doc.save(conflict='replace', durability=self.durability, return_changes=self.return_changes)
+            updates.update(self._patch_updates(obj))
+
+        doc = coll.patch(self.reference.doc, updates, durability=self.durability)
+        return self._merge_write_results([doc.metadata])
+
+    @staticmethod
+    def _patch_updates(obj):
+        """Merge the atomic operators in a PATCH object's ``__ops`` into its plain updates."""
+        updates = {k: v for k, v in obj.items() if k != '__ops'}
+        for k, spec in obj.get('__ops', {}).items():
+            updates[k] = operators.from_json(spec)
+        return updates
+
+    def _merge_write_results(self, results):
+        ret = {}
+        for result in results:
+            for k, v in result.items():
+                if k == 'changes':
+                    if self.return_changes:
+                        ret.setdefault('changes', []).extend(v)
+                elif isinstance(v, int):
+                    ret[k] = ret.get(k, 0) + v
+                elif k not in ret:
+                    ret[k] = v
         return ret
 
     def delete_document(self):
         doc = self.reference.get_document()
         return doc.delete(durability=self.durability, return_changes=self.return_changes)
 
+    async def adelete_document(self):
+        coll = self.reference.get_collection()
+        doc = await coll.aget(self.reference.doc)
+        return await coll.adelete(doc, durability=self.durability, return_changes=self.return_changes)
+
     def schema(self):
         return self.reference.schema
 
@@ -3,6 +3,45 @@ import rethinkdb as r
 
 from sondra.exceptions import ValidationError
 
+
+class IndexFilter(object):
+    """A filter that a secondary index can satisfy, such as "documents owned by this user".
+
+    Wherever it cannot use the index, its :meth:`predicate` is used as an ordinary filter. Given to
+    :meth:`QuerySet.get_query`, it becomes a ``get_all`` on the index instead, when the query has not already selected
+    from the table some other way, so the database reads only the matching documents instead of scanning the table.
+
+    Args:
+        index (str): The name of the secondary index.
+        *values: Documents match if their indexed value is any of these.
+        multi (bool=False): The indexed field is an array, as with a multi index. Documents match if it contains
+            any of the values.
+    """
+    def __init__(self, index, *values, multi=False):
+        self.index = index
+        self.values = values
+        self.multi = multi
+
+    @property
+    def predicate(self):
+        """The filter as a ReQL predicate on a document."""
+        index, values = self.index, list(self.values)
+        if self.multi:
+            return lambda doc: doc[index].default([]).contains(lambda v: r.expr(values).contains(v))
+        return lambda doc: r.expr(values).contains(doc[index].default(None))
+
+    @property
+    def can_select(self):
+        """False if a document could be read more than once by :meth:`select`."""
+        return not (self.multi and len(self.values) > 1)
+
+    def select(self, table):
+        return table.get_all(*self.values, index=self.index)
+
+    def __repr__(self):
+        return "IndexFilter({0!r}, {1})".format(self.index, ", ".join(repr(v) for v in self.values))
+
+
 class QuerySet(object):
     """
     Limit the objects we are targeting in an API request
@@ -30,8 +69,9 @@ class QuerySet(object):
         'get_nearest',
     }
 
-    def __init__(self, coll):
+    def __init__(self, coll, table=None):
         self.coll = coll
+        self.table = coll.table if table is None else table
         self.use_raw_results = False
 
     def is_restricted(self, api_arguments, objects=None):
@@ -44,24 +84,48 @@ class QuerySet(object):
         """
         return objects or api_arguments.get('flt', None) or api_arguments.get('geo', None)
 
-    def get_query(self, api_arguments, objects=None):
+    def get_query(self, api_arguments, objects=None, filters=()):
         """
         Apply all filters in turn and return a ReQL query.
 
         :param api_arguments: flt, geo, agg, start, end, limit filters
         :param objects: A list of object IDs.
+        :param filters: Extra filters, such as those added by authorization. They are applied before aggregation
+            and limits. The first :class:`IndexFilter` selects from its index, if the query allows it.
         :return:
         """
-        q = self.coll.table
+        q = self.table
 
         q = self._handle_keys(api_arguments, q)
+        q, filters = self._select_by_index(api_arguments, q, filters)
         q = self._handle_simple_filters(api_arguments, q)
         q = self._handle_spatial_filters(self.coll, api_arguments, q)
         q = self._apply_ordering(api_arguments, q)
+        q = self._handle_additional_filters(q, filters)
         q = self._handle_aggregations(api_arguments, q)
         q = self._handle_limits(api_arguments, q)
         return q
 
+    def get_changes_query(self, api_arguments, objects=None, filters=()):
+        """
+        Apply the filters that can be used with a changefeed and return a ReQL query.
+
+        :param api_arguments: keys and flt filters
+        :param objects: A list of object IDs.
+        :param filters: Extra filters. See :meth:`get_query`
+        :return:
+        """
+        unsupported = {'geo', 'agg', 'order_by', 'order_by_index', 'start', 'end', 'limit'}.intersection(api_arguments)
+        if unsupported:
+            raise ValidationError("Cannot use {0} with a changefeed".format(', '.join(sorted(unsupported))))
+
+        q = self.table
+        q = self._handle_keys(api_arguments, q)
+        q, filters = self._select_by_index(api_arguments, q, filters, ordered=False)
+        q = self._handle_simple_filters(api_arguments, q)
+        q = self._handle_additional_filters(q, filters)
+        return q
+
     def __call__(self, api_arguments, objects=None):
         q = self.get_query(api_arguments, objects)
         return self.coll.q(q)
@@ -83,11 +147,34 @@ class QuerySet(object):
     def _handle_keys(self, api_arguments, q):
         if 'keys' in api_arguments:
             if 'index' in api_arguments:
-                q = self.coll.table.get_all(*json.loads(api_arguments['keys']), index=api_arguments['index'])
+                q = self.table.get_all(*json.loads(api_arguments['keys']), index=api_arguments['index'])
             else:
-                q = self.coll.table.get_all(*json.loads(api_arguments['keys']))
+                q = self.table.get_all(*json.loads(api_arguments['keys']))
         return q
 
+    def _can_select_by_index(self, api_arguments, ordered=True):
+        # get_all returns a selection that cannot be read again by another index
+        if {'keys', 'geo'}.intersection(api_arguments):
+            return False
+        if ordered and ('order_by_index' in api_arguments or ('order_by' not in api_arguments and self.coll.order_by_index)):
+            return False
+        return True
+
+    def _select_by_index(self, api_arguments, q, filters, ordered=True):
+        """Read from the index of the first IndexFilter, if the query allows it. Returns the query and the filters
+        left to apply."""
+        filters = list(filters)
+        if self._can_select_by_index(api_arguments, ordered):
+            selector = next((f for f in filters if isinstance(f, IndexFilter) and f.can_select), None)
+            if selector is not None:
+                q = selector.select(self.table)
+                filters.remove(selector)
+        return q, filters
+
+    def _handle_additional_filters(self, q, filters):
+        for f in filters:
+            q = q.filter(getattr(f, 'predicate', f))
+        return q
 
     def _handle_simple_filters(self, api_arguments, q):
         # handle simple filters
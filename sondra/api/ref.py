@@ -15,7 +15,7 @@ class EndpointError(Exception):
 
 class Reference(object):
     """Contains the application, collection, document, methods, and fragment the URL refers to"""
-    FORMATS = {'help', 'schema', 'json', 'geojson', 'html'}
+    FORMATS = {'help', 'schema', 'json', 'geojson', 'html', 'changes', 'sync'}
 
     def __str__(self):
         return self.url
@@ -2,6 +2,10 @@ class RequestProcessor(object):
     """
     Request Processors are arbitrary thunks run before the request is executed. For an example, see the auth application.
     """
+    def setup(self, suite):
+        """Prepare to process the requests of a suite. Called once, after its applications are created."""
+        pass
+
     def process_api_request(self, r):
         return r
 
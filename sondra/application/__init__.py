@@ -73,7 +73,12 @@ class Application(Mapping, metaclass=ApplicationMetaclass):
 
     Attributes:
         db (str): The name of a RethinkDB database
-        connection (str): The name of a RethinkDB connection in the application's suite
+        connection (str): The name of a RethinkDB connection in the application's suite. After init, the write
+          connection itself.
+        read_connection (str): The name of the connection collections read from by default, e.g. one to a secondary
+          replica. Defaults to ``connection``. After init, the connection itself.
+        write_connection (str): The name of the connection collections write to by default. Defaults to
+          ``connection``. After init, the connection itself.
         slug (str): read-only. The name of this application class, slugified (all lowercase, and separate words with -)
         anonymous_reads (bool=True): Override this attribute in your subclass if you want to disable anonymous queries
           for help and schema for this application and all its collections.
@@ -92,6 +97,8 @@ class Application(Mapping, metaclass=ApplicationMetaclass):
     """
     db = 'default'
     connection = 'default'
+    read_connection = None
+    write_connection = None
     title = None
     slug = None
     collections = ()
@@ -111,6 +118,11 @@ class Application(Mapping, metaclass=ApplicationMetaclass):
     def schema_url(self):
         return self.url + ";schema"
 
+    @property
+    def async_pool(self):
+        """The suite's asyncio connection pool for this application's write connection."""
+        return self.suite.async_connection_pool(self.write_connection_name)
+
     @property
     def schema(self):
         ret = {
@@ -192,7 +204,12 @@ class Application(Mapping, metaclass=ApplicationMetaclass):
             self.db = suite.db_prefix + utils.convert_camelcase(self.name)
         else:
             self.db = utils.convert_camelcase(self.name)
-        self.connection = suite.connections[self.connection]
+        self.connection_name = self.connection
+        self.read_connection_name = self.read_connection or self.connection_name
+        self.write_connection_name = self.write_connection or self.connection_name
+        self.connection = suite.connections[self.write_connection_name]
+        self.read_connection = suite.connections[self.read_connection_name]
+        self.write_connection = self.connection
         self._collections = {}
         self._url = '/'.join((self.suite.url, self.slug))
         self.log = logging.getLogger(self.name)
@@ -226,6 +243,11 @@ class Application(Mapping, metaclass=ApplicationMetaclass):
                     coll.schema['definitions'][k] = v
 
             coll.document_class.specials = SchemaParser(coll.schema, coll.schema['definitions'])()
+            coll.foreign_keys = coll.find_foreign_keys()
+            for prop, (fk, multi) in coll.foreign_keys.items():
+                self.suite.register_relation(fk.app, fk.coll, coll, prop)
+            if coll.sync_field:
+                coll.prepare_sync()
 
             self._collections[name] = coll
         signals.post_init.send(self.__class__, instance=self)
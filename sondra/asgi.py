@@ -0,0 +1,228 @@
+"""ASGI entry point for a Sondra suite.
+
+Exposes the same URL space as the Flask blueprint in :mod:`sondra.flask`, without tying up a worker thread per
+request. Queries that :meth:`sondra.api.APIRequest.acall` can make on the asyncio driver are awaited on the event
+loop; request processors, method calls and formatting run in an executor. Responses are streamed.
+
+Mount the app under the path of ``suite.url`` with any ASGI server::
+
+    app = ASGIApplication(MySuite())
+
+Multipart file uploads are not supported; use the Flask blueprint for those.
+"""
+import json
+import sys
+import traceback
+from urllib.parse import urlparse, parse_qsl
+
+from jsonschema import ValidationError
+
+from sondra.aio import in_thread
+from sondra.api import APIRequest
+from sondra.api.ref import EndpointError
+from sondra.exceptions import ValidationError as SondraValidationError
+from sondra.utils import etag
+
+
+class Headers(dict):
+    """Request headers, looked up case-insensitively."""
+    def __init__(self, raw):
+        super(Headers, self).__init__()
+        for k, v in raw:
+            super(Headers, self).__setitem__(k.decode('latin-1').lower(), v.decode('latin-1'))
+
+    def __getitem__(self, key):
+        return super(Headers, self).__getitem__(key.lower())
+
+    def __contains__(self, key):
+        return super(Headers, self).__contains__(key.lower())
+
+    def get(self, key, default=None):
+        return super(Headers, self).get(key.lower(), default)
+
+
+class ASGIApplication(object):
+    """An ASGI application serving a suite's API.
+
+    Args:
+        suite (Suite): The suite to serve.
+        prefix (str): The path the API is mounted on. Defaults to the path of ``suite.url``.
+        executor (concurrent.futures.Executor): Where to run blocking work. Defaults to the event loop's default
+            executor.
+        chunk_size (int=65536): The size of the body chunks responses are streamed in.
+    """
+    def __init__(self, suite, prefix=None, executor=None, chunk_size=65536):
+        self.suite = suite
+        self.suite.setup_request_processors()
+        self.prefix = (urlparse(suite.url).path if prefix is None else prefix).rstrip('/')
+        self.executor = executor
+        self.chunk_size = chunk_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError("Unsupported ASGI scope type: {0}".format(scope['type']))
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.suite.close_async_connections()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        method = scope['method'].upper()
+        path = scope['path']
+        headers = Headers(scope.get('headers', []))
+
+        if not path.startswith(self.prefix):
+            return await self.respond(send, 404, 'application/json', json.dumps({"err": "NotFound", "reason": path}))
+        path = path[len(self.prefix):]
+
+        if method == 'OPTIONS' and self.suite.cross_origin:
+            return await self.respond(send, 200, 'text/plain', '', extra_headers=[
+                (b'access-control-allow-methods', b'GET, POST, PUT, PATCH, DELETE'),
+                (b'access-control-allow-headers', headers.get('access-control-request-headers', '*').encode()),
+            ])
+        if method == 'HEAD':
+            return await self.respond(send, 200, 'text/plain', '')
+
+        if path in {'/schema', ';schema', ';format=schema'}:
+            return await self.respond_schema(send, headers, 'application/json', json.dumps(self.suite.schema, indent=4))
+        if path in {'/help', ';help', ';format=help'}:
+            help_text = await in_thread(self.suite, lambda: self.suite.docstring_processor(self.suite.help()),
+                                        executor=self.executor)
+            return await self.respond(send, 200, 'text/html', help_text)
+        if not path.startswith('/'):
+            return await self.respond(send, 404, 'application/json', json.dumps({"err": "NotFound", "reason": path}))
+
+        body = await self.read_body(receive, getattr(self.suite, 'max_content_length', None))
+        if body is None:
+            return await self.respond(send, 413, 'application/json', json.dumps({
+                "err": "RequestEntityTooLarge",
+                "reason": "Request body is larger than {0} bytes".format(self.suite.max_content_length)}))
+
+        args = {}
+        for k, v in parse_qsl(scope.get('query_string', b'').decode('utf-8'), keep_blank_values=True):
+            args.setdefault(k, v)
+        if headers.get('content-type', '').startswith('application/x-www-form-urlencoded'):
+            for k, v in parse_qsl(body.decode('utf-8'), keep_blank_values=True):
+                args.setdefault(k, v)
+            body = b''
+
+        req = None
+        try:
+            req = await in_thread(self.suite, self.prepare, headers, body, method, self.suite.url + path, args,
+                                  executor=self.executor)
+            mimetype, response = await req.acall(executor=self.executor)
+            if req.reference.format == 'schema' and method == 'GET':
+                return await self.respond_schema(send, headers, mimetype, response)
+            return await self.respond(send, 200, mimetype, response)
+
+        except PermissionError as denial:
+            return await self.respond(send, 403, *self.format_error(req, "PermissionDenied", denial))
+
+        except (KeyError, EndpointError) as not_found:
+            return await self.respond(send, 404, *self.format_error(req, "NotFound", not_found))
+
+        except (ValidationError, SondraValidationError) as invalid_entry:
+            return await self.respond(send, 400, *self.format_error(req, "InvalidRequest", invalid_entry))
+
+        except Exception as error:
+            return await self.respond(send, 500, *self.format_error(req, "ServerError", error))
+
+    def prepare(self, headers, body, method, url, args):
+        """Build the APIRequest, run the suite's request processors over it, and validate it. Blocking."""
+        r = APIRequest(self.suite, headers, body, method, url, args, {})
+        try:
+            for p in self.suite.api_request_processors:
+                r = p(r)
+        except Exception as e:
+            for p in self.suite.api_request_processors:
+                p.cleanup_after_exception(r, e)
+            raise e
+
+        r.validate()
+        return r
+
+    @staticmethod
+    async def read_body(receive, max_length=None):
+        """Read the whole request body, or return None if it is longer than ``max_length``."""
+        chunks = []
+        length = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunk = message.get('body', b'')
+            length += len(chunk)
+            if max_length is not None and length > max_length:
+                return None
+            chunks.append(chunk)
+            more_body = message.get('more_body', False)
+        return b''.join(chunks)
+
+    def format_error(self, req, err, reason):
+        if isinstance(reason, Exception):
+            kind, value, tb = sys.exc_info()
+            reason = "{kind}: {value}\n------\n\n{tb}".format(
+                kind=reason.__class__.__name__,
+                value=value,
+                tb='\n'.join(traceback.format_tb(tb, limit=100))
+            )
+        else:
+            reason = str(reason)
+
+        if req is not None and req.reference.format == 'html':
+            return 'text/html', "<!doctype html><html><head><title>{err}</title></head><body>" \
+                                "<h1>{err}</h1><dl><dt>URL</dt><dd>{url}</dd><dt>Method</dt><dd>{method}</dd></dl>" \
+                                "<h3>Reason</h3><pre>{reason}</pre></body></html>".format(
+                err=err, url=req.reference.url, method=req.request_method, reason=reason)
+        else:
+            return 'application/json', json.dumps({"err": err, "reason": reason})
+
+    async def respond_schema(self, send, headers, mimetype, response):
+        """Send a schema, tagged so clients can revalidate their cached copies with If-None-Match."""
+        tag = etag(response)
+        if tag in headers.get('if-none-match', ''):
+            return await self.respond(send, 304, mimetype, '', extra_headers=[(b'etag', tag.encode('latin-1'))])
+        return await self.respond(send, 200, mimetype, response, extra_headers=[(b'etag', tag.encode('latin-1'))])
+
+    async def respond(self, send, status, mimetype, response, extra_headers=()):
+        """Send a response, streaming it in chunks.
+
+        Args:
+            send: The ASGI send callable.
+            status (int): The HTTP status.
+            mimetype (str): The content type.
+            response (str, bytes, or async iterable of str or bytes): The body.
+            extra_headers: Additional ``(name, value)`` byte string pairs.
+        """
+        headers = [(b'content-type', mimetype.encode('latin-1'))]
+        if self.suite.cross_origin:
+            headers.append((b'access-control-allow-origin', b'*'))
+        headers.extend(extra_headers)
+
+        if hasattr(response, '__aiter__'):
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            async for chunk in response:
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk.encode('utf-8') if isinstance(chunk, str) else chunk,
+                    'more_body': True})
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+            return
+
+        body = response.encode('utf-8') if isinstance(response, str) else (response or b'')
+        headers.append((b'content-length', str(len(body)).encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        for i in range(0, max(len(body), 1), self.chunk_size):
+            await send({
+                'type': 'http.response.body',
+                'body': body[i:i + self.chunk_size],
+                'more_body': i + self.chunk_size < len(body)})
@@ -1,13 +1,18 @@
 import datetime
+import threading
 
-import bcrypt
 import jwt
 
 from sondra.api.expose import expose_method, expose_method_explicit
 from sondra.application import Application
+from sondra.collection.changes import Change
+from sondra.document import Document
+from sondra.document import signals as doc_signals
 from sondra.utils import utc_timestamp
 from .collections import Users, UserCredentials, LoggedInUsers, Roles, IssuedTokens
 from .decorators import authenticated_method
+from .hashing import PasswordHasher
+from .token_cache import PermissionCache, TokenCache
 
 
 class Auth(Application):
@@ -21,7 +26,9 @@ class Auth(Application):
         IssuedTokens
     )
 
-    def __init__(self, suite, name=None, expiration=None, single_login=True, valid_issuers=None, extra_claims=None, validators=None):
+    def __init__(self, suite, name=None, expiration=None, single_login=True, valid_issuers=None, extra_claims=None, validators=None,
+                 token_cache_size=10000, token_cache_ttl=300, hash_workers=None, hash_queue=None, hash_admission_timeout=5,
+                 enforce_roles=False):
         """
         A sample authentication and authorization app that uses JWT.
 
@@ -33,16 +40,96 @@ class Auth(Application):
             valid_issuers (list or set): A list of valid issuers to validate the issue claim against.
             extra_claims (optional dict): A dict of claim names to functions that accept a single argument, the user record and return claim content.
             validators (optional list): A list of functions that accept a decoded token and raise an error if the claims aren't verified. The error is passed through.
+            token_cache_size (int = 10000): The most verified tokens, and users' compiled permissions, to remember, so that checking them again needs no queries. 0 disables the caches.
+            token_cache_ttl (float = 300): The most seconds to remember a verified token or a user's permissions. See :mod:`sondra.auth.token_cache`.
+            hash_workers (optional int): The number of processes to hash passwords on. Defaults to the number of CPUs. 0 hashes in the calling thread.
+            hash_queue (optional int): The most passwords waiting to be hashed. Defaults to four per worker.
+            hash_admission_timeout (float = 5): How long a login waits for room in the hashing queue before failing. See :mod:`sondra.auth.hashing`.
+            enforce_roles (boolean = False): Whether requests for objects that require authorization are refused unless one of the user's roles grants the permission. See :class:`sondra.auth.AuthRequestProcessor`.
         """
         super(Auth, self).__init__(suite, name)
+        self.hasher = PasswordHasher(hash_workers, hash_queue, hash_admission_timeout)
         self.expiration = expiration
         self.single_login = single_login
         self.extra_claims = extra_claims or {}
         self.validators = validators or ()
+        self.enforce_roles = enforce_roles
         self.valid_issuers = {self.url}
         if valid_issuers:
             self.valid_issuers.update(set(valid_issuers))
 
+        self.token_cache = TokenCache(token_cache_size, token_cache_ttl)
+        self.permission_cache = PermissionCache(token_cache_size, token_cache_ttl)
+        self._token_evictors = {  # keyed by the primary keys of users, credentials, logins, and roles respectively
+            self['users'].document_class: (self._evict_user, self['users'].primary_key),
+            self['user-credentials'].document_class: (self.token_cache.discard_user, self['user-credentials'].primary_key),
+            self['logged-in-users'].document_class: (self.token_cache.discard_secret, self['logged-in-users'].primary_key),
+            self['roles'].document_class: (self._evict_role, self['roles'].primary_key),
+        }
+        for signal in (doc_signals.pre_save, doc_signals.post_save, doc_signals.post_save_batch,
+                       doc_signals.pre_delete, doc_signals.post_delete_batch):
+            for document_class in self._token_evictors:
+                signal.connect(self._evict_tokens, sender=document_class)
+
+    def _evict_user(self, username):
+        self.token_cache.discard_user(username)
+        self.permission_cache.discard(username)
+
+    def _evict_role(self, slug):
+        self.permission_cache.clear()  # any user may hold the role
+
+    def _evict_tokens(self, sender, docs=None, instance=None, key=None, **kwargs):
+        """Forget cached tokens and permissions of users, credentials, logins and roles being saved or deleted."""
+        evict, primary_key = self._token_evictors[sender]
+        if key is not None:
+            evict(key)
+        for doc in ([instance] if instance is not None else docs or ()):
+            if isinstance(doc, Document):
+                evict(doc.id)
+            elif isinstance(doc, dict):
+                evict(doc.get(primary_key))
+
+    def watch_token_revocations(self):
+        """Forget cached tokens and permissions when users, credentials, logins and roles are changed by other
+        processes, too.
+
+        Starts a thread per collection that follows its changefeed. Call once, at startup.
+        """
+        for slug in ('users', 'user-credentials', 'logged-in-users', 'roles'):
+            coll = self[slug]
+            threading.Thread(target=self._watch_token_revocations, args=(coll,), daemon=True,
+                             name='TokenRevocations-' + coll.url).start()
+
+    def _watch_token_revocations(self, coll):
+        evict, _ = self._token_evictors[coll.document_class]
+        with coll.changes() as feed:
+            for change in feed:
+                if change.type in {Change.RESUMED, Change.OVERFLOW}:
+                    self.token_cache.clear()  # changes may have been missed
+                    self.permission_cache.clear()
+                elif change.key is not None:
+                    evict(change.key)
+
+    def permissions(self, user):
+        """The compiled permissions of a user's roles, cached until the user or any role is saved or deleted, or for
+        ``token_cache_ttl`` seconds.
+
+        Returns:
+            PermissionIndex: see :mod:`sondra.auth.permissions`
+        """
+        index = self.permission_cache.get(user.id)
+        if index is None:
+            index = user.permission_index()
+            self.permission_cache.put(user.id, index)
+        return index
+
+    def authorizes(self, user, target, permission):
+        """Whether any of a user's roles grants a permission on an application, collection or document.
+        Administrators are granted everything."""
+        if user.get('admin', False):
+            return True
+        return self.permissions(user).authorizes(target, permission)
+
     def get_expiration_claims(self):
         now = utc_timestamp()
 
@@ -80,15 +167,14 @@ class Auth(Application):
 
         Raises:
             PermissionError: if the password is invalid or the user does not exist
+            HasherBusy: if too many passwords are already being checked.
         """
         if username not in self['users']:
             self.log.warning("Failed login attempt by nonexistent user: {0}".format(username))
             raise PermissionError("Login not valid")
 
         credentials = self['user-credentials'][username]
-        hashed_real_password = credentials['password'].encode('utf-8')
-        hashed_given_password = bcrypt.hashpw(password.encode('utf-8'), credentials['salt'].encode('utf-8'))
-        if hashed_real_password == hashed_given_password:
+        if self.hasher.verify(password, credentials['password'], credentials['salt']):
             if credentials['secret'] in self['logged-in-users']:
                 # self['logged-in-users'][credentials['secret']].delete()
                 return self['logged-in-users'][credentials['secret']]['token']  # return the current logged in token for tihs user.  Less secure but more expected.
@@ -101,6 +187,7 @@ class Auth(Application):
     @authenticated_method
     @expose_method
     def logout(self, token: str, _user=None) -> bool:
+        self.token_cache.discard(token)
         u = self['logged-in-users'].for_token(token)
         if u:
             u.delete()
@@ -123,6 +210,7 @@ class Auth(Application):
             PermissionError: if the current token is not the user's valid token.
         """
 
+        self.token_cache.discard(token)
         logged_in_user = self['logged-in-users'].for_token(token)
 
         secret = logged_in_user['secret'].encode('utf-8')
@@ -131,10 +219,10 @@ class Auth(Application):
         claims.update(self.get_expiration_claims())  # make sure this token expires
         token = jwt.encode(claims, secret).decode('utf-8')
 
-        if 'expires' in logged_in_user:
-            del logged_in_user['expires']
+        if 'exp' in logged_in_user:
+            del logged_in_user['exp']
         if 'exp' in claims:
-            logged_in_user['expires'] = claims['exp']
+            logged_in_user['exp'] = claims['exp']
         logged_in_user['token'] = token
         logged_in_user.save(conflict='replace')
         return token
@@ -192,28 +280,37 @@ class Auth(Application):
         Args:
             token (str): the JWT token to check against.
             **claims: a dictionary of extra claims to check
+        Verified tokens are cached, so checking a token again until it expires costs no queries.
+
         Returns:
             User: the decoded auth token.
         Raisees:
             DecodeError: if the JWT token is out of date, not issued by this authority, or otherwise invalid.
             PermissionError: if a claim is not present, or if claims differ.
         """
-
-        if self.single_login:
-            logged_in_user = self['logged-in-users'].for_token(token)
-            if logged_in_user is None:
-                raise PermissionError("Token not present and single login has been configured by the application owner.")
+        cached = self.token_cache.get(token)
+        if cached is not None:
+            obj, decoded = cached
+            user = self['users'].document_class(obj, collection=self['users'], from_db=True)
         else:
-            logged_in_user = self['issued-tokens'][token]['user']
+            if self.single_login:
+                logged_in_user = self['logged-in-users'].for_token(token)
+                if logged_in_user is None:
+                    raise PermissionError("Token not present and single login has been configured by the application owner.")
+            else:
+                logged_in_user = self['issued-tokens'][token]['user']
+
+            secret = logged_in_user['secret']
+            decoded = jwt.decode(token.encode('utf-8'), secret.encode('utf-8'), issuer=self.url, verify=True)
+            user = self['users'][decoded['user']]
+            self.token_cache.put(token, user.obj, decoded, secret)
 
-        secret = logged_in_user['secret'].encode('utf-8')
-        decoded = jwt.decode(token.encode('utf-8'), secret, issuer=self.url, verify=True)
         for name, value in claims.items():
             if name not in decoded:
                 raise PermissionError("Claim not present in {0}: {1}".format(decoded['user'], name))
             elif decoded[name] != value:
                 raise PermissionError("Claims differ for {0}: {1}".format(decoded['user'], name))
-        return self['users'][decoded['user']], decoded  # WAS: self['users'][decoded['user']]
+        return user, decoded
 
 
     @expose_method_explicit(
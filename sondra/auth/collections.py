@@ -1,6 +1,5 @@
 import datetime
 
-import bcrypt
 import rethinkdb as r
 
 from sondra.api.expose import expose_method, expose_method_explicit
@@ -94,6 +93,14 @@ class Users(Collection):
             KeyError if the user already exists.
             ValueError if the user's password does not pass muster.
         """
+        user, password = self._user_record(username, email, locale, password, family_name, given_name, names, active,
+                                           roles, confirmed_email)
+        credentials = self.application.hasher.credentials(password) if password else None
+        return user, credentials
+
+    def _user_record(self, username, email, locale='en-US', password=None, family_name=None, given_name=None,
+                     names=None, active=True, roles=None, confirmed_email=False):
+        """Build a user record. Returns it with the password to make credentials for, or None."""
         email = email.lower()
 
         if not password:
@@ -126,19 +133,10 @@ class Users(Collection):
         if names:
             user['names'] = names
 
-        credentials = None
         if active and password:
             self.validate_password(password)
-            salt = bcrypt.gensalt()
-            secret = bcrypt.gensalt(16)
-            hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
-            credentials = {
-                'password': hashed_password.decode('utf-8'),
-                'salt': salt.decode('utf-8'),
-                'secret': secret.decode('utf-8')
-            }
-
-        return user, credentials
+            return user, password
+        return user, None
 
     @authorized_method
     @expose_method_explicit(
@@ -221,12 +219,14 @@ class Users(Collection):
         return user.url
 
     def create_users(self, *users):
-        us = []
-        cs = []
-        for u, c in (self.user_data(**x) for x in users):
-            us.append(u)
-            if c is not None:
-                cs.append(c)
+        """Create many users at once, hashing their passwords in parallel. Takes dicts of the arguments to
+        :meth:`create_user`."""
+        records = [self._user_record(**x) for x in users]
+        us = [u for u, _ in records]
+        with_passwords = [(u, p) for u, p in records if p]
+        cs = self.application.hasher.credentials_many(p for _, p in with_passwords)
+        for (u, _), c in zip(with_passwords, cs):
+            c['user'] = u['username']
         self.create(us)
         if cs:
             self.application['user-credentials'].create(cs)
@@ -289,6 +289,7 @@ class LoggedInUsers(Collection):
     primary_key = 'secret'
     document_class = LoggedInUser
     indexes = ['token']
+    ttl_field = 'exp'
 
     private = True
 
@@ -303,14 +304,34 @@ class LoggedInUsers(Collection):
         self.q(self.table.get_all(token, index='token').delete())
 
     def delete_expired_tokens(self):
-        self.q(
-            self.table.filter(r.row['expires'] <= r.now())
-        )
+        """Delete logins whose tokens have expired. Returns the number deleted."""
+        return self.sweep_expired()
+
+    def ensure_indexes(self):
+        created = super(LoggedInUsers, self).ensure_indexes()
+        if self.ttl_field in created:  # logins may predate the rename
+            self.migrate_legacy_expiry()
+        return created
+
+    def migrate_legacy_expiry(self):
+        """Move the expiry of logins saved before it was renamed from ``expires`` to ``exp``, so that the sweeper
+        deletes them. Called by :meth:`ensure_indexes` when it creates the ``exp`` index. This scans the whole
+        table.
+
+        Returns:
+            int: The number of logins migrated.
+        """
+        ret = self.table.filter(lambda doc: doc.has_fields('expires'))\
+            .replace(lambda doc: r.branch(doc.has_fields('exp'), doc, doc.merge({'exp': doc['expires']}))
+                     .without('expires'))\
+            .run(self.write_connection)
+        return ret.get('replaced', 0)
 
 
 class IssuedTokens(Collection):
     primary_key = 'token'
     document_class = IssuedToken
-    indexes = ['user', 'exp']
+    indexes = ['user']
+    ttl_field = 'exp'
 
     private = True
@@ -2,12 +2,11 @@ import functools
 import operator
 
 from sondra.api.expose import expose_method
-from sondra.application import Application
 from sondra.auth.decorators import authorized_method
-from sondra.collection import Collection
 from sondra.document import Document
 from sondra.document.processors import SlugPropertyProcessor
 from sondra.schema import S
+from .permissions import PermissionIndex
 
 
 class Role(Document):
@@ -42,39 +41,8 @@ class Role(Document):
     ]
 
     def authorizes(self, value, perm=None):
-        if isinstance(value, Application):
-            application = value.slug
-            for permission in self.get('permissions', []):
-                if permission.get('application', None) == application:
-                    return perm in permission['allowed']
-            else:
-                return False
-
-        elif isinstance(value, Collection):
-            collection = value.slug
-            application = value.application.slug
-            for permission in self.get('permissions', []):
-                if permission.get('collection', None) == collection and \
-                        permission.get('application', None) == application:
-                    return perm in permission['allowed']
-            else:
-                return False
-
-        elif isinstance(value, Document):
-            document = value.slug
-            collection = value.collection.slug
-            application = value.application.slug
-            for permission in self.get('permissions', []):
-                if permission.get('collection', None) == collection and \
-                        permission.get('application', None) == application and \
-                        permission.get('document', None) == document:
-                    return perm in permission['allowed']
-            else:
-                return False
-
-        else:
-            return False
-                        
+        return PermissionIndex([self]).authorizes(value, perm)
+
 
 class User(Document):
     """A basic, but fairly complete system user record"""
@@ -162,9 +130,18 @@ class User(Document):
         )
     }
 
+    def roles(self):
+        """Fetch the user's roles in a single query."""
+        keys = [r.id if isinstance(r, Document) else r.rsplit('/', 1)[-1] for r in self.obj.get('roles', [])]
+        return self.application['roles'].get_many(keys)
+
+    def permission_index(self):
+        """Compile the permissions of all the user's roles. See :class:`sondra.auth.permissions.PermissionIndex`"""
+        return PermissionIndex(self.roles())
+
     @expose_method
     def permissions(self) -> [dict]:
-        return functools.reduce(operator.add, [role['permissions'] for role in self.fetch('roles')], [])
+        return functools.reduce(operator.add, [role.get('permissions', []) for role in self.roles()], [])
 
     @expose_method
     def confirm_email(self, confirmation_code: str) -> bool:
@@ -219,7 +196,7 @@ class LoggedInUser(Document):
         "properties": {
             'token': {"type": "string"},
             "secret": {"type": "string"},
-            "expires": {"type": "string"}
+            "exp": {"type": "number"}
         }
     }
 
@@ -0,0 +1,137 @@
+"""Password hashing off the request thread.
+
+bcrypt is slow on purpose. :class:`PasswordHasher` runs it on a pool of worker processes, so hashing uses every core
+and does not hold up the thread serving a request for longer than it must. The number of hashes waiting for or
+running in the pool is limited. When the limit is reached, :meth:`PasswordHasher.verify` waits up to
+``admission_timeout`` seconds for room and then raises :class:`HasherBusy`, so a storm of logins is turned away
+instead of queueing up behind itself and starving other requests.
+"""
+import asyncio
+import hmac
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    """Raised when there is no room in the hashing pool before the admission timeout."""
+
+
+def _hashpw(password, salt):
+    return bcrypt.hashpw(password, salt)
+
+
+class PasswordHasher(object):
+    """Hash and verify passwords with bcrypt on a bounded process pool.
+
+    Args:
+        max_workers (int): The number of worker processes. Defaults to the number of CPUs. If 0, passwords are hashed
+            in the calling thread.
+        max_pending (int): The most hashes waiting for or running in the pool. Defaults to four per worker.
+        admission_timeout (float=5): The longest :meth:`verify` and :meth:`hash` wait for room in the pool.
+    """
+    def __init__(self, max_workers=None, max_pending=None, admission_timeout=5):
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.max_pending = max_pending or max(self.max_workers, 1) * 4
+        self.admission_timeout = admission_timeout
+        self._admission = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(self.max_workers)
+        return self._executor
+
+    def submit(self, password, salt, timeout=None):
+        """Start hashing a password.
+
+        Args:
+            password (str or bytes): The password.
+            salt (str or bytes): A salt from ``bcrypt.gensalt()``.
+            timeout (float): The longest to wait for room in the pool. By default, wait indefinitely.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the hashed password, as bytes.
+
+        Raises:
+            HasherBusy: if there was no room in the pool before the timeout.
+        """
+        password = password.encode('utf-8') if isinstance(password, str) else password
+        salt = salt.encode('utf-8') if isinstance(salt, str) else salt
+
+        if not self._admission.acquire(timeout=timeout):
+            raise HasherBusy("Too many passwords are being hashed. Try again later.")
+        try:
+            if self.max_workers:
+                future = self.executor.submit(_hashpw, password, salt)
+            else:
+                future = _completed(_hashpw, password, salt)
+        except BaseException:
+            self._admission.release()
+            raise
+        future.add_done_callback(lambda f: self._admission.release())
+        return future
+
+    def hash(self, password, salt):
+        """Hash a password. Returns the hash as bytes."""
+        return self.submit(password, salt, self.admission_timeout).result()
+
+    def verify(self, password, hashed, salt):
+        """Check a password against its hash, in constant time."""
+        hashed = hashed.encode('utf-8') if isinstance(hashed, str) else hashed
+        return hmac.compare_digest(self.hash(password, salt), hashed)
+
+    async def ahash(self, password, salt):
+        """Hash a password without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(password, salt, self.admission_timeout))
+
+    async def averify(self, password, hashed, salt):
+        """Check a password against its hash without blocking the event loop."""
+        hashed = hashed.encode('utf-8') if isinstance(hashed, str) else hashed
+        return hmac.compare_digest(await self.ahash(password, salt), hashed)
+
+    def credentials(self, password):
+        """Make new credentials for a password.
+
+        Returns:
+            dict: ``password``, the hashed password, ``salt``, and ``secret``, a key to sign the user's tokens with.
+        """
+        return self.credentials_many([password])[0]
+
+    def credentials_many(self, passwords):
+        """Make new credentials for many passwords, hashing them in parallel. Waits for room in the pool rather than
+        failing.
+
+        Returns:
+            [dict]: Credentials, in the same order as the passwords. See :meth:`credentials`
+        """
+        pending = []
+        for password in passwords:
+            salt = bcrypt.gensalt()
+            pending.append((salt, bcrypt.gensalt(16), self.submit(password, salt)))
+
+        return [{
+            'password': future.result().decode('utf-8'),
+            'salt': salt.decode('utf-8'),
+            'secret': secret.decode('utf-8'),
+        } for salt, secret, future in pending]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def _completed(fn, *args):
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
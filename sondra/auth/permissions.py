@@ -0,0 +1,59 @@
+"""Compiled role permissions.
+
+A role's permissions are a list of grants, each naming an application, and optionally a collection and a document,
+and the permissions allowed on it. :class:`PermissionIndex` compiles the grants of one or more roles into
+dictionaries keyed by ``application``, ``(application, collection)`` and ``(application, collection, document)``, so
+that checking a permission is a lookup rather than a scan of every grant of every role.
+
+Within a role, the first grant that matches a target decides, as :meth:`sondra.auth.Role.authorizes` always has.
+Across roles, a permission is allowed if any role allows it.
+"""
+from sondra.application import Application
+from sondra.collection import Collection
+from sondra.document import Document
+
+
+class PermissionIndex(object):
+    """The compiled permissions of a set of roles.
+
+    Args:
+        roles ([Role]): The roles.
+    """
+    def __init__(self, roles=()):
+        self.applications = {}
+        self.collections = {}
+        self.documents = {}
+        for role in roles:
+            self.add(role.get('permissions', []))
+
+    def add(self, permissions):
+        """Add the grants of one role."""
+        applications, collections, documents = {}, {}, {}
+        for permission in permissions:
+            application = permission.get('application', None)
+            collection = permission.get('collection', None)
+            document = permission.get('document', None)
+            allowed = permission.get('allowed', [])
+            applications.setdefault(application, allowed)
+            collections.setdefault((application, collection), allowed)
+            documents.setdefault((application, collection, document), allowed)
+
+        for index, grants in ((self.applications, applications),
+                              (self.collections, collections),
+                              (self.documents, documents)):
+            for key, allowed in grants.items():
+                index.setdefault(key, set()).update(allowed)
+
+    def allowed(self, value):
+        """The set of permissions allowed on an application, collection, or document."""
+        if isinstance(value, Application):
+            return self.applications.get(value.slug, set())
+        elif isinstance(value, Collection):
+            return self.collections.get((value.application.slug, value.slug), set())
+        elif isinstance(value, Document):
+            return self.documents.get((value.application.slug, value.collection.slug, value.slug), set())
+        else:
+            return set()
+
+    def authorizes(self, value, perm=None):
+        return perm in self.allowed(value)
@@ -5,49 +5,79 @@ from sondra.collection import Collection
 from sondra.application import Application
 
 class AuthRequestProcessor(RequestProcessor):
-    """APIRequest processor makes sure that a user is authorized to perform an operation"""
+    """APIRequest processor makes sure that a user is authorized to perform an operation
 
-    def authentication_requirement(self, target, permission):
-        """Check the target to see if it or any of its 'parents' require authentication."""
+    Which object, if any, requires authentication or authorization for a permission is found by walking up from the
+    target through its collection, application, and suite. The outcome for every application and collection is
+    worked out when the suite is set up (see :meth:`setup`) and kept on the application or collection.
+
+    An authenticated user may use an object that requires authorization, and the object can narrow what they see (see
+    below). If the auth application is created with ``enforce_roles=True``, the user must also hold a role that grants
+    the permission on the object that requires it. Roles are checked against the user's compiled
+    :class:`sondra.auth.permissions.PermissionIndex`, which the auth application caches. The object that requires
+    authorization can narrow what a user sees:
+
+    * ``document_level_filter_function(user, decoded_token, permission)`` returns a filter, or a list of them, for the
+      request's query. Return a :class:`sondra.api.query_set.IndexFilter` where a secondary index can answer it, such
+      as ``IndexFilter('owners', user.id, multi=True)``, so listings read the index instead of scanning the table.
+    * a collection's ``authorize_many(user, decoded_token, permission, documents)`` returns the documents allowed. It
+      is called once per listing, with every document found, and for single documents that have no ``authorize``.
+    """
+    def setup(self, suite):
+        """Work out the requirements of every application and collection of a suite for reads, writes and metadata."""
+        for app in suite.values():
+            for target in [app] + list(app.values()):
+                for permission in ('read', 'write', 'meta'):
+                    self.authentication_requirement(target, permission)
+                    self.authorization_requirement(target, permission)
+
+    def requirement(self, attr, target, permission):
+        """Check the target to see if it or any of its 'parents' require authentication or authorization.
+
+        Args:
+            attr (str): ``authentication_required`` or ``authorization_required``
+            target: A document, collection, application or suite, or a tuple of one and a method.
+            permission (str): The permission name.
+
+        Returns:
+            The object that imposes the requirement, or None.
+        """
         if isinstance(target, tuple):
-            req = getattr(target[1], 'authentication_required', None)
+            req = getattr(target[1], attr, None)
             if req is False:
                 return None
             elif req is not None:
                 return target[0]  # return the object the method is bound to, as this is what permissions are set upon
             else:
-                return self.authentication_requirement(target[0], 'write')  # assume all methods are write-dangerous
-        elif permission in getattr(target, 'authentication_required', []):
-            return target
+                return self.requirement(attr, target[0], 'write')  # assume all methods are write-dangerous
         elif isinstance(target, Document):
-            return self.authentication_requirement(target.collection, permission)
+            if permission in getattr(target, attr, []):
+                return target
+            return self.requirement(attr, target.collection, permission)
+
+        requirements = vars(target).setdefault('_auth_requirements', {})
+        key = (attr, permission)
+        if key in requirements:
+            return requirements[key]
+
+        if permission in getattr(target, attr, []):
+            req = target
         elif isinstance(target, Collection):
-            return self.authentication_requirement(target.application, permission)
+            req = self.requirement(attr, target.application, permission)
         elif isinstance(target, Application):
-            return self.authentication_requirement(target.suite, permission)
+            req = self.requirement(attr, target.suite, permission)
         else:
-            return None
+            req = None
+        requirements[key] = req
+        return req
+
+    def authentication_requirement(self, target, permission):
+        """Check the target to see if it or any of its 'parents' require authentication."""
+        return self.requirement('authentication_required', target, permission)
 
     def authorization_requirement(self, target, permission):
         """Check the target to see if it or any of its 'parents' require authorization."""
-        if isinstance(target, tuple):
-            req = getattr(target[1], 'authorization_required', None)
-            if req is False:
-                return None
-            elif req is not None:
-                return target[0]  # return the object the method is bound to, as this is what permissions are set upon
-            else:
-                return self.authorization_requirement(target[0], 'write')  # assume all methods are write-dangerous
-        elif permission in getattr(target, 'authorization_required', []):
-            return target
-        elif isinstance(target, Document):
-            return self.authorization_requirement(target.collection, permission)
-        elif isinstance(target, Collection):
-            return self.authorization_requirement(target.application, permission)
-        elif isinstance(target, Application):
-            return self.authorization_requirement(target.suite, permission)
-        else:
-            return None
+        return self.requirement('authorization_required', target, permission)
 
     def process_api_request(self, request):
         reference = request.reference
@@ -69,7 +99,6 @@ class AuthRequestProcessor(RequestProcessor):
 
         # Check to see if the user has passed a JWT
         auth_token = request.api_arguments.get('_auth', None)  # if the user passed it as a parameter
-        print(auth_token)
         if not auth_token:  # maybe the user passed it as a header
             bearer = request.headers.get('Authorization', None)
             if bearer:
@@ -85,41 +114,46 @@ class AuthRequestProcessor(RequestProcessor):
 
         if ((authentication_target is not None) or (authorization_target is not None)) \
                 and (not user):
-            print("Permission error!!!!!")
             raise PermissionError("Target {url} requires authentication or authorization, but user is anonymous".format(url=reference.url))
         if user and user['admin']:  # allow the superuser unfettered access
             return request
         if authorization_target is None:  # we've authenticated, that's all we need.
             return request
+        auth = request.suite['auth']
+        if auth.enforce_roles and not auth.authorizes(user, authorization_target, permission_name):
+            raise PermissionError("Permission '{name}' denied for '{user}' accessing '{url}'".format(
+                user=user, url=reference.url, name=permission_name))
 
         filter_function = getattr(authorization_target, 'document_level_filter_function', None)
         if filter_function:
             flt = filter_function(user, decoded_token, permission_name)
-            request.additional_filters.append(flt)
+            if isinstance(flt, (list, tuple)):
+                request.additional_filters.extend(flt)
+            elif flt is not None:
+                request.additional_filters.append(flt)
 
-        if request.reference.kind in {'document', 'subdocument'}:
+        if request.reference.kind == 'collection':
+            authorize_many = getattr(value, 'authorize_many', None)
+            if authorize_many:
+                request.document_authorizers.append(
+                    lambda docs: authorize_many(user, decoded_token, permission_name, docs))
+        elif request.reference.kind in {'document', 'subdocument'}:
             document_auth_function = getattr(value, 'authorize', None)
+            authorize_many = getattr(getattr(value, 'collection', None), 'authorize_many', None)
             if document_auth_function:
-                if not document_auth_function(user, decoded_token, permission_name):
-                    msg = "Permission '{name}' denied for '{user}' accessing '{url}'".format(
-                        user=user,
-                        url=reference.url,
-                        name=permission_name
-                    )
-                    raise PermissionError(msg)
+                allowed = document_auth_function(user, decoded_token, permission_name)
+            elif authorize_many:
+                allowed = bool(list(authorize_many(user, decoded_token, permission_name, [value])))
+            else:
+                allowed = True
+            if not allowed:
+                msg = "Permission '{name}' denied for '{user}' accessing '{url}'".format(
+                    user=user,
+                    url=reference.url,
+                    name=permission_name
+                )
+                raise PermissionError(msg)
         return request
-        # for role in user.fetch('roles'):  # check each role. return at the first successful authorization.
-        #     if role.authorizes(authorization_target, permission_name):
-        #         return request
-        #
-        # else:  # we made it through all the user's roles and none authorized access.
-        #     msg = "Permission '{name}' denied for '{user}' accessing '{url}'".format(
-        #         user=user,
-        #         url=reference.url,
-        #         name=permission_name
-        #     )
-        #     request.suite.log.error(msg)
-        #     raise PermissionError(msg)
 
     @staticmethod
     def _get_permission_name(request):
@@ -0,0 +1,170 @@
+"""A cache of verified JSON Web Tokens.
+
+Checking a token costs a lookup of the login, a signature check, and a lookup of the user. :class:`TokenCache` keeps
+the outcome of a successful check, keyed by a hash of the token, until the token expires or ``ttl`` seconds pass,
+whichever is sooner. It keeps the user's stored value rather than a document, and :class:`sondra.auth.Auth` builds a
+new user document from it on every hit, so requests never share one. :class:`sondra.auth.Auth` evicts entries when a
+user logs out or renews a token, and when users, credentials or logins are saved or deleted in this process. Call
+:meth:`sondra.auth.Auth.watch_token_revocations` to also evict entries for changes made by other processes.
+
+:class:`PermissionCache` keeps users' compiled permissions the same way, bounded and for at most ``ttl`` seconds, so
+a role change made by another process is picked up even if no one is watching for it.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from copy import deepcopy
+
+
+class TokenCache(object):
+    """A thread-safe, size-bounded cache of verified tokens.
+
+    Args:
+        max_size (int=10000): The most tokens to remember. The least recently used are evicted first.
+        ttl (float=300): The most seconds to remember a token, even if it expires later or never.
+    """
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._by_secret = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token):
+        """Get the user and decoded claims of a verified token.
+
+        Returns:
+            tuple: ``(user, decoded)``, copies of what was put, or None if the token is not in the cache or has
+            expired.
+        """
+        key = self.key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry['expires'] <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return deepcopy(entry['user']), deepcopy(entry['decoded'])
+
+    def put(self, token, user, decoded, secret):
+        """Remember a token that has been verified.
+
+        Args:
+            token (str): The token.
+            user (dict): The stored value of the user it was issued to.
+            decoded (dict): Its claims.
+            secret (str): The secret it was signed with.
+        """
+        if not self.max_size:
+            return
+
+        expires = time.time() + self.ttl
+        if 'exp' in decoded:
+            expires = min(expires, decoded['exp'])
+
+        key = self.key(token)
+        username = decoded.get('user')
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {'user': deepcopy(user), 'decoded': deepcopy(decoded), 'secret': secret,
+                                  'expires': expires}
+            self._by_user.setdefault(username, set()).add(key)
+            self._by_secret.setdefault(secret, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def discard(self, token):
+        """Forget a token."""
+        with self._lock:
+            self._remove(self.key(token))
+
+    def discard_user(self, username):
+        """Forget every token issued to a user."""
+        with self._lock:
+            for key in list(self._by_user.get(username, ())):
+                self._remove(key)
+
+    def discard_secret(self, secret):
+        """Forget every token signed with a secret."""
+        with self._lock:
+            for key in list(self._by_secret.get(secret, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+            self._by_secret.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for index, name in ((self._by_user, entry['decoded'].get('user')), (self._by_secret, entry['secret'])):
+            keys = index.get(name)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[name]
+
+
+class PermissionCache(object):
+    """A thread-safe, size-bounded cache of users' compiled permissions, keyed by username.
+
+    Args:
+        max_size (int=10000): The most users to remember. The least recently used are evicted first.
+        ttl (float=300): The most seconds to remember a user's permissions.
+    """
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, username):
+        return self.get(username) is not None
+
+    def get(self, username):
+        """Get a user's permissions, or None if they are not in the cache or have expired."""
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[username]
+                return None
+            self._entries.move_to_end(username)
+            return entry[0]
+
+    def put(self, username, permissions):
+        """Remember a user's permissions."""
+        if not self.max_size:
+            return
+        with self._lock:
+            self._entries.pop(username, None)
+            self._entries[username] = (permissions, time.time() + self.ttl)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, username):
+        """Forget a user's permissions."""
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
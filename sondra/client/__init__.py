@@ -0,0 +1,332 @@
+"""
+A Python client that gives symmetry to the way all APIs are called.  This allows you to make lookups and method calls
+in the same way on remote services as you would on local collections, also enabling you to authenticate.
+
+Currently very simple, but at least supports authentication, and keeping local replicas of collections (see
+:mod:`sondra.client.replica`).
+
+All requests go through one ``requests.Session``, so connections are kept alive and reused. Schemas are fetched
+lazily, the first time an application, collection, or method is used, and can be cached on disk. Cached schemas are
+revalidated with their ETags, so an unchanged schema costs a ``304 Not Modified`` rather than a download.
+"""
+
+import hashlib
+import json
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .replica import Replica
+
+
+class Client(object):
+    """A client for a remote suite.
+
+    Args:
+        suite (Suite): The local suite, used for logging.
+        url (str): The URL of the remote suite.
+        auth_app (str='auth'): The slug of the remote suite's authentication application.
+        auth (tuple): A username and password to log in with.
+        session (requests.Session): The session to make requests with. By default, a new one.
+        pool_size (int=10): The most connections kept open to the server, if the client creates its own session.
+        schema_cache (str): A directory to cache schemas in between runs. By default, schemas are cached in memory only.
+    """
+    def __init__(self, suite, url, auth_app="auth", auth=None, session=None, pool_size=10, schema_cache=None):
+        self._suite = suite
+        self._log = suite.log
+        self._apps = None
+        self._auth_token = None
+        self._schemas = {}
+
+        self.url = url
+        self.auth_app = auth_app
+        self.schema_cache = schema_cache
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+        if auth:
+            self.authorize(*auth)
+
+    @property
+    def headers(self):
+        return {} if not self._auth_token else {"Authorization": self._auth_token}
+
+    def request(self, method, url, **kwargs):
+        """Make an authorized request and return the decoded JSON response.
+
+        Raises:
+            requests.HTTPError: if the response is an error.
+        """
+        result = self.session.request(method, url, headers=self.headers, **kwargs)
+        if result.ok:
+            return result.json()
+        else:
+            result.raise_for_status()
+
+    def authorize(self, username, password):
+        result = self.session.post("{url}/{auth_app}.login".format(url=self.url, auth_app=self.auth_app), {"username": username, "password": password})
+        if result.ok:
+            self._log.info("Authorized API {url} with {username}".format(url=self.url, username=username))
+            self._auth_token = result.text
+        else:
+            result.raise_for_status()
+
+    def fetch_schema(self, url):
+        """Get the schema of a remote suite, application, collection, or method.
+
+        Schemas are remembered for the life of the client and, if ``schema_cache`` is set, stored on disk with their
+        ETags and revalidated on first use.
+
+        Args:
+            url (str): The URL of the resource, without ``;schema``.
+
+        Returns:
+            dict: The schema.
+        """
+        if url in self._schemas:
+            return self._schemas[url]
+
+        cached = self._read_cached_schema(url)
+        headers = dict(self.headers)
+        if cached and cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+
+        result = self.session.get("{url};schema".format(url=url), headers=headers)
+        if result.status_code == 304 and cached:
+            schema = cached['schema']
+        elif result.ok:
+            schema = result.json()
+            self._write_cached_schema(url, result.headers.get('ETag'), schema)
+        else:
+            result.raise_for_status()
+
+        self._schemas[url] = schema
+        return schema
+
+    def _schema_cache_path(self, url):
+        return os.path.join(self.schema_cache, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def _read_cached_schema(self, url):
+        if not self.schema_cache:
+            return None
+        try:
+            with open(self._schema_cache_path(url)) as cached:
+                return json.load(cached)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cached_schema(self, url, etag, schema):
+        if not (self.schema_cache and etag):
+            return
+        os.makedirs(self.schema_cache, exist_ok=True)
+        path = self._schema_cache_path(url)
+        with open(path + '.tmp', 'w') as cached:
+            json.dump({'url': url, 'etag': etag, 'schema': schema}, cached)
+        os.replace(path + '.tmp', path)
+
+    @property
+    def schema(self):
+        return self.fetch_schema(self.url)
+
+    @property
+    def applications(self):
+        if self._apps is None:
+            self._apps = {app: url for app, url in self.schema['applications'].items()}
+        return self._apps
+
+    def __getitem__(self, key):
+        app = self.applications[key]
+        if not isinstance(app, ApplicationClient):
+            app = self._apps[key] = ApplicationClient(self, app)
+        return app
+
+
+class MethodClient(object):
+    def __init__(self, client, url, method_name):
+        self.url = url + "." + method_name
+        self.client = client
+
+    @property
+    def schema(self):
+        return self.client.fetch_schema(self.url)
+
+    def __call__(self, *args, **kwargs):
+        return self.client.request('POST', "{url};json".format(url=self.url), data=json.dumps(kwargs))
+
+
+class ApplicationClient(object):
+    def __init__(self, client, url):
+        self._collections = None
+        self._methods = None
+        self.client = client
+        self.url = url
+
+    @property
+    def schema(self):
+        return self.client.fetch_schema(self.url)
+
+    @property
+    def collections(self):
+        if self._collections is None:
+            self._collections = {k: CollectionClient(self, url) for k, url in self.schema['collections'].items()}
+        return self._collections
+
+    @property
+    def methods(self):
+        if self._methods is None:
+            self._methods = {m: MethodClient(self.client, self.url, m) for m in self.schema['methods']}
+        return self._methods
+
+    def __getitem__(self, item):
+        return self.collections[item]
+
+    def __getattr__(self, item):
+        """If the item is in the application's methods dictionary, return a methodcall"""
+        if item.startswith('_') or item not in self.methods:
+            raise AttributeError(item)
+
+        return self.methods[item]
+
+
+class CollectionClient(object):
+    def __init__(self, application, url):
+        self.client = application.client
+        self._methods = None
+        self._document_methods = None
+        self.application = application
+        self.url = url
+        self.replica = None
+
+    @property
+    def schema(self):
+        return self.client.fetch_schema(self.url)
+
+    @property
+    def methods(self):
+        if self._methods is None:
+            self._methods = {m: MethodClient(self.client, self.url, m) for m in self.schema['methods']}
+        return self._methods
+
+    @property
+    def document_methods(self):
+        if self._document_methods is None:
+            self._document_methods = {m: MethodClient(self.client, self.url, m) for m in self.schema['document_methods']}
+        return self._document_methods
+
+    def replicate(self, path=':memory:', interval=60, page_size=None):
+        """Keep a local replica of this collection, and answer lookups and simple queries from it.
+
+        The collection must support sync. See :class:`sondra.client.replica.Replica`.
+
+        Args:
+            path (str=':memory:'): The SQLite database to keep the replica in.
+            interval (float=60): Seconds between pulls of changes from the server. If None, pull manually with
+                ``self.replica.pull()``.
+            page_size (int): The most documents to ask for per request.
+
+        Returns:
+            Replica: The replica, already pulled.
+        """
+        if self.replica is not None:
+            self.replica.close()
+        self.replica = Replica(self, path, interval=interval, page_size=page_size).start()
+        return self.replica
+
+    def invalidate(self, key):
+        """Mark the replica's copy of a document stale when it is changed through this client."""
+        if self.replica is not None:
+            self.replica.invalidate(key)
+
+    def __getitem__(self, item):
+        if self.replica is not None:
+            value = self.replica.get(item)
+            if value is not None:
+                return DocumentClient(self, item, value)
+        return DocumentClient(self, item)
+
+    def __setitem__(self, key, value):
+        doc = DocumentClient(self, key, src=value)
+        doc.save()
+
+    def __delitem__(self, key):
+        doc = DocumentClient(self, key)
+        doc.delete()
+
+    def __getattr__(self, item):
+        if item.startswith('_') or item not in self.methods:
+            raise AttributeError(item)
+
+        return self.methods[item]
+
+    def append(self, value):
+        if self.replica is not None:
+            for key in _keys(value, self.schema.get('primary_key', 'id')):
+                self.invalidate(key)
+        keys = self.client.request('POST', "{url};json".format(url=self.url), data=json.dumps(value))
+        if self.replica is not None:
+            for key in keys or ():  # documents created without keys
+                self.invalidate(key)
+        return keys
+
+    def query(self, **query):
+        """Find documents. If the collection is replicated, the keyword arguments are matched for equality with
+        top-level properties of documents in the replica, or, while any document written through this client is yet to
+        be pulled into the replica, of documents on the server. Otherwise they are sent to the server as API
+        arguments.
+        """
+        if self.replica is not None:
+            if not self.replica.stale:
+                pk = self.replica.primary_key
+                return [DocumentClient(self, v[pk], v) for v in self.replica.filter(**query)]
+            query = {'flt': json.dumps([{'lhs': k, 'rhs': v} for k, v in query.items()])}  # the same query, remotely
+
+        pk = self.schema.get('primary_key', 'id')
+        results = self.client.request('GET', "{url};json".format(url=self.url), params=query)
+        return [DocumentClient(self, r[pk], r) for r in results]
+
+
+class DocumentClient(object):
+    def  __init__(self, collection, key, src=None):
+        self.client = collection.client
+        self.application = collection.application
+        self.collection = collection
+        self.url = self.collection.url + "/" + str(key)
+        self.key = key
+        self.obj = src
+
+    @property
+    def methods(self):
+        return self.collection.document_methods
+
+    def fetch(self):
+        self.obj = self.client.request('GET', "{url};json".format(url=self.url))
+
+    def __getitem__(self, item):
+        if not self.obj:
+            self.fetch()
+
+        return self.obj[item]
+
+    def __getattr__(self, item):
+        if item.startswith('_') or item not in self.methods:
+            raise AttributeError(item)
+
+        return self.methods[item]
+
+    def save(self):
+        self.collection.invalidate(self.key)
+        return self.client.request('PUT', "{url};json".format(url=self.url), data=json.dumps(self.obj))
+
+    def delete(self):
+        self.collection.invalidate(self.key)
+        return self.client.request('DELETE', "{url};json".format(url=self.url))
+
+
+def _keys(value, primary_key):
+    values = value if isinstance(value, list) else [value]
+    return [v[primary_key] for v in values if isinstance(v, dict) and primary_key in v]
@@ -0,0 +1,194 @@
+"""An asyncio client, for scripts that make many independent API calls.
+
+:class:`AsyncClient` navigates a remote suite the same way :class:`sondra.client.Client` does, but its calls are
+coroutines, so many can be in flight at once::
+
+    client = AsyncClient(suite, 'https://api.example.com/api', concurrency=20)
+    stations = client['weather']['stations']
+    docs = await stations.get_many(keys)
+    keys = await stations.create_many(readings, chunk_size=500)
+    results = await client.map_method(stations.method('forecast'), ({'station': k} for k in keys))
+
+Requests are made with the pooled session of a :class:`sondra.client.Client`, from a thread pool the size of
+``concurrency``. At most ``concurrency`` requests are in flight at a time.
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from sondra.utils import chunks
+from . import Client
+
+
+class AsyncClient(object):
+    """An asyncio client for a remote suite.
+
+    Args:
+        suite (Suite): The local suite, used for logging.
+        url (str): The URL of the remote suite.
+        auth_app (str='auth'): The slug of the remote suite's authentication application.
+        concurrency (int=10): The most requests in flight at a time.
+        session (requests.Session): The session to make requests with. By default, a new one.
+        schema_cache (str): A directory to cache schemas in between runs.
+        executor (concurrent.futures.Executor): Where to make requests. By default, a new thread pool.
+    """
+    def __init__(self, suite, url, auth_app="auth", concurrency=10, session=None, schema_cache=None, executor=None):
+        self.sync = Client(suite, url, auth_app=auth_app, session=session, pool_size=concurrency,
+                           schema_cache=schema_cache)
+        self.url = url
+        self.concurrency = concurrency
+        self.executor = executor or ThreadPoolExecutor(concurrency)
+        self._semaphore = None
+
+    async def _run(self, fn, *args, **kwargs):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            return await asyncio.get_event_loop().run_in_executor(self.executor, partial(fn, *args, **kwargs))
+
+    async def request(self, method, url, **kwargs):
+        """Make an authorized request and return the decoded JSON response. See :meth:`sondra.client.Client.request`"""
+        return await self._run(self.sync.request, method, url, **kwargs)
+
+    async def authorize(self, username, password):
+        return await self._run(self.sync.authorize, username, password)
+
+    async def fetch_schema(self, url):
+        return await self._run(self.sync.fetch_schema, url)
+
+    async def schema(self):
+        return await self.fetch_schema(self.url)
+
+    def __getitem__(self, key):
+        return AsyncApplicationClient(self, self.url + '/' + key)
+
+    async def map_method(self, method, args_iterable, concurrency=None):
+        """Call a method once for each set of arguments, several calls at a time.
+
+        Args:
+            method (AsyncMethodClient): The method.
+            args_iterable: An iterable of dicts of keyword arguments. It is consumed lazily.
+            concurrency (int): The most calls in flight at a time. Defaults to the client's ``concurrency``.
+
+        Returns:
+            list: The results, in the same order as the arguments.
+        """
+        args_iterator = enumerate(args_iterable)
+        results = {}
+
+        async def worker():
+            for i, kwargs in args_iterator:
+                results[i] = await method(**kwargs)
+
+        await asyncio.gather(*[worker() for _ in range(concurrency or self.concurrency)])
+        return [results[i] for i in range(len(results))]
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.sync.session.close()
+
+
+class AsyncMethodClient(object):
+    def __init__(self, client, url, method_name):
+        self.url = url + "." + method_name
+        self.client = client
+
+    async def schema(self):
+        return await self.client.fetch_schema(self.url)
+
+    async def __call__(self, *args, **kwargs):
+        return await self.client.request('POST', "{url};json".format(url=self.url), data=json.dumps(kwargs))
+
+
+class AsyncApplicationClient(object):
+    def __init__(self, client, url):
+        self.client = client
+        self.url = url
+
+    async def schema(self):
+        return await self.client.fetch_schema(self.url)
+
+    def method(self, name):
+        return AsyncMethodClient(self.client, self.url, name)
+
+    def __getitem__(self, item):
+        return AsyncCollectionClient(self, self.url + '/' + item)
+
+    def __getattr__(self, item):
+        """Return a method of the application. Underscores in the name are sent as dashes, as in method slugs."""
+        if item.startswith('_'):
+            raise AttributeError(item)
+        return self.method(item.replace('_', '-'))
+
+
+class AsyncCollectionClient(object):
+    def __init__(self, application, url):
+        self.client = application.client
+        self.application = application
+        self.url = url
+
+    async def schema(self):
+        return await self.client.fetch_schema(self.url)
+
+    async def primary_key(self):
+        return (await self.schema()).get('primary_key', 'id')
+
+    def method(self, name):
+        return AsyncMethodClient(self.client, self.url, name)
+
+    def __getattr__(self, item):
+        """Return a method of the collection. Underscores in the name are sent as dashes, as in method slugs."""
+        if item.startswith('_'):
+            raise AttributeError(item)
+        return self.method(item.replace('_', '-'))
+
+    async def get(self, key):
+        return await self.client.request('GET', "{url}/{key};json".format(url=self.url, key=key))
+
+    async def get_many(self, keys, chunk_size=200):
+        """Get documents by primary key, ``chunk_size`` keys per request.
+
+        Returns:
+            list: The documents, in the same order as ``keys``.
+
+        Raises:
+            KeyError if any of the documents are not found.
+        """
+        keys = list(keys)
+        pk = await self.primary_key()
+        pages = await asyncio.gather(*[
+            self.client.request('GET', "{url};json".format(url=self.url), params={'keys': json.dumps(chunk)})
+            for chunk in chunks(keys, chunk_size)])
+
+        found = {doc[pk]: doc for page in pages for doc in page}
+        missing = [k for k in keys if k not in found]
+        if missing:
+            raise KeyError('{0} not found in {1}'.format(', '.join(str(k) for k in missing), self.url))
+        return [found[k] for k in keys]
+
+    async def create(self, value):
+        return await self.client.request('POST', "{url};json".format(url=self.url), data=json.dumps(value))
+
+    async def create_many(self, values, chunk_size=100):
+        """Create documents, ``chunk_size`` per request, with several requests in flight at a time.
+
+        Returns:
+            list: The primary keys of the new documents, in the same order as ``values``.
+        """
+        pages = await asyncio.gather(*[self.create(chunk) for chunk in chunks(values, chunk_size)])
+        return [key for page in pages for key in page]
+
+    async def save(self, key, value):
+        return await self.client.request('PUT', "{url}/{key};json".format(url=self.url, key=key),
+                                         data=json.dumps(value))
+
+    async def delete(self, key):
+        return await self.client.request('DELETE', "{url}/{key};json".format(url=self.url, key=key))
+
+    async def query(self, **query):
+        return await self.client.request('GET', "{url};json".format(url=self.url), params=query)
+
+    async def map_method(self, name, args_iterable, concurrency=None):
+        """Call a method of the collection once for each set of arguments. See :meth:`AsyncClient.map_method`"""
+        return await self.client.map_method(self.method(name), args_iterable, concurrency)
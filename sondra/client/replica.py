@@ -0,0 +1,186 @@
+"""Local replicas of remote collections.
+
+A :class:`Replica` keeps a copy of a collection in SQLite, in a file or in memory, and keeps it current by pulling
+deltas from the collection's ``;sync`` endpoint (see :meth:`sondra.collection.Collection.sync`). A
+:class:`sondra.client.CollectionClient` with a replica answers lookups by key and simple equality queries locally::
+
+    units = client['reference']['units']
+    units.replicate('units.sqlite3', interval=300)
+    units['kg']['factor']  # no request made
+
+Writes made through the client mark the replica's copy of the document stale. Lookups of a stale document, and every
+query while any document is stale, go to the server until a pull brings the change into the replica. Writes made
+elsewhere are seen after the next pull.
+
+The remote collection must set ``sync_field``.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+
+class Replica(object):
+    """A local copy of a remote collection, refreshed by periodic delta pulls.
+
+    Args:
+        collection (CollectionClient): The collection to replicate.
+        path (str=':memory:'): The SQLite database to keep the replica in. Replicas in files survive restarts, and only
+            changes since the last pull are fetched on the first pull after a restart.
+        interval (float=60): Seconds between pulls. If None, the replica is only pulled by calling :meth:`pull`.
+        page_size (int): The most documents to ask for per request. Defaults to the server's limit.
+    """
+    def __init__(self, collection, path=':memory:', interval=60, page_size=None):
+        self.collection = collection
+        self.path = path
+        self.interval = interval
+        self.page_size = page_size
+        self.primary_key = collection.schema.get('primary_key', 'id')
+        self.log = logging.getLogger(self.__class__.__name__ + '.' + collection.url)
+
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS documents (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS stale (key TEXT PRIMARY KEY)")
+        self._db.commit()
+
+        self._stopped = threading.Event()
+        self._thread = None
+        self.last_pull = None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM documents").fetchone()[0]
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    @property
+    def checkpoint(self):
+        """The checkpoint of the last pull, or None if the replica has never been pulled."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE name = 'checkpoint'").fetchone()
+        return row[0] if row else None
+
+    @property
+    def stale(self):
+        """Whether any document has been written through the client and the change is yet to be pulled."""
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM stale").fetchone()[0] > 0
+
+    def start(self):
+        """Pull now, then keep pulling every ``interval`` seconds in a background thread."""
+        self.pull()
+        if self.interval and self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='Replica-' + self.collection.url, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop pulling in the background."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        """Stop pulling and close the SQLite database."""
+        self.stop()
+        with self._lock:
+            self._db.close()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.pull()
+            except Exception as e:
+                self.log.warning("Could not pull {0}: {1}".format(self.collection.url, e))
+
+    def pull(self):
+        """Fetch and apply everything that has changed since the last pull.
+
+        Returns:
+            int: The number of documents inserted, updated, or deleted.
+        """
+        count = 0
+        more = True
+        while more:
+            params = {'bare_keys': 'true'}
+            if self.checkpoint:
+                params['since'] = self.checkpoint
+            if self.page_size:
+                params['limit'] = self.page_size
+
+            delta = self.collection.client.request('GET', self.collection.url + ';sync', params=params)
+            self.apply(delta)
+            count += len(delta['documents']) + len(delta['deleted'])
+            more = delta['more']
+
+        self.last_pull = time.time()
+        return count
+
+    def apply(self, delta):
+        """Apply the response of one ``;sync`` request. Documents it changes are no longer stale."""
+        with self._lock:
+            self._db.executemany(
+                "DELETE FROM stale WHERE key = ?",
+                [(self._key(doc[self.primary_key]),) for doc in delta['documents']] +
+                [(self._key(key),) for key in delta['deleted']])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO documents (key, value) VALUES (?, ?)",
+                [(self._key(doc[self.primary_key]), json.dumps(doc)) for doc in delta['documents']])
+            self._db.executemany(
+                "DELETE FROM documents WHERE key = ?",
+                [(self._key(key),) for key in delta['deleted']])
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('checkpoint', ?)", (delta['checkpoint'],))
+            self._db.commit()
+
+    def invalidate(self, key):
+        """Mark a document stale, so that it, and every query, is fetched from the server until a pull brings its
+        change."""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO stale (key) VALUES (?)", (self._key(key),))
+            self._db.commit()
+
+    def clear(self):
+        """Forget every document and the checkpoint, so that the next pull fetches the whole collection."""
+        with self._lock:
+            self._db.execute("DELETE FROM documents")
+            self._db.execute("DELETE FROM meta")
+            self._db.execute("DELETE FROM stale")
+            self._db.commit()
+
+    def get(self, key):
+        """Get a document's value by primary key.
+
+        Returns:
+            dict: The document, or None if it is not in the replica or is stale.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM documents WHERE key = ? AND key NOT IN (SELECT key FROM stale)",
+                (self._key(key),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def filter(self, **query):
+        """Find documents whose top-level properties equal the values given.
+
+        Returns:
+            list: The matching documents' values.
+        """
+        clauses = ' AND '.join("json_extract(value, ?) = json_extract(?, '$')" for _ in query)
+        params = []
+        for prop, value in query.items():
+            params.extend(('$."{0}"'.format(prop), json.dumps(value)))
+
+        sql = "SELECT value FROM documents" + (" WHERE " + clauses if clauses else "")
+        with self._lock:
+            return [json.loads(row[0]) for row in self._db.execute(sql, params)]
+
+    @staticmethod
+    def _key(key):
+        return json.dumps(key)
@@ -1,16 +1,27 @@
 import logging
 import logging.config
+import time
 from abc import ABCMeta
 from collections.abc import MutableMapping
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy, copy
+from datetime import datetime, timedelta, timezone
 
 import jsonschema
 import rethinkdb as r
 
 from sondra import help, utils
+from sondra.aio import AsyncDocumentIterator, in_thread
 from sondra.api.expose import method_schema, expose_method_explicit
+from sondra.collection.buffered_writer import BufferedWriter
+from sondra.collection.changes import ChangeFeed
+from sondra.collection import outbox, sync
+from sondra.collection.operators import FieldOperator
 from sondra.collection.query_set import QuerySet, RawQuerySet
 from sondra.document import Document, signals as doc_signals
+from sondra.document.processors import DerivedProperty, DocumentProcessor, TimestampOnUpdate
+from sondra.document.schema_parser import ValueHandler, ForeignKey, ListHandler, DateTime
 from sondra.exceptions import ValidationError
 from sondra.utils import mapjson, resolve_class, split_camelcase
 from . import signals
@@ -149,6 +160,32 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
           can be very useful for collections whose data should never be available over the 'net.
         specials (dict): A dictionary of properties to be treated specially.
         indexes ([str])
+        auto_index_foreign_keys (bool=True): Create a secondary index for every foreign key property, so reverse
+          relations can use ``get_all`` instead of scanning the table.
+        foreign_keys (dict): read-only. Set by the application. Property names to ``(ForeignKey, multi)``.
+        read_connection (str): The name of the connection in the suite's ``connection_config`` to read from. Defaults
+          to the application's read connection. After init, the connection itself.
+        write_connection (str): The name of the connection to write to. Defaults to the application's write
+          connection. After init, the connection itself.
+        read_mode (str): ``single``, ``majority`` or ``outdated``. The RethinkDB read mode of reads by primary key,
+          of iterating and counting the collection, and of API listings. ``outdated`` reads may be served by
+          secondary replicas and be slightly stale. Defaults to RethinkDB's own default, ``single``.
+        sync_field (str): A date-time property to enable delta sync with (see :meth:`sync`). It is stamped on every
+          save and patch, and indexed with the primary key, and deletes are recorded in a tombstone table.
+          :meth:`ensure_indexes` stamps documents saved before it was set.
+        sync_lag (float=5): Seconds behind the present that sync checkpoints are set, to allow for clock skew between
+          application servers and for writes in flight.
+        sync_page_size (int=1000): The most documents returned by one call to :meth:`sync`.
+        ttl_field (str): A date-time or epoch-seconds property that documents expire by (see :meth:`sweep_expired`).
+          It is indexed. Documents without it never expire.
+        ttl (float): Seconds after the time in ``ttl_field`` that documents expire. If None, ``ttl_field`` holds the
+          expiry time itself.
+        ttl_sweep_batch (int=1000): The most expired documents deleted per query when sweeping.
+        bulk_write_batch (int=10000): The most documents :meth:`patch_query` and :meth:`delete_query` write per query
+          when they need the changes, which RethinkDB stops returning after 100,000.
+        deferred_signals (bool=False): Write post-save and post-delete events for receivers connected with
+          ``deferred=True`` to an outbox table, in the same query as each write, to be delivered in the background.
+          Deferred receivers are not called for collections without it. See :mod:`sondra.collection.outbox`.
         relations (dict)
         anonymous_reads (bool=True)
         abstract (bool)
@@ -177,6 +214,21 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
     autocomplete_props = None
     order_by = None
     order_by_index = None
+    auto_index_foreign_keys = True
+    foreign_keys = None
+    read_connection = None
+    write_connection = None
+    read_mode = None
+    sync_field = None
+    sync_lag = 5
+    sync_page_size = 1000
+    ttl_field = None
+    ttl = None
+    ttl_sweep_batch = 1000
+    bulk_write_batch = 10000
+    deferred_signals = False
+
+    READ_MODES = {'single', 'majority', 'outdated'}
 
     @property
     def suite(self):
@@ -189,6 +241,32 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
     def table(self):
         return r.db(self.application.db).table(self.name)
 
+    def read_table(self, read_mode=None):
+        """The collection's table, to be read with the given read mode.
+
+        Args:
+            read_mode (str): ``single``, ``majority`` or ``outdated``. Defaults to the collection's ``read_mode``.
+
+        Returns:
+            ReQL
+        """
+        read_mode = read_mode or self.read_mode
+        if not read_mode:
+            return self.table
+        elif read_mode not in self.READ_MODES:
+            raise ValidationError("Unknown read mode {0}. Should be one of {1}".format(
+                read_mode, ', '.join(sorted(self.READ_MODES))))
+        else:
+            return r.db(self.application.db).table(self.name, read_mode=read_mode)
+
+    @property
+    def async_read_pool(self):
+        return self.suite.async_connection_pool(self.read_connection_name)
+
+    @property
+    def async_write_pool(self):
+        return self.suite.async_connection_pool(self.write_connection_name)
+
     @property
     def url(self):
         if self._url:
@@ -206,7 +284,8 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
         if self.abstract:
             raise CollectionException("Tried to instantiate an abstract collection")
 
-        signals.pre_init.send(self.__class__, instance=self)
+        if signals.pre_init.has_receivers_for(self.__class__):
+            signals.pre_init.send(self.__class__, instance=self)
         self.title = self.document_class.title
         self.application = application
         self._url = '/'.join((self.application.url, self.slug))
@@ -214,13 +293,19 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
         self.schema = mapjson(lambda x: x(context=self.application.suite) if callable(x) else x, self.schema)
         self.log = logging.getLogger(self.application.name + "." + self.name)
 
+        self.read_connection_name = self.read_connection or self.application.read_connection_name
+        self.write_connection_name = self.write_connection or self.application.write_connection_name
+        self.read_connection = self.suite.connections[self.read_connection_name]
+        self.write_connection = self.suite.connections[self.write_connection_name]
+
         if self.autocomplete_props is None:
             self.autocomplete_props = (self.primary_key,)
 
         if self.file_storage:
             self.file_storage = self.file_storage(self)
 
-        signals.post_init.send(self.__class__, instance=self)
+        if signals.post_init.has_receivers_for(self.__class__):
+            signals.post_init.send(self.__class__, instance=self)
 
     def __str__(self):
         return self.url
@@ -273,17 +358,106 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
 
         return builder.rst
 
+    @property
+    def all_indexes(self):
+        """The declared indexes plus, if ``auto_index_foreign_keys`` is set, an index for every foreign key."""
+        indexes = list(self.indexes)
+        if self.auto_index_foreign_keys:
+            declared = self.index_names(indexes)
+            indexes.extend(k for k in (self.foreign_keys or {}) if k not in declared)
+        if self.sync_field and self.sync_field not in self.index_names(indexes):
+            indexes.append(self.sync_field)
+        if self.sync_field:
+            field, pk = self.sync_field, self.primary_key
+            indexes.append((self.sync_index, lambda doc: [doc[field], doc[pk]]))
+        if self.ttl_field and self.ttl_field not in self.index_names(indexes):
+            indexes.append(self.ttl_field)
+        return indexes
+
+    @staticmethod
+    def index_names(indexes):
+        return {i[0] if isinstance(i, tuple) else i for i in indexes}
+
     def ensure_indexes(self):
-        existing_indexes = {i for i in self.table.index_list().run(self.application.connection)}
-        required_indexes = set(self.indexes)
+        """Create the indexes in :attr:`all_indexes` that are missing and drop those that are no longer declared.
+
+        Returns:
+            set: The names of the indexes created.
+        """
+        existing_indexes = {i for i in self.table.index_list().run(self.write_connection)}
+        required_indexes = {(i[0] if isinstance(i, tuple) else i): i for i in self.all_indexes}
         extra_indexes = existing_indexes.difference(required_indexes)
-        missing_indexes = required_indexes.difference(existing_indexes)
+        missing_indexes = [required_indexes[i] for i in set(required_indexes).difference(existing_indexes)]
 
         if missing_indexes:
             self._create_indexes(missing_indexes)
 
+        created = self.index_names(missing_indexes)
+
+        if self.sync_field:
+            self._create_tombstone_table()
+            if self.sync_index in created:  # sync was just enabled
+                self.backfill_sync_field()
+        if self.deferred_signals:
+            self._create_outbox_table()
+
         for index in extra_indexes:
-            self.table.index_drop(index).run(self.application.connection)
+            self.table.index_drop(index).run(self.write_connection)
+        return created
+
+    def find_foreign_keys(self):
+        """Find the properties of this collection's documents that are foreign keys.
+
+        Returns:
+            OrderedDict: property name to ``(ForeignKey, multi)``, where multi is True for arrays of foreign keys.
+        """
+        foreign_keys = OrderedDict()
+        for k, v in sorted(self.document_class.specials.items()):
+            if isinstance(v, ForeignKey):
+                foreign_keys[k] = (v, False)
+            elif isinstance(v, ListHandler) and isinstance(v.sub_handler, ForeignKey):
+                foreign_keys[k] = (v.sub_handler, True)
+        return foreign_keys
+
+    def reverse_query(self, target, keys, related_key=None, related_index=None, table=None):
+        """Select the documents in this collection whose foreign keys refer to any of the given documents.
+
+        Foreign keys are indexed by default (see ``auto_index_foreign_keys``), so this is usually a single ``get_all``.
+
+        Args:
+            target (Collection): The collection the foreign keys refer to.
+            keys (list): Primary keys of documents in ``target``.
+            related_key (:obj:`str`, optional): The foreign key property to search. If none, defaults to the first
+                foreign key to ``target``.
+            related_index (:obj:`str`, optional): The name of an index to search instead.
+            table (:obj:`ReQL`, optional): This collection's table, to select from. Defaults to :meth:`read_table`, so
+                that reads use the collection's ``read_mode``. Pass ``self.table`` to write to the selection.
+
+        Returns:
+            ReQL: a selection of this collection's table.
+
+        Raises:
+            KeyError: If no foreign key to ``target`` is specified and none can be found.
+        """
+        if table is None:
+            table = self.read_table()
+        if related_index:
+            return table.get_all(*keys, index=related_index)
+
+        if not related_key:
+            related_keys = self.suite.related_keys(target, self)
+            if not related_keys:
+                raise KeyError("Cannot find any foreign keys to {0}/{1}".format(target.application.slug, target.slug))
+            related_key = related_keys[0]
+
+        foreign_keys = self.foreign_keys or {}
+        if related_key in self.index_names(self.indexes) or \
+                (self.auto_index_foreign_keys and related_key in foreign_keys):
+            return table.get_all(*keys, index=related_key)
+        elif related_key in foreign_keys and foreign_keys[related_key][1]:
+            return table.filter(lambda x: x[related_key].default([]).set_intersection(keys).count() > 0)
+        else:
+            return table.filter(lambda x: r.expr(keys).contains(x[related_key].default(None)))
 
     def validate_documents(self, batch_exceptions=True):
         validation_exceptions = {}
@@ -305,7 +479,7 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
             else:
                 index_function = None
 
-            if self.schema['properties'][index].get('type', None) == 'array':
+            if self.schema['properties'].get(index, {}).get('type', None) == 'array':
                 multi = True
             else:
                 multi = False
@@ -318,59 +492,216 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
             try:
                 if index_function:
                     self.table.index_create(index, index_function, multi=multi, geo=geo).run(
-                        self.application.connection)
+                        self.write_connection)
                 else:
-                    self.table.index_create(index, multi=multi, geo=geo).run(self.application.connection)
-                self.table.index_wait(index).run(self.application.connection)
+                    self.table.index_create(index, multi=multi, geo=geo).run(self.write_connection)
+                self.table.index_wait(index).run(self.write_connection)
                 self.log.info('Created Index {2} on table {0}.{1}'.format(self.application.db, self.name, index))
             except r.ReqlError as e:
                 self.log.info(
                     'Index {2} on table {0}.{1} already exists.'.format(self.application.db, self.name, index))
 
+    @property
+    def tombstone_table_name(self):
+        return self.name + '__tombstones'
+
+    @property
+    def tombstones(self):
+        """The table of deleted primary keys, if ``sync_field`` is set."""
+        return r.db(self.application.db).table(self.tombstone_table_name)
+
+    def _create_tombstone_table(self):
+        try:
+            r.db(self.application.db).table_create(self.tombstone_table_name).run(self.write_connection)
+        except r.ReqlError:
+            pass
+        try:
+            self.tombstones.index_create('deleted_at').run(self.write_connection)
+            self.tombstones.index_wait('deleted_at').run(self.write_connection)
+        except r.ReqlError:
+            pass
+
+    @property
+    def outbox_table_name(self):
+        return self.name + '__outbox'
+
+    @property
+    def outbox(self):
+        """The table of undelivered deferred signals, if ``deferred_signals`` is set."""
+        return r.db(self.application.db).table(self.outbox_table_name)
+
+    def _create_outbox_table(self):
+        try:
+            r.db(self.application.db).table_create(self.outbox_table_name).run(self.write_connection)
+        except r.ReqlError:
+            pass
+        for name, fn in (outbox.QUEUE_INDEX, outbox.CLAIMED_INDEX):
+            try:
+                self.outbox.index_create(name, fn).run(self.write_connection)
+                self.outbox.index_wait(name).run(self.write_connection)
+            except r.ReqlError:
+                pass
+
+    def _deferred(self, signal):
+        if not self.deferred_signals:
+            return []
+        return doc_signals.deferred_receivers(signal, self.document_class)
+
+    def _deferred_write(self, signal, write, *args, **kwargs):
+        """Build a write query, recording events for the signal's deferred receivers in the outbox in the same query.
+
+        Returns:
+            (ReQL, bool): The query, and whether to drop ``changes`` from its result.
+        """
+        receivers = self._deferred(signal)
+        if not receivers:
+            return write(*args, **kwargs), False
+        strip = not kwargs.get('return_changes')
+        kwargs['return_changes'] = kwargs.get('return_changes') or True
+        return outbox.record(self, write(*args, **kwargs), signal, receivers), strip
+
+    def prepare_sync(self):
+        """Make sure the ``sync_field`` is stamped on every save and patch. Called by the application.
+
+        Raises:
+            CollectionException: if the sync field is not a date-time property.
+        """
+        if not isinstance(self.document_class.specials.get(self.sync_field), DateTime):
+            raise CollectionException("sync_field {0} of {1} must be a date-time property".format(
+                self.sync_field, self.url))
+
+        if not any(isinstance(p, TimestampOnUpdate) and p.dest_prop == self.sync_field
+                   for p in self.document_class.processors):
+            self.document_class.processors = list(self.document_class.processors) + [
+                TimestampOnUpdate(self.sync_field)]
+
+    @property
+    def sync_index(self):
+        """The name of the compound ``[sync_field, primary_key]`` index that sync pages through."""
+        return self.sync_field + '__sync'
+
+    def backfill_sync_field(self):
+        """Stamp the ``sync_field`` on documents saved before sync was enabled, so that they are synced too. Called
+        by :meth:`ensure_indexes` when it creates the sync index. This scans the whole table.
+
+        Returns:
+            int: The number of documents stamped.
+        """
+        ret = self.table.filter(lambda doc: doc.has_fields(self.sync_field).not_())\
+            .update({self.sync_field: r.now()}).run(self.write_connection)
+        return ret.get('replaced', 0)
+
+    def _tombstone_query(self, docs):
+        pk = self.primary_key
+        return self.tombstones.insert(
+            r.expr(docs).map(lambda doc: {'id': doc[pk], 'deleted_at': r.now(), 'doc': doc}), conflict='replace')
+
+    def _delete_write(self, selection, **kwargs):
+        """Build a delete of a selection that, in the same query, records tombstones if ``sync_field`` is set, and
+        events for deferred receivers.
+
+        Returns:
+            (ReQL, bool): The query, and whether to drop ``changes`` from its result.
+        """
+        strip = not kwargs.get('return_changes')
+        if self.sync_field:
+            kwargs['return_changes'] = kwargs.get('return_changes') or True
+        q, _ = self._deferred_write(doc_signals.post_delete, selection.delete, **kwargs)
+        if self.sync_field:
+            q = q.do(lambda ret: self._tombstone_query(
+                ret['changes'].default([]).filter(lambda c: c['old_val'].ne(None)).map(lambda c: c['old_val'])
+            ).do(lambda _: ret))
+        return q, strip
+
+    def record_deletes(self, docs):
+        """Record tombstones for deleted documents, as they were before they were deleted, if ``sync_field`` is set.
+        Tombstones keep the document so that sync can apply the same filters to deletes as to saves."""
+        if self.sync_field and docs:
+            self._tombstone_query(list(docs)).run(self.write_connection)
+
+    def sync(self, since=None, limit=None, filters=(), authorize=None):
+        """Get what has changed since a checkpoint, for clients that keep a replica of the collection.
+
+        Requires ``sync_field``. See :mod:`sondra.collection.sync`.
+
+        Args:
+            since (str): A checkpoint from an earlier sync. If None, every document is returned.
+            limit (int): The most documents to return. Defaults to ``sync_page_size``.
+            filters ([ReQL]): Predicates limiting the documents returned, e.g. authorization filters.
+            authorize (callable): Takes a list of documents and returns those the caller may see. Documents it
+                hides are left out, and reported as deleted if they were updated.
+
+        Returns:
+            dict: ``checkpoint``, the checkpoint to pass next time; ``more``, True if there are more changes to fetch
+            right away; ``inserted``, ``updated`` and ``deleted``, lists of primary keys; and ``documents``, the
+            inserted and updated documents. Without a ``TimestampOnCreate`` processor, inserts after the first sync
+            are reported as updates.
+
+        Raises:
+            ValidationError if the collection does not support sync, or the checkpoint is invalid.
+        """
+        if not self.sync_field:
+            raise ValidationError("{0} does not support sync".format(self.url))
+        return sync.changes_since(self, since=since, limit=limit, filters=filters, authorize=authorize)
+
     def create_table(self, *args, **kwargs):
         """Create the database table for this collection. Args and keyword args are sent along to the rethinkdb
         table_create function.  Sends pre_table_creation and post_table_creation signals.
         """
-        signals.pre_table_creation.send(
-            self.__class__, instance=self, table_name=self.name, db_name=self.application.db)
+        if signals.pre_table_creation.has_receivers_for(self.__class__):
+            signals.pre_table_creation.send(
+                self.__class__, instance=self, table_name=self.name, db_name=self.application.db)
 
         try:
             r.db(self.application.db)\
                 .table_create(self.name, primary_key=self.primary_key, *args, **kwargs)\
-                .run(self.application.connection)
+                .run(self.write_connection)
         except r.ReqlError as e:
             self.log.info('Table {0}.{1} already exists.'.format(self.application.db, self.name))
 
-        self._create_indexes(self.indexes)
-        signals.post_table_creation.send(
-            self.__class__, instance=self, table_name=self.name, db_name=self.application.db)
+        self._create_indexes(self.all_indexes)
+        if self.sync_field:
+            self._create_tombstone_table()
+        if self.deferred_signals:
+            self._create_outbox_table()
+        if signals.post_table_creation.has_receivers_for(self.__class__):
+            signals.post_table_creation.send(
+                self.__class__, instance=self, table_name=self.name, db_name=self.application.db)
 
     def drop_table(self):
         """Delete the database table for this collection. Sends pre_table_deletion and post_table_deletion signals.
         """
 
-        signals.pre_table_deletion.send(
-            self.__class__, instance=self, table_name=self.name, db_name=self.application.db)
+        if signals.pre_table_deletion.has_receivers_for(self.__class__):
+            signals.pre_table_deletion.send(
+                self.__class__, instance=self, table_name=self.name, db_name=self.application.db)
 
-        ret = r.db(self.application.db).table_drop(self.name).run(self.application.connection)
+        ret = r.db(self.application.db).table_drop(self.name).run(self.write_connection)
+        if self.sync_field:
+            r.db(self.application.db).table_drop(self.tombstone_table_name).run(self.write_connection)
+        if self.deferred_signals:
+            r.db(self.application.db).table_drop(self.outbox_table_name).run(self.write_connection)
         self.log.info('Dropped table {0}.{1}'.format(self.application.db, self.name))
 
-        signals.post_table_deletion.send(
-            self.__class__, instance=self, table_name=self.name, db_name=self.application.db)
+        if signals.post_table_deletion.has_receivers_for(self.__class__):
+            signals.post_table_deletion.send(
+                self.__class__, instance=self, table_name=self.name, db_name=self.application.db)
 
         return ret
 
     def clear_table(self):
-        signals.pre_table_clear.send(
-            self.__class__, instance=self, table_name=self.name, db_name=self.application.db)
+        if signals.pre_table_clear.has_receivers_for(self.__class__):
+            signals.pre_table_clear.send(
+                self.__class__, instance=self, table_name=self.name, db_name=self.application.db)
 
         try:
             self.q(self.table.delete())
         except:
             self.create_table()
 
-        signals.post_table_clear.send(
-            self.__class__, instance=self, table_name=self.name, db_name=self.application.db)
+        if signals.post_table_clear.has_receivers_for(self.__class__):
+            signals.post_table_clear.send(
+                self.__class__, instance=self, table_name=self.name, db_name=self.application.db)
 
     def __hash__(self):
         return hash(self.name)
@@ -390,12 +721,37 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
         if isinstance(key, Document):  # handle the case where our primary key is a foreign key and the user passes in the instance.
             key = key.id
 
-        doc = self.table.get(key).run(self.application.connection)
-        if doc:
+        doc = self.read_table().get(key).run(self.read_connection)
+        if doc and not self.expired(doc):
             return self.document_class(doc, collection=self, from_db=True)
         else:
             raise KeyError('{0} not found in {1}'.format(key, self.url))
 
+    def get_many(self, keys, read_mode=None):
+        """Get several objects from the database in a single round trip.
+
+        Args:
+            keys ([str or int or Document]): Primary keys for the documents.
+            read_mode (str): Overrides the collection's ``read_mode``.
+
+        Returns:
+            [Document]: Instances of self.document_class in the same order as ``keys``.
+
+        Raises:
+            KeyError if any of the objects are not found in the database.
+        """
+        keys = [k.id if isinstance(k, Document) else k for k in keys]
+        if not keys:
+            return []
+
+        found = {doc[self.primary_key]: doc for doc in self.read_table(read_mode).get_all(*keys).run(self.read_connection)
+                 if not self.expired(doc)}
+        missing = [k for k in keys if k not in found]
+        if missing:
+            raise KeyError('{0} not found in {1}'.format(', '.join(str(k) for k in missing), self.url))
+
+        return [self.document_class(found[k], collection=self, from_db=True) for k in keys]
+
     def __setitem__(self, key, value):
         """Add or replace a document object to the database.
 
@@ -406,7 +762,7 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
             value: (dict or Document): If a Document, it should be this collection's document_class.
         """
         value[self.primary_key] = key
-        return self.save(value, conflict='replace').run(self.application.connection)
+        return self.save(value, conflict='replace').run(self.write_connection)
 
     def __delitem__(self, key):
         """Delete an object from the database.
@@ -416,13 +772,18 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
         Args:
             key (str or int): The primary key for the document.
         """
-        doc_signals.pre_delete.send(self.document_class, key=key)
-        results = self.table.get(key).delete().run(self.application.connection)
-        doc_signals.post_delete.send(self.document_class, results=results)
+        if doc_signals.pre_delete.has_receivers_for(self.document_class):
+            doc_signals.pre_delete.send(self.document_class, key=key)
+        q, strip = self._delete_write(self.table.get(key))
+        results = q.run(self.write_connection)
+        if strip:
+            results.pop('changes', None)
+        if doc_signals.post_delete.has_receivers_for(self.document_class):
+            doc_signals.post_delete.send(self.document_class, results=results)
 
     def __iter__(self):
-        query = self.apply_ordering(self.table).get_field(self.primary_key)
-        for k in query.run(self.application.connection):
+        query = self.apply_ordering(self.read_table()).get_field(self.primary_key)
+        for k in query.run(self.read_connection):
             yield k
 
     def __contains__(self, item):
@@ -441,11 +802,11 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
         else:
             key = item
 
-        doc = self.table.get(key).run(self.application.connection)
-        return doc is not None
+        doc = self.read_table().get(key).run(self.read_connection)
+        return doc is not None and not self.expired(doc)
 
     def __len__(self):
-        return self.table.count().run(self.application.connection)
+        return self.read_table().count().run(self.read_connection)
 
     def q(self, query):
         """Perform a query on this collection's database connection.
@@ -456,14 +817,75 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
         Yields:
             Document instances.
         """
-        for doc in query.run(self.application.connection):
-            meta = {}
-            if 'doc' in doc:
-                meta = doc
-                doc = doc['doc']  # some queries return results that encapsulate the document with metadata
-                del meta['doc']
+        for doc in query.run(self.read_connection):
+            if not self.expired(doc):
+                yield self._from_db(doc)
+
+    def aq(self, query):
+        """Perform a query on this collection's asyncio connection pool.
+
+        Args:
+            query (ReQL): Should be a RethinkDB query that returns documents for this collection.
+
+        Returns:
+            An asynchronous iterator of Document instances, for use with ``async for``.
+        """
+        return AsyncDocumentIterator(self, query)
+
+    def _ttl_is_epoch(self):
+        prop = self.schema.get('properties', {}).get(self.ttl_field, {})
+        return prop.get('type') in ('number', 'integer')
+
+    def expired(self, doc):
+        """Whether a document, or a document's value as read from the database, has expired. See ``ttl_field``."""
+        if not self.ttl_field:
+            return False
+        stamp = doc.get(self.ttl_field, None)
+        if stamp is None:
+            return False
+
+        if isinstance(stamp, (int, float)):
+            return stamp + (self.ttl or 0) <= time.time()
+        elif isinstance(stamp, datetime):
+            if stamp.tzinfo is None:
+                stamp = stamp.replace(tzinfo=timezone.utc)
+            return stamp + timedelta(seconds=self.ttl or 0) <= datetime.now(timezone.utc)
+        return False
+
+    def expiry_cutoff(self):
+        """A ReQL expression for the ``ttl_field`` value at and before which documents have expired."""
+        if self._ttl_is_epoch():
+            return r.now().to_epoch_time() - (self.ttl or 0)
+        return r.now() - (self.ttl or 0)
+
+    def sweep_expired(self, batch_size=None):
+        """Delete expired documents, ``batch_size`` at a time, using the ``ttl_field`` index.
+
+        Deletes run through :meth:`delete_query`, so processors, signals and tombstones apply.
 
-            yield self.document_class(doc, collection=self, from_db=True, metadata=meta)
+        Returns:
+            int: The number of documents deleted.
+        """
+        if not self.ttl_field:
+            return 0
+
+        batch_size = batch_size or self.ttl_sweep_batch
+        total = 0
+        while True:
+            q = self.table.between(r.minval, self.expiry_cutoff(), index=self.ttl_field, right_bound='closed')
+            ret = self.delete_query(q.limit(batch_size))
+            total += ret.get('deleted', 0)
+            if ret.get('deleted', 0) < batch_size:
+                return total
+
+    def _from_db(self, doc):
+        meta = {}
+        if 'doc' in doc:
+            meta = doc
+            doc = doc['doc']  # some queries return results that encapsulate the document with metadata
+            del meta['doc']
+
+        return self.document_class(doc, collection=self, from_db=True, metadata=meta)
 
     def apply_ordering(self, query):
         if self.order_by_index and self.order_by:
@@ -537,8 +959,19 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
             The result of RethinkDB delete.
         """
         if not docs:
-            return self.table.delete(**kwargs).run(self.application.connection)
+            if self.sync_field or self._deferred(doc_signals.post_delete):
+                return self.delete_query(self.table, **kwargs)
+            return self.table.delete(**kwargs).run(self.write_connection)
+
+        docs, keys = self._prepare_delete(docs)
+        q, strip = self._delete_write(self.table.get_all(*keys), **kwargs)
+        ret = q.run(self.write_connection)
+        if strip:
+            ret.pop('changes', None)
+        self._finish_delete(docs)
+        return ret
 
+    def _prepare_delete(self, docs):
         if not isinstance(docs, list):
             docs = [docs]
 
@@ -550,15 +983,23 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
                 for p in value.processors:
                     p.run_before_delete(value)
 
-        values = [v.id if isinstance(v, Document) else v for v in docs]
-        ret = self.table.get_all(*values).delete(**kwargs).run(self.application.connection)
+        keys = [v.id if isinstance(v, Document) else v for v in docs]
+        if doc_signals.pre_delete.has_receivers_for(self.document_class):
+            for key in keys:
+                doc_signals.pre_delete.send(self.document_class, key=key)
+        return docs, keys
+
+    def _finish_delete(self, docs):
         for value in docs:
-            value.post_delete()
-        return ret
+            if isinstance(value, Document):
+                value.post_delete()
 
     def save(self, docs, **kwargs):
         """Save a document or list of documents to the database.
 
+        Sends pre-save with all the documents, post-save for each one, and a single post-save-batch with all of them,
+        to whichever of those signals have receivers.
+
         Args:
             docs (Document or [Document] or [dict]): List of documents to save.
             **kwargs: Passed to rethinkdb.save
@@ -566,15 +1007,25 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
         Returns:
             The result of the RethinkDB save.
         """
+        docs, values = self._prepare_save(docs)
+        q, strip = self._deferred_write(doc_signals.post_save, self.table.insert, values, **kwargs)
+        ret = q.run(self.write_connection)
+        if strip:
+            ret.pop('changes', None)
+        self._finish_save(docs, ret)
+        return ret
+
+    def _prepare_save(self, docs):
         if not isinstance(docs, list):
             docs = [docs]
 
         values = []
-        doc_signals.pre_save.send(self.document_class, docs=docs)
+        if doc_signals.pre_save.has_receivers_for(self.document_class):
+            doc_signals.pre_save.send(self.document_class, docs=docs)
 
         for doc in docs:
             if not isinstance(doc, Document):
-                doc = self.document_class(doc)
+                doc = self.document_class(doc, collection=self)
 
             for p in doc.processors:
                 p.run_before_save(doc)
@@ -585,20 +1036,535 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
             rql = doc.rql_repr()
             values.append(rql)
 
-        ret = self.table.insert(values, **kwargs).run(self.application.connection)
+        return docs, values
 
+    def _finish_save(self, docs, ret):
         if docs and isinstance(docs[0], Document):
-            for i, doc in enumerate(docs):
+            generated_keys = iter(ret.get('generated_keys', ()))
+            for doc in docs:
                 doc.saved = True
                 if 'generated_keys' in ret:
-                    doc.id = ret['generated_keys'][i]
+                    if not doc.obj.get(self.primary_key):  # keys are only generated for documents without one
+                        doc.id = next(generated_keys)
                     for s in doc.specials.values():
                         s.post_save(doc)
                 doc.post_save()
+
+            if doc_signals.post_save.has_receivers_for(self.document_class):
+                for doc in docs:
+                    doc_signals.post_save.send(self.document_class, instance=doc)
+            if doc_signals.post_save_batch.has_receivers_for(self.document_class):
+                doc_signals.post_save_batch.send(self.document_class, docs=docs)
+
+    def save_many(self, docs, chunk_size=500, concurrency=4, **kwargs):
+        """Save a large or unbounded number of documents in chunks, keeping several inserts in flight at once.
+
+        Documents are read from ``docs`` lazily, so at most ``chunk_size * (concurrency + 1)`` of them are held in
+        memory. Each chunk is validated and inserted on a pooled connection in its own worker thread, with the same
+        processors, specials and signals as :meth:`save`.
+
+        Args:
+            docs (iterable of Document or dict): The documents. May be a generator.
+            chunk_size (int=500): The number of documents per insert.
+            concurrency (int=4): The number of inserts in flight at once.
+            **kwargs: Passed to rethinkdb.insert
+
+        Yields:
+            dict: The result of each chunk's insert, in input order, with two more keys: ``start``, the position in
+            ``docs`` of the chunk's first document, and ``keys``, the primary key of every document in the chunk, so
+            the key of input ``i`` is ``result['keys'][i - result['start']]``.
+        """
+        def write(chunk):
+            try:
+                chunk = [doc if isinstance(doc, Document) else self.doc(doc) for doc in chunk]
+                chunk, values = self._prepare_save(chunk)
+                q, strip = self._deferred_write(doc_signals.post_save, self.table.insert, values, **kwargs)
+                ret = q.run(self.write_connection)
+                if strip:
+                    ret.pop('changes', None)
+                self._finish_save(chunk, ret)
+                ret['keys'] = [doc.obj.get(self.primary_key) for doc in chunk]
+                return ret
+            finally:
+                self.suite.release_connections()
+
+        def result(start, future):
+            ret = future.result()
+            ret['start'] = start
+            return ret
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            in_flight = deque()
+            start = 0
+            for chunk in utils.chunks(docs, chunk_size):
+                in_flight.append((start, pool.submit(write, chunk)))
+                start += len(chunk)
+                if len(in_flight) > concurrency:
+                    yield result(*in_flight.popleft())
+
+            while in_flight:
+                yield result(*in_flight.popleft())
+
+    def changes(self, query=None, include_initial=False, squash=False, buffer_size=None, retry_delay=1.0,
+                authorize=None):
+        """Subscribe to changes to the collection, or to the documents a query returns.
+
+        Args:
+            query (ReQL): A query over this collection that supports changefeeds, such as ``get``, ``get_all``,
+                ``between``, ``filter`` or ``order_by(index=...).limit(...)``. Defaults to the whole table.
+            include_initial (bool=False): Start with the query's current results, as ``initial`` changes.
+            squash (bool or float=False): Merge changes to the same document; a number is how many seconds to wait
+                while merging.
+            buffer_size (int): The most changes the server queues for a slow reader. Defaults to the server's
+                default, 100,000.
+            retry_delay (float=1.0): Seconds to wait before reconnecting after the connection is lost.
+            authorize (callable): Takes a list of documents and returns those the subscriber may see. Changes to
+                documents it hides are not reported. An update that hides a document is reported as a delete, and
+                one that reveals it as an insert.
+
+        Returns:
+            ChangeFeed: An iterator, synchronous and asynchronous, of :class:`sondra.collection.changes.Change`.
+        """
+        return ChangeFeed(self, self.table if query is None else query, include_initial=include_initial,
+                          squash=squash, buffer_size=buffer_size, retry_delay=retry_delay, authorize=authorize)
+
+    def buffered_writer(self, max_batch=200, max_delay_ms=20, durability='hard', **kwargs):
+        """Create a writer that coalesces saves from many threads into batched inserts.
+
+        Args:
+            max_batch (int=200): The most documents sent in one insert.
+            max_delay_ms (float=20): The longest a document waits for its batch to fill before it is written.
+            durability (str='hard'): Passed to rethinkdb.insert
+            **kwargs: Passed to :class:`sondra.collection.buffered_writer.BufferedWriter`
+
+        Returns:
+            BufferedWriter: Share it between producers, and close it (or use it as a context manager) when done.
+        """
+        return BufferedWriter(self, max_batch=max_batch, max_delay_ms=max_delay_ms, durability=durability, **kwargs)
+
+    async def aget(self, key, read_mode=None):
+        """Get an object from the database without blocking the event loop. See :meth:`__getitem__`."""
+        if isinstance(key, Document):
+            key = key.id
+
+        doc = await self.async_read_pool.run(self.read_table(read_mode).get(key))
+        if doc and not self.expired(doc):
+            return self.document_class(doc, collection=self, from_db=True)
+        else:
+            raise KeyError('{0} not found in {1}'.format(key, self.url))
+
+    async def asave(self, docs, **kwargs):
+        """Save a document or list of documents without blocking the event loop.
+
+        Processors, specials and signals run exactly as they do for :meth:`save`.
+        """
+        docs, values = self._prepare_save(docs)
+        q, strip = self._deferred_write(doc_signals.post_save, self.table.insert, values, **kwargs)
+        ret = await self.async_write_pool.run(q)
+        if strip:
+            ret.pop('changes', None)
+        self._finish_save(docs, ret)
+        return ret
+
+    async def adelete(self, docs=None, **kwargs):
+        """Delete a document or list of documents without blocking the event loop. See :meth:`delete`."""
+        if not docs:
+            if self.sync_field or self._deferred(doc_signals.post_delete):
+                return await in_thread(self.suite, self.delete_query, self.table, **kwargs)
+            return await self.async_write_pool.run(self.table.delete(**kwargs))
+
+        docs, keys = self._prepare_delete(docs)
+        q, strip = self._delete_write(self.table.get_all(*keys), **kwargs)
+        ret = await self.async_write_pool.run(q)
+        if strip:
+            ret.pop('changes', None)
+        self._finish_delete(docs)
+        return ret
+
+    def patch_query(self, query, updates, **kwargs):
+        """Update every document selected by a query on the server, without loading them first.
+
+        The update is validated and converted as in :meth:`patch`. Sends post-save for every changed document and a
+        single post-save-batch signal with all of them. If the changes are needed, for signals or the result, the
+        selected keys are read first and the documents updated ``bulk_write_batch`` at a time.
+
+        Args:
+            query (ReQL): A selection of this collection's table, e.g. ``coll.table.filter(...)``
+            updates (dict): Property names (or dotted paths) to new values or field operators.
+            **kwargs: Passed to rethinkdb.update
+
+        Returns:
+            The result of the RethinkDB update.
+        """
+        return_changes = kwargs.pop('return_changes', False)
+        needs_changes = return_changes or doc_signals.post_save.has_receivers_for(self.document_class) \
+            or doc_signals.post_save_batch.has_receivers_for(self.document_class) \
+            or self._deferred(doc_signals.post_save)
+
+        patch = self.patch_rql_repr(updates)
+        if not needs_changes:
+            q, _ = self._deferred_write(doc_signals.post_save, query.update, patch, **kwargs)
+            return q.run(self.write_connection)
+
+        ret = self._bulk_write(query, lambda selection: self._deferred_write(
+            doc_signals.post_save, selection.update, patch, return_changes=True, **kwargs)[0])
+        docs = [self.document_class(c['new_val'], collection=self, from_db=True) for c in ret.get('changes', [])]
+        if doc_signals.post_save.has_receivers_for(self.document_class):
+            for doc in docs:
                 doc_signals.post_save.send(self.document_class, instance=doc)
+        if doc_signals.post_save_batch.has_receivers_for(self.document_class):
+            doc_signals.post_save_batch.send(self.document_class, docs=docs)
+        if not return_changes:
+            ret.pop('changes', None)
+        return ret
+
+    def delete_query(self, query, **kwargs):
+        """Delete every document selected by a query on the server, without loading them first.
+
+        Processors and specials are run afterwards over the deleted documents (see
+        :meth:`sondra.document.processors.DocumentProcessor.run_after_batch_delete`), and a single post-delete-batch
+        signal is sent with all of them. If the changes are needed for these, for tombstones or for the result, the
+        selected keys are read first and the documents deleted ``bulk_write_batch`` at a time.
+
+        Args:
+            query (ReQL): A selection of this collection's table, e.g. ``coll.table.filter(...)``
+            **kwargs: Passed to rethinkdb.delete
+
+        Returns:
+            The result of the RethinkDB delete.
+        """
+        return_changes = kwargs.pop('return_changes', False)
+        needs_changes = return_changes or self._handles_deletes() \
+            or doc_signals.post_delete_batch.has_receivers_for(self.document_class) \
+            or self.sync_field or self._deferred(doc_signals.post_delete)
+
+        if not needs_changes:
+            q, _ = self._deferred_write(doc_signals.post_delete, query.delete, **kwargs)
+            return q.run(self.write_connection)
+
+        ret = self._bulk_write(query, lambda selection: self._deferred_write(
+            doc_signals.post_delete, selection.delete, return_changes=True, **kwargs)[0])
+        docs = [self.document_class(c['old_val'], collection=self, from_db=True) for c in ret.get('changes', [])]
+        self.record_deletes([c['old_val'] for c in ret.get('changes', [])])
+        self.after_batch_delete(docs)
+        if not return_changes:
+            ret.pop('changes', None)
+        return ret
+
+    def _bulk_write(self, query, write):
+        """Write the documents selected by a query ``bulk_write_batch`` at a time, so that none of their changes are
+        dropped from the result.
+
+        Args:
+            query (ReQL): A selection of this collection's table.
+            write (callable): Builds the write query, with ``return_changes`` set, for a selection of the table.
+
+        Returns:
+            dict: The results of the writes, added together, with all of their changes.
+        """
+        pk = self.primary_key
+        keys = list(query.get_field(pk).run(self.write_connection))
+        total = {}
+        for chunk in utils.chunks(keys, self.bulk_write_batch):
+            ret = write(self.table.get_all(*chunk)).run(self.write_connection)
+            for k, v in ret.items():
+                if isinstance(v, list):
+                    total.setdefault(k, []).extend(v)
+                elif isinstance(v, int):
+                    total[k] = total.get(k, 0) + v
+                else:
+                    total.setdefault(k, v)
+        return total or {'replaced': 0, 'unchanged': 0, 'skipped': 0, 'errors': 0, 'inserted': 0, 'deleted': 0,
+                         'changes': []}
+
+    def _handles_deletes(self):
+        return any(type(s).pre_delete is not ValueHandler.pre_delete for s in self.document_class.specials.values()) \
+            or any((type(p).run_before_delete is not DocumentProcessor.run_before_delete) or
+                   (type(p).run_after_batch_delete is not DocumentProcessor.run_after_batch_delete)
+                   for p in self.document_class.processors)
+
+    def after_batch_delete(self, docs):
+        """Run the document class's specials, processors and signals over documents deleted in bulk."""
+        for doc in docs:
+            for s in doc.specials.values():
+                s.pre_delete(doc)
+        for p in self.document_class.processors:
+            p.run_after_batch_delete(docs)
+        if doc_signals.post_delete_batch.has_receivers_for(self.document_class):
+            doc_signals.post_delete_batch.send(self.document_class, docs=docs)
+
+    def patch(self, key, updates, **kwargs):
+        """Update part of a document on the server without loading or re-sending the whole document.
+
+        Only the patched values are validated, against the schemas of the properties they target, and converted by
+        the collection's specials. Dotted keys (``"address.city"``) update nested properties, and a value of None
+        removes the property unless it is in the document class's ``store_nulls``. Values may also be atomic field
+        operators; see :meth:`apply`.
+
+        Sends the pre-save signal with ``key`` and ``updates`` rather than documents, as the document is not loaded,
+        and the post-save signal with the updated document. Properties derived from patched ones (see
+        :class:`sondra.document.processors.DerivedProperty`) are derived from the updated document and written in a
+        second update, which is skipped if the patched properties have changed again in the meantime.
+
+        Args:
+            key (str or int or Document): The primary key of the document to update.
+            updates (dict): Property names (or dotted paths) to new values.
+            **kwargs: Passed to rethinkdb.update
+
+        Returns:
+            Document: The updated document. Its ``metadata`` is the result of the RethinkDB update.
+
+        Raises:
+            KeyError if the document is not in the database.
+            ValidationError if a patched value does not conform to its property schema.
+        """
+        if isinstance(key, Document):
+            key = key.id
+
+        if doc_signals.pre_save.has_receivers_for(self.document_class):
+            doc_signals.pre_save.send(self.document_class, key=key, updates=updates)
+
+        kwargs['return_changes'] = 'always'
+        q, _ = self._deferred_write(doc_signals.post_save, self.table.get(key).update, self.patch_rql_repr(updates),
+                                    **kwargs)
+        ret = q.run(self.write_connection)
+        if ret['skipped']:
+            raise KeyError('{0} not found in {1}'.format(key, self.url))
+        if ret['errors']:
+            raise r.ReqlRuntimeError(ret['first_error'])
 
+        new_val = ret['changes'][0]['new_val']
+        doc = self._rederive([new_val], {new_val[self.primary_key]: updates}, ret)[0]
+
+        if doc_signals.post_save.has_receivers_for(self.document_class):
+            doc_signals.post_save.send(self.document_class, instance=doc)
+        return doc
+
+    def patch_many(self, updates, **kwargs):
+        """Patch several documents, each with its own updates, in a single server-side operation.
+
+        Each document's updates are validated and converted as in :meth:`patch`. Sends pre-save with ``keys`` and
+        ``updates``, post-save for every changed document, and a single post-save-batch signal with all of them.
+
+        Args:
+            updates (dict): Primary keys to dicts of property names (or dotted paths) to new values or field
+              operators.
+            **kwargs: Passed to rethinkdb.update
+
+        Returns:
+            The result of the RethinkDB update.
+
+        Raises:
+            KeyError if any of the documents is not in the database. The others are still updated.
+            ValidationError if a patched value does not conform to its property schema.
+        """
+        if not updates:
+            return {'replaced': 0, 'unchanged': 0, 'skipped': 0, 'errors': 0, 'inserted': 0, 'deleted': 0}
+
+        if doc_signals.pre_save.has_receivers_for(self.document_class):
+            doc_signals.pre_save.send(self.document_class, keys=list(updates), updates=updates)
+
+        for u in updates.values():
+            self.patch_rql_repr(u)  # validate before building the query
+
+        pk = self.primary_key
+        return_changes = kwargs.pop('return_changes', False)
+        kwargs['return_changes'] = 'always'
+        q, _ = self._deferred_write(
+            doc_signals.post_save, self.table.get_all(*updates).update,
+            lambda d: r.branch(*[x for k, u in updates.items() for x in (d[pk].eq(k), self.patch_rql_repr(u, row=d))],
+                               {}),
+            **kwargs)
+        ret = q.run(self.write_connection)
+        if ret['errors']:
+            raise r.ReqlRuntimeError(ret['first_error'])
+
+        changes = [c['new_val'] for c in ret.get('changes', [])]
+        docs = self._rederive(changes, updates)
+        if doc_signals.post_save.has_receivers_for(self.document_class):
+            for doc in docs:
+                doc_signals.post_save.send(self.document_class, instance=doc)
+        if doc_signals.post_save_batch.has_receivers_for(self.document_class):
+            doc_signals.post_save_batch.send(self.document_class, docs=docs)
+        if not return_changes:
+            ret.pop('changes', None)
+
+        missing = set(updates) - {doc.id for doc in docs}
+        if missing:
+            raise KeyError('{0} not found in {1}'.format(', '.join(str(k) for k in missing), self.url))
         return ret
 
+    def _rederive(self, stored, updates, metadata=None):
+        """Write the properties derived from patched ones (see :meth:`_derived_updates`) in a single replace, skipping
+        documents whose patched properties have changed again since.
+
+        Args:
+            stored ([dict]): The patched documents as the server returned them.
+            updates (dict): Primary keys to the updates each document was patched with.
+            metadata (dict): Passed to the documents.
+
+        Returns:
+            [Document]: The patched documents.
+        """
+        pk = self.primary_key
+        docs, rederive = [], {}
+        for val in stored:
+            doc = self.document_class(dict(val), collection=self, from_db=True, metadata=metadata)
+            patched = list({k.split('.')[0] for k in updates[val[pk]]})
+            derived, removed = self._derived_updates(doc, val, patched)
+            if derived or removed:
+                rederive[val[pk]] = (patched, {k: val[k] for k in patched if k in val}, derived, removed)
+            docs.append(doc)
+        if not rederive:
+            return docs
+
+        stamp = self.patch_rql_repr({})  # processors stamp the second update, too
+
+        def branch(d):
+            args = []
+            for key, (patched, current, derived, removed) in rederive.items():
+                args.append(d[pk].eq(key) & d.pluck(*patched).eq(current))
+                args.append((d.without(*removed) if removed else d).merge(stamp).merge(derived))
+            return r.branch(*args, d)
+
+        ret = self.table.get_all(*rederive).replace(branch, return_changes='always').run(self.write_connection)
+        rederived = {c['new_val'][pk]: c['new_val'] for c in ret.get('changes', []) if c['new_val']}
+        return [self.document_class(rederived[doc.id], collection=self, from_db=True, metadata=metadata)
+                if doc.id in rederived else doc for doc in docs]
+
+    def _derived_updates(self, doc, stored, patched):
+        """The derived properties of a patched document that are out of date on the server.
+
+        Args:
+            doc (Document): The patched document. Its processors have already derived properties on construction.
+            stored (dict): The document as the server returned it.
+            patched (list): The top-level properties patched.
+
+        Returns:
+            (dict, list): Derived property names to their new values, and the derived properties to remove.
+        """
+        updates, removed = {}, []
+        for p in self.document_class.processors:
+            if not isinstance(p, DerivedProperty) or p.dest_prop in patched:
+                continue
+            if p.source_props and not any(k in patched for k in p.source_props):
+                continue
+            if doc.obj.get(p.dest_prop, None) != stored.get(p.dest_prop, None):
+                if p.dest_prop in doc.obj:
+                    updates[p.dest_prop] = doc.obj[p.dest_prop]
+                else:
+                    removed.append(p.dest_prop)
+        return updates, removed
+
+    def patch_rql_repr(self, updates, row=None):
+        """Validate a partial update and convert it to the form RethinkDB's update expects.
+
+        Args:
+            updates (dict): Property names (or dotted paths) to new values.
+            row (ReQL): The document field operators apply to. Defaults to ``r.row``; pass the argument of the
+              function when the update is built inside one.
+
+        Returns:
+            dict: A nested object suitable for ``table.get(key).update(...)``.
+        """
+        context = self.doc({})
+        patch = OrderedDict()
+        paths = []
+        for k, v in updates.items():
+            if k == self.primary_key:
+                continue
+            path = k.split('.')
+            target = patch
+            for p in path[:-1]:
+                target = target.setdefault(p, OrderedDict())
+            target[path[-1]] = v
+            paths.append(path)
+
+        for p in self.document_class.processors:
+            p.run_before_patch(patch)
+        paths.extend([k] for k in patch if not any(path[0] == k for path in paths))
+
+        op_paths = [path for path in paths if isinstance(self._patch_value(patch, path), FieldOperator)]
+        op_keys = {path[0] for path in op_paths}
+
+        for k, v in patch.items():
+            if k in self.document_class.specials and k not in op_keys and v is not None:
+                patch[k] = self.document_class.specials[k].to_json_repr(v, context, bare_keys=True)
+
+        for path in paths:
+            value = self._patch_value(patch, path)
+            schema = self._property_schema(path)
+            if isinstance(value, FieldOperator):
+                value.validate(schema)
+            elif value is not None and schema is not None:
+                jsonschema.validate(value, schema)
+
+        for path in op_paths:
+            field = r.row if row is None else row
+            for p in path:
+                field = field[p]
+            handler = self.document_class.specials.get(path[0], None) if len(path) == 1 else None
+            target = patch
+            for p in path[:-1]:
+                target = target[p]
+            target[path[-1]] = target[path[-1]].to_rql(field, handler, context)
+
+        for path in paths:
+            if len(path) > 1 and self._patch_value(patch, path) is None:
+                self._patch_value(patch, path[:-1])[path[-1]] = r.literal()
+
+        for k, v in patch.items():
+            if k in op_keys:
+                continue
+            elif v is None:
+                patch[k] = None if k in self.document_class.store_nulls else r.literal()
+            elif k in self.document_class.specials:
+                patch[k] = self.document_class.specials[k].to_rql_repr(v, context)
+
+        return patch
+
+    def apply(self, key, operations, **kwargs):
+        """Apply atomic field operators to a document on the server.
+
+        Each operator is evaluated by RethinkDB against the stored value, so concurrent updates to counters and lists
+        are not lost::
+
+            from sondra.collection.operators import inc, append
+            coll.apply(key, {"views": inc(1), "tags": append("x")})
+
+        Args:
+            key (str or int or Document): The primary key of the document to update.
+            operations (dict): Property names (or dotted paths) to :class:`sondra.collection.operators.FieldOperator`
+              instances.
+            **kwargs: Passed to rethinkdb.update
+
+        Returns:
+            Document: The updated document. See :meth:`patch`.
+        """
+        for k, op in operations.items():
+            if not isinstance(op, FieldOperator):
+                raise ValidationError("{0} is not a field operator".format(k))
+        return self.patch(key, operations, **kwargs)
+
+    @staticmethod
+    def _patch_value(patch, path):
+        value = patch
+        for p in path:
+            value = value[p]
+        return value
+
+    def _property_schema(self, path):
+        definitions = self.schema.get('definitions', {})
+        schema = self.schema
+        for p in path:
+            while '$ref' in schema and schema['$ref'].startswith('#/definitions/'):
+                schema = definitions.get(schema['$ref'].rsplit('/', 1)[-1], {})
+            schema = schema.get('properties', {}).get(p, None)
+            if schema is None:
+                return None
+
+        return dict(schema, definitions=definitions)
+
     def json_repr(self, docs, ordered=False, bare_keys=False):
         pop = False
         if not isinstance(docs, list):
@@ -676,7 +1642,7 @@ class Collection(MutableMapping, metaclass=CollectionMetaclass):
         for p in self.autocomplete_props:
             if reached_limit:
                 break
-            for obj in self.table.filter(lambda x: x[p].match(partial)).run(self.application.connection):
+            for obj in self.read_table().filter(lambda x: x[p].match(partial)).run(self.read_connection):
                 if obj[pk] not in result:
                     result[obj[pk]] = tpl.format(**obj)
                 if limit and len(result) >= limit:
@@ -0,0 +1,221 @@
+"""Write-behind buffering for small inserts.
+
+Saving documents one at a time costs a round trip, and with ``durability='hard'`` a disk sync, per document. A
+:class:`BufferedWriter` collects documents saved from any number of threads and inserts them in batches from a
+background thread::
+
+    with coll.buffered_writer(max_batch=500, max_delay_ms=50) as writer:
+        futures = [writer.save(reading) for reading in readings]
+    keys = [f.result() for f in futures]
+
+Documents are validated, and processors and ``pre_save`` signals run, in the calling thread, so invalid documents are
+rejected immediately. Specials' ``post_save`` and the ``post_save`` signals run in the writer thread.
+
+Documents without a primary key are given a random UUID, as RethinkDB would give them, before they are written, so
+that each document's future can be resolved from the insert's changes. A document that fails to insert fails only its
+own future.
+"""
+import atexit
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from uuid import uuid4
+
+from sondra.document import Document, signals as doc_signals
+
+
+class BufferFull(Exception):
+    """Raised when a document cannot be added to a full buffer before the timeout."""
+
+
+class BufferedWriteError(Exception):
+    """Set on the future of a document that RethinkDB failed to insert.
+
+    Attributes:
+        result (dict): The result of the insert of the document's whole batch.
+    """
+    def __init__(self, message, result):
+        super(BufferedWriteError, self).__init__(message)
+        self.result = result
+
+
+class BufferedWriter(object):
+    """Coalesce saves from many threads into batched inserts. See :meth:`sondra.collection.Collection.buffered_writer`
+
+    Args:
+        coll (Collection): The collection to write to.
+        max_batch (int=200): The most documents sent in one insert.
+        max_delay_ms (float=20): The longest a document waits for its batch to fill before it is written.
+        durability (str='hard'): Passed to rethinkdb.insert
+        max_pending (int): The most documents waiting to be written. Saving to a full buffer blocks. Defaults to ten
+            batches.
+        conflict (str='error'): Passed to rethinkdb.insert
+    """
+    def __init__(self, coll, max_batch=200, max_delay_ms=20, durability='hard', max_pending=None, conflict='error'):
+        self.coll = coll
+        self.max_batch = max(max_batch, 1)
+        self.max_delay = max_delay_ms / 1000.0
+        self.durability = durability
+        self.max_pending = max_pending or self.max_batch * 10
+        self.conflict = conflict
+
+        self._pending = deque()
+        self._writing = 0
+        self._flushing = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='BufferedWriter-' + coll.url, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self._pending) + self._writing
+
+    def save(self, doc, timeout=None):
+        """Queue a document to be inserted.
+
+        Args:
+            doc (Document or dict): The document.
+            timeout (float): Seconds to wait for room if the buffer is full. By default, wait indefinitely.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the document's primary key once it is written.
+
+        Raises:
+            BufferFull: if there was no room in the buffer before the timeout.
+            ValidationError: if the document is invalid.
+        """
+        if not isinstance(doc, Document):
+            doc = self.coll.doc(doc)
+        docs, values = self.coll._prepare_save([doc])
+        future = Future()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while len(self._pending) >= self.max_pending and not self._closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise BufferFull("No room in the write buffer for {0} after {1} seconds".format(
+                        self.coll.url, timeout))
+                self._cond.wait(remaining)
+
+            if self._closed:
+                raise ValueError("Cannot save to a closed BufferedWriter")
+
+            self._pending.append((docs[0], values[0], future))
+            self._cond.notify_all()
+
+        return future
+
+    def flush(self, timeout=None):
+        """Write everything in the buffer now and wait until it has been written.
+
+        Returns:
+            bool: False if the timeout elapsed first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                while self._pending or self._writing:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._flushing -= 1
+
+    def close(self):
+        """Write everything in the buffer and stop the writer thread. Called automatically at interpreter exit."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+
+            deadline = time.monotonic() + self.max_delay
+            while len(self._pending) < self.max_batch and not (self._closed or self._flushing):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+            self._writing = len(batch)
+            self._cond.notify_all()
+            return batch
+
+    def _run(self):
+        try:
+            while True:
+                batch = self._next_batch()
+                if not batch:
+                    break
+                try:
+                    self._write(batch)
+                finally:
+                    with self._cond:
+                        self._writing = 0
+                        self._cond.notify_all()
+        finally:
+            self.coll.suite.release_connections()
+
+    def _write(self, batch):
+        pk = self.coll.primary_key
+        generated = []
+        for doc, value, _ in batch:
+            if not value.get(pk):
+                doc.id = value[pk] = str(uuid4())
+                generated.append(doc.id)
+
+        try:
+            q, _ = self.coll._deferred_write(doc_signals.post_save, self.coll.table.insert, [v for _, v, _ in batch],
+                                             durability=self.durability, conflict=self.conflict,
+                                             return_changes='always')
+            ret = q.run(self.coll.write_connection)
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        if generated:
+            ret['generated_keys'] = generated  # as the server reports keys it generates
+
+        outcomes = {}  # the errors of the changes to each key, in order, None where the document was written
+        for change in ret.pop('changes', ()):
+            val = change.get('new_val') or change.get('old_val') or {}
+            outcomes.setdefault(val.get(pk), deque()).append(change.get('error'))
+
+        saved, failed = [], []
+        for doc, _, future in batch:
+            outcome = outcomes.get(doc.id)
+            error = outcome.popleft() if outcome else ret.get('first_error', 'Insert failed')
+            if error is None:
+                saved.append((doc, future))
+            else:
+                failed.append((future, error))
+
+        try:
+            self.coll._finish_save([doc for doc, _ in saved], ret)
+        except Exception as e:
+            for _, future in saved:
+                future.set_exception(e)
+        else:
+            for doc, future in saved:
+                future.set_result(doc.id)
+
+        for future, error in failed:
+            future.set_exception(BufferedWriteError(error, ret))
@@ -0,0 +1,236 @@
+"""Changefeed subscriptions.
+
+:meth:`sondra.collection.Collection.changes` opens a RethinkDB changefeed on a collection, or on a query over it, and
+returns a :class:`ChangeFeed`. Iterate over it, with ``for`` or ``async for``, to receive a :class:`Change` for every
+change as the server reports it::
+
+    for change in coll.changes(coll.query.filter({'owner': user}).query):
+        if change.type == Change.DELETE:
+            forget(change.key)
+        else:
+            show(change.new)
+
+A feed holds a connection of its own. Close it, or use it as a context manager, when done.
+
+Backpressure: the server queues up to ``buffer_size`` changes for a feed that is not being read fast enough. If the
+queue overflows, the server drops changes and the feed yields a :class:`Change` of type ``overflow``. With
+``squash``, changes to the same document are merged on the server instead of queued.
+
+Reconnection: if the connection is lost, the feed reconnects and reopens the changefeed, and yields a change of type
+``resumed``. Changes made while it was disconnected are not replayed. If ``include_initial`` is set, the query's current
+results are sent again as ``initial`` changes, so consumers can bring themselves up to date.
+"""
+import asyncio
+import logging
+import time
+
+import rethinkdb as r
+
+
+class Change(object):
+    """A change reported by a changefeed.
+
+    Attributes:
+        type (str): ``initial``, ``insert``, ``update``, ``delete``, ``resumed`` or ``overflow``.
+        old (Document): The document before the change, for updates and deletes.
+        new (Document): The document after the change, for initial results, inserts and updates.
+        error (str): The server's message, for overflows.
+    """
+    INITIAL = 'initial'
+    INSERT = 'insert'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    RESUMED = 'resumed'
+    OVERFLOW = 'overflow'
+
+    def __init__(self, type, old=None, new=None, error=None):
+        self.type = type
+        self.old = old
+        self.new = new
+        self.error = error
+
+    def __repr__(self):
+        return '<Change {0} {1}>'.format(self.type, self.key)
+
+    @property
+    def key(self):
+        """The primary key of the changed document, or None for resumed and overflow changes."""
+        doc = self.new if self.new is not None else self.old
+        return doc.id if doc is not None else None
+
+
+class ChangeFeed(object):
+    """Iterate, synchronously or asynchronously, over the changes to a query. See
+    :meth:`sondra.collection.Collection.changes`
+    """
+    def __init__(self, coll, query, include_initial=False, squash=False, buffer_size=None, retry_delay=1.0,
+                 authorize=None):
+        self.coll = coll
+        self.query = query
+        self.include_initial = include_initial
+        self.squash = squash
+        self.buffer_size = buffer_size
+        self.retry_delay = retry_delay
+        self.authorize = authorize
+        self.log = logging.getLogger(self.__class__.__name__ + '.' + coll.name)
+
+        self._conn = None
+        self._cursor = None
+        self._resumed = False
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def changefeed(self):
+        """The ReQL changefeed query."""
+        kwargs = {'include_initial': self.include_initial, 'squash': self.squash}
+        if self.buffer_size:
+            kwargs['changefeed_queue_size'] = self.buffer_size
+        return self.query.changes(**kwargs)
+
+    def change(self, raw):
+        """Build a :class:`Change` from a change reported by the server. Returns None if the change is to documents
+        that ``authorize`` hides."""
+        if 'error' in raw:
+            return Change(Change.OVERFLOW, error=raw['error'])
+
+        old = raw.get('old_val')
+        new = raw.get('new_val')
+        old = self.coll.document_class(old, collection=self.coll, from_db=True) if old is not None else None
+        new = self.coll.document_class(new, collection=self.coll, from_db=True) if new is not None else None
+
+        if self.authorize is not None:
+            allowed = [id(doc) for doc in self.authorize([doc for doc in (old, new) if doc is not None])]
+            old = old if id(old) in allowed else None
+            new = new if id(new) in allowed else None
+            if old is None and new is None:
+                return None
+
+        if 'old_val' not in raw:
+            return Change(Change.INITIAL, new=new)
+        elif old is None:
+            return Change(Change.INSERT, new=new)
+        elif new is None:
+            return Change(Change.DELETE, old=old)
+        else:
+            return Change(Change.UPDATE, old=old, new=new)
+
+    def _lost(self, error):
+        self.log.warning("Lost changefeed on {0}: {1}. Reconnecting.".format(self.coll.url, error))
+        self._cursor = None
+        self._resumed = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.poll()
+
+    def poll(self, timeout=None):
+        """Wait for the next change.
+
+        Args:
+            timeout (float): Seconds to wait. By default, wait until there is a change.
+
+        Returns:
+            Change: The change, or None if the timeout elapsed first.
+
+        Raises:
+            StopIteration: if the feed has been closed.
+        """
+        while not self._closed:
+            if self._resumed:
+                self._resumed = False
+                return Change(Change.RESUMED)
+
+            try:
+                if self._cursor is None:
+                    if self._conn is None:
+                        pool = self.coll.suite.connection_pools[self.coll.read_connection_name]
+                        self._conn = r.connect(**pool.connect_kwargs)
+                    elif not self._conn.is_open():
+                        self._conn.reconnect(noreply_wait=False)
+                    self._cursor = self.changefeed().run(self._conn)
+
+                raw = self._cursor.next(wait=True if timeout is None else timeout)
+            except r.ReqlTimeoutError:
+                return None
+            except r.ReqlDriverError as e:
+                if self._closed:
+                    break
+                self._lost(e)
+                time.sleep(self.retry_delay)
+                continue
+
+            if 'state' in raw:
+                continue
+            change = self.change(raw)
+            if change is not None:
+                return change
+
+        raise StopIteration
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.apoll()
+
+    async def apoll(self, timeout=None):
+        """Wait for the next change without blocking the event loop. See :meth:`poll`.
+
+        Raises:
+            StopAsyncIteration: if the feed has been closed.
+        """
+        while not self._closed:
+            if self._resumed:
+                self._resumed = False
+                return Change(Change.RESUMED)
+
+            try:
+                if self._cursor is None:
+                    self._cursor = await self.coll.async_read_pool.run(self.changefeed())
+
+                if not await self._cursor.fetch_next(wait=True if timeout is None else timeout):
+                    break
+                raw = await self._cursor.next()
+            except r.ReqlTimeoutError:
+                return None
+            except r.ReqlDriverError as e:
+                if self._closed:
+                    break
+                self._lost(e)
+                await asyncio.sleep(self.retry_delay)
+                continue
+
+            if 'state' in raw:
+                continue
+            change = self.change(raw)
+            if change is not None:
+                return change
+
+        raise StopAsyncIteration
+
+    def close(self):
+        """Stop the changefeed and close its connection. Iteration stops after any change already received."""
+        self._closed = True
+        cursor, self._cursor = self._cursor, None
+        if self._conn is not None:
+            try:
+                if cursor is not None:
+                    cursor.close()
+                self._conn.close(noreply_wait=False)
+            except r.ReqlDriverError:
+                pass
+            self._conn = None
+
+    async def aclose(self):
+        """Stop an asynchronously iterated changefeed."""
+        self._closed = True
+        cursor, self._cursor = self._cursor, None
+        if cursor is not None:
+            await cursor.close()
@@ -0,0 +1,163 @@
+"""Atomic field operators for server-side partial updates.
+
+Operators are used as values in :meth:`sondra.collection.Collection.apply` and
+:meth:`sondra.collection.Collection.patch`. Each one is compiled into a ReQL expression that is evaluated against the
+stored document, so concurrent updates do not overwrite each other::
+
+    coll.apply(key, {"views": inc(1), "tags": append("x")})
+
+Over the web API, the same operators are passed in a PATCH body under ``__ops``::
+
+    {"__ops": {"views": {"inc": 1}, "tags": {"append": ["x"]}}}
+"""
+import numbers
+
+import jsonschema
+
+from sondra.exceptions import ValidationError
+
+
+class FieldOperator(object):
+    """Base class for operators that compute a property's new value on the server."""
+    name = None
+
+    def validate(self, schema):
+        """Check the operator's arguments against the schema of the property it targets.
+
+        Args:
+            schema (dict): The property schema, or None if the property is not described by the schema.
+
+        Raises:
+            ValidationError if the arguments are not valid for the property.
+        """
+        pass
+
+    def to_rql(self, field, handler, document):
+        """Compile the operator to a ReQL expression.
+
+        Args:
+            field (ReQL): The current value of the property, e.g. ``r.row['views']``
+            handler (ValueHandler): The special value handler for the property, if any.
+            document (Document): A document of the collection, passed to the value handler.
+
+        Returns:
+            ReQL: The expression for the property's new value.
+        """
+        raise NotImplementedError()
+
+
+class Increment(FieldOperator):
+    """Add ``amount`` to a numeric property. A missing property counts as zero."""
+    name = 'inc'
+
+    def __init__(self, amount=1):
+        self.amount = amount
+
+    def validate(self, schema):
+        if not isinstance(self.amount, numbers.Number) or isinstance(self.amount, bool):
+            raise ValidationError("Increment amount must be a number")
+        if schema and schema.get('type', 'number') not in ('number', 'integer'):
+            raise ValidationError("Cannot increment a property of type {0}".format(schema['type']))
+        if schema and schema.get('type') == 'integer' and not isinstance(self.amount, int):
+            raise ValidationError("Cannot increment an integer property by a fraction")
+
+    def to_rql(self, field, handler, document):
+        return field.default(0).add(self.amount)
+
+
+class _ArrayOperator(FieldOperator):
+    def __init__(self, *values):
+        self.values = list(values)
+
+    def validate(self, schema):
+        if schema and schema.get('type', 'array') != 'array':
+            raise ValidationError("Cannot {0} on a property of type {1}".format(self.name, schema['type']))
+        if schema and 'items' in schema:
+            items = dict(schema['items'], definitions=schema.get('definitions', {}))
+            for v in self.values:
+                jsonschema.validate(v, items)
+
+    def _rql_values(self, handler, document):
+        sub_handler = getattr(handler, 'sub_handler', None)
+        if sub_handler:
+            return [sub_handler.to_rql_repr(v, document) for v in self.values]
+        else:
+            return self.values
+
+
+class Append(_ArrayOperator):
+    """Append values to an array property. A missing property counts as an empty array."""
+    name = 'append'
+
+    def to_rql(self, field, handler, document):
+        return field.default([]).union(self._rql_values(handler, document))
+
+
+class Remove(_ArrayOperator):
+    """Remove every occurrence of the values from an array property."""
+    name = 'remove'
+
+    def to_rql(self, field, handler, document):
+        return field.default([]).difference(self._rql_values(handler, document))
+
+
+class SetIfAbsent(FieldOperator):
+    """Set a property only if it does not already have a value."""
+    name = 'set_if_absent'
+
+    def __init__(self, value):
+        self.value = value
+
+    def validate(self, schema):
+        if schema:
+            jsonschema.validate(self.value, schema)
+
+    def to_rql(self, field, handler, document):
+        value = handler.to_rql_repr(self.value, document) if handler else self.value
+        return field.default(value)
+
+
+def inc(amount=1):
+    return Increment(amount)
+
+
+def append(*values):
+    return Append(*values)
+
+
+def remove(*values):
+    return Remove(*values)
+
+
+def set_if_absent(value):
+    return SetIfAbsent(value)
+
+
+OPERATORS = {cls.name: cls for cls in (Increment, Append, Remove, SetIfAbsent)}
+
+
+def from_json(spec):
+    """Build an operator from its JSON form, as used by ``__ops`` in a PATCH request.
+
+    Args:
+        spec (dict): A single-key object of operator name to argument, e.g. ``{"inc": 1}`` or
+            ``{"append": ["a", "b"]}``. Array operators accept a single value or a list of values.
+
+    Returns:
+        FieldOperator
+
+    Raises:
+        ValidationError if the operator is not recognized.
+    """
+    if not isinstance(spec, dict) or len(spec) != 1:
+        raise ValidationError("Operators must be objects with exactly one key: {0}".format(spec))
+
+    name, arg = next(iter(spec.items()))
+    if name not in OPERATORS:
+        raise ValidationError("Unrecognized operator {0}".format(name))
+
+    cls = OPERATORS[name]
+    if issubclass(cls, _ArrayOperator):
+        return cls(*(arg if isinstance(arg, list) else [arg]))
+    else:
+        return cls(arg)
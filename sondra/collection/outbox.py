@@ -0,0 +1,235 @@
+"""Deferred delivery of document signals through an outbox table.
+
+Receivers connected with ``deferred=True`` (see :func:`sondra.document.signals.connect`) are kept out of the
+request. In a collection with ``deferred_signals`` set, each save or delete also inserts an event per deferred
+receiver and document into the collection's outbox table, ``<name>__outbox``, in the same query as the write. An
+:class:`OutboxWorker` delivers the events on a pool of threads::
+
+    worker = suite.start_outbox_worker(workers=4)
+
+Events for the same receiver and document are delivered one at a time, in the order of RethinkDB's clock when they
+were written. Two writes of the same document within the same millisecond may be delivered in either order. A receiver
+that raises is retried with exponential backoff, and the events after it for the same document wait. After
+``max_attempts`` the event is dead-lettered: it is marked ``failed`` and kept in the outbox, where workers no longer
+read it, and the events behind it go ahead. :meth:`OutboxWorker.failed` lists dead letters,
+:meth:`OutboxWorker.requeue_failed` retries them and :meth:`OutboxWorker.purge_failed` deletes them. An event claimed
+by a worker that does not finish within ``lease`` seconds is handed out again, so delivery is at least once.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import rethinkdb as r
+
+from sondra.document import signals as doc_signals
+
+QUEUE_INDEX = ('queue', lambda e: [e['state'].eq('failed'), e['created'], e['key']])
+CLAIMED_INDEX = ('claimed', lambda e: [e['state'], e['claimed_at']])
+
+
+def record(coll, query, signal, receivers):
+    """Add to a write query an insert into the outbox of an event for every receiver and changed document.
+
+    Args:
+        coll (Collection): The collection written to.
+        query (ReQL): An insert, update or delete of the collection, with ``return_changes`` set.
+        signal (blinker.Signal): ``post_save`` or ``post_delete``.
+        receivers ([str]): Deferred receiver names. See :func:`sondra.document.signals.deferred_receivers`
+
+    Returns:
+        ReQL: A query with the same result as ``query``.
+    """
+    val = 'old_val' if signal is doc_signals.post_delete else 'new_val'
+    pk = coll.primary_key
+
+    def events(change):
+        return [{
+            'signal': signal.name,
+            'receiver': receiver,
+            'key': change[val][pk],
+            'doc': change[val],
+            'state': 'pending',
+            'attempts': 0,
+            'created': r.now(),
+            'not_before': r.now(),
+        } for receiver in receivers]
+
+    return query.do(lambda ret: coll.outbox.insert(
+        ret['changes'].default([])
+            .filter(lambda c: c.has_fields('error').not_() & c[val].ne(None))
+            .concat_map(events)
+    ).do(lambda _: ret))
+
+
+class OutboxWorker(object):
+    """Deliver the events in the outboxes of a set of collections.
+
+    Args:
+        collections ([Collection]): Collections with ``deferred_signals`` set.
+        workers (int=4): The number of threads delivering events.
+        interval (float=1): Seconds to wait before looking again when an outbox is empty.
+        batch_size (int=500): The most events read from an outbox at once.
+        max_attempts (int=10): The most times an event is tried before it is marked failed.
+        backoff (float=1): Seconds before the first retry. Doubles every retry.
+        max_backoff (float=300): The longest wait between retries.
+        lease (float=300): Seconds after which an event claimed by a worker may be claimed again.
+    """
+    def __init__(self, collections, workers=4, interval=1, batch_size=500, max_attempts=10, backoff=1,
+                 max_backoff=300, lease=300):
+        self.collections = [c for c in collections if c.deferred_signals]
+        self.workers = workers
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.log = logging.getLogger(self.__class__.__name__)
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pool = None
+
+    def drain(self):
+        """Deliver what is ready to be delivered in every outbox.
+
+        Returns:
+            int: The number of events delivered.
+        """
+        pool = self._pool or ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            delivered = 0
+            for coll in self.collections:
+                try:
+                    delivered += self._drain(coll, pool)
+                except Exception as e:
+                    self.log.warning("Could not drain the outbox of {0}: {1}".format(coll.url, e))
+            return delivered
+        finally:
+            if pool is not self._pool:
+                pool.shutdown()
+
+    def start(self):
+        """Drain the outboxes continuously in a background thread."""
+        if self._thread is None:
+            self._stopped.clear()
+            self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            self._thread = threading.Thread(target=self._run, name='OutboxWorker', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _run(self):
+        try:
+            while not self._stopped.is_set():
+                if not self.drain():
+                    self._stopped.wait(self.interval)
+        finally:
+            self._release()
+
+    def _release(self):
+        for suite in {id(c.suite): c.suite for c in self.collections}.values():
+            suite.release_connections()
+
+    def failed(self, coll):
+        """The dead-lettered events in a collection's outbox."""
+        return list(self._failed(coll).run(coll.read_connection))
+
+    def requeue_failed(self, coll):
+        """Try a collection's dead-lettered events again, from the first attempt.
+
+        Returns:
+            int: The number of events requeued.
+        """
+        ret = self._failed(coll).update({'state': 'pending', 'attempts': 0, 'not_before': r.now()})\
+            .run(coll.write_connection)
+        return ret['replaced']
+
+    def purge_failed(self, coll):
+        """Delete a collection's dead-lettered events.
+
+        Returns:
+            int: The number of events deleted.
+        """
+        return self._failed(coll).delete().run(coll.write_connection)['deleted']
+
+    def _failed(self, coll):
+        return coll.outbox.between(['failed', r.minval], ['failed', r.maxval], index=CLAIMED_INDEX[0])
+
+    def _drain(self, coll, pool):
+        conn = coll.write_connection
+        coll.outbox.between(['running', r.minval], ['running', r.now() - self.lease], index=CLAIMED_INDEX[0])\
+            .update({'state': 'pending'}).run(conn)
+
+        events = list(coll.outbox.between([False, r.minval, r.minval], [False, r.maxval, r.maxval],
+                                          index=QUEUE_INDEX[0])
+                      .order_by(index=QUEUE_INDEX[0]).limit(self.batch_size).run(conn))
+
+        queues = {}
+        for event in events:
+            queues.setdefault((event['receiver'], event['key']), []).append(event)
+
+        now = datetime.now(timezone.utc)
+        ready = []
+        for queue in queues.values():
+            for i, event in enumerate(queue):
+                if event['state'] != 'pending' or event['not_before'] > now:
+                    queue = queue[:i]
+                    break
+            if queue:
+                ready.append(queue)
+
+        return sum(f.result() for f in [pool.submit(self._deliver, coll, queue) for queue in ready])
+
+    def _deliver(self, coll, queue):
+        """Deliver a document's events for one receiver in order, stopping at the first failure."""
+        conn = coll.write_connection
+        try:
+            claimed = coll.outbox.get_all(*[e['id'] for e in queue]).filter({'state': 'pending'})\
+                .update({'state': 'running', 'claimed_at': r.now()}, return_changes=True).run(conn)
+            claimed = {c['new_val']['id'] for c in claimed.get('changes', [])}
+
+            delivered = 0
+            for i, event in enumerate(queue):
+                if event['id'] not in claimed:
+                    break
+                try:
+                    self._call(coll, event)
+                except Exception as e:
+                    self._retry(coll, event, e)
+                    rest = [later['id'] for later in queue[i + 1:] if later['id'] in claimed]
+                    if rest:
+                        coll.outbox.get_all(*rest).update({'state': 'pending'}).run(conn)
+                    break
+                coll.outbox.get(event['id']).delete().run(conn)
+                delivered += 1
+            return delivered
+        finally:
+            coll.suite.release_connections()
+
+    def _call(self, coll, event):
+        signal = doc_signals.post_delete if event['signal'] == doc_signals.post_delete.name else doc_signals.post_save
+        receiver = doc_signals.deferred_receiver(signal, event['receiver'])
+        if receiver is None:
+            raise LookupError("{0} is not connected to {1}".format(event['receiver'], event['signal']))
+        receiver(coll.document_class, instance=coll.document_class(event['doc'], collection=coll, from_db=True))
+
+    def _retry(self, coll, event, e):
+        attempts = event['attempts'] + 1
+        update = {'attempts': attempts, 'last_error': '{0}: {1}'.format(e.__class__.__name__, e)}
+        if attempts >= self.max_attempts:
+            update['state'] = 'failed'
+            self.log.error("Giving up on {0} for {1} {2}: {3}".format(event['receiver'], coll.url, event['key'], e))
+        else:
+            update['state'] = 'pending'
+            update['not_before'] = r.now() + min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+            self.log.warning("Retrying {0} for {1} {2}: {3}".format(event['receiver'], coll.url, event['key'], e))
+        coll.outbox.get(event['id']).update(update).run(coll.write_connection)
@@ -18,7 +18,7 @@ class QuerySet(object):
         self.result = None
 
     def __getattribute__(self, name):
-        if name.startswith('__') or name in { 'query', 'coll', 'result', 'first', 'drop', 'pop' }:
+        if name.startswith('__') or name in { 'query', 'coll', 'result', 'first', 'drop', 'pop', 'update_all', 'delete_all', 'aiter', 'changes' }:
             return object.__getattribute__(self, name)
         else:
             return QWrapper(self, name)
@@ -39,7 +39,28 @@ class QuerySet(object):
         return len(self) > 0
 
     def __len__(self):
-        return self.query.count().run(self.coll.application.connection)
+        return self.query.count().run(self.coll.read_connection)
+
+    def aiter(self):
+        """
+        Iterate over the query's documents on the collection's asyncio connection pool.
+
+        Returns:
+            An asynchronous iterator of Document objects, for use with ``async for``.
+        """
+        return self.coll.aq(self.query)
+
+    def changes(self, **kwargs):
+        """
+        Subscribe to changes to the documents matching the query.
+
+        Args:
+            **kwargs: See :meth:`sondra.collection.Collection.changes`
+
+        Returns:
+            A ChangeFeed
+        """
+        return self.coll.changes(self.query, **kwargs)
 
     def drop(self):
         """
@@ -59,6 +80,36 @@ class QuerySet(object):
             yield d
             d.delete()
 
+    def update_all(self, updates, **kwargs):
+        """
+        Update every document matching the query in a single server-side operation.
+
+        Args:
+            updates (dict): Property names (or dotted paths) to new values or field operators.
+            **kwargs: Passed to rethinkdb.update
+
+        Returns:
+            The result of the RethinkDB update. See :meth:`sondra.collection.Collection.patch_query`
+        """
+        return self.coll.patch_query(self.query, updates, **kwargs)
+
+    def delete_all(self, batch=True, **kwargs):
+        """
+        Delete every document matching the query.
+
+        Args:
+            batch (bool=True): If true, delete in a single server-side operation and run processors and signals over
+                the deleted documents afterwards. Otherwise delete documents one at a time, as :meth:`drop` does.
+            **kwargs: Passed to rethinkdb.delete
+
+        Returns:
+            The result of the RethinkDB delete, if batch is true.
+        """
+        if batch:
+            return self.coll.delete_query(self.query, **kwargs)
+        else:
+            self.drop()
+
     def first(self):
         """
         Return the first result of the query.
@@ -92,19 +143,19 @@ class RawQuerySet(object):
         pass
 
     def __call__(self):
-        return self.query.run(self.coll.application.connection)
+        return self.query.run(self.coll.read_connection)
 
     def __iter__(self):
         if self.cls:
-            return (self.cls(d) for d in self.query.run(self.coll.application.connection))
+            return (self.cls(d) for d in self.query.run(self.coll.read_connection))
         else:
-            return self.query.run(self.coll.application.connection)
+            return self.query.run(self.coll.read_connection)
 
     def __bool__(self):
         return len(self) > 0
 
     def __len__(self):
-        return self.query.count().run(self.coll.application.connection)
+        return self.query.count().run(self.coll.read_connection)
 
     def first(self):
         try:
@@ -0,0 +1,144 @@
+"""Delta sync for clients that keep a replica of a collection.
+
+A collection with a ``sync_field`` stamps every save and patch with the time in that field (see
+:class:`sondra.document.processors.TimestampOnUpdate`), indexes it, and records the primary key of every deleted
+document in a tombstone table. :meth:`sondra.collection.Collection.sync` then answers "what changed since this
+checkpoint?" with two index range reads, so sync traffic scales with churn rather than with the size of the
+collection.
+
+Documents are paged through in ``(sync_field, primary key)`` order, on a compound index, so a page can end part way
+through the many documents a bulk update stamps with the same time. Tombstones keep the deleted document, and the
+filters given to sync are applied to deletes as well as to saves. Deletes recorded before tombstones kept documents
+are left out of filtered syncs.
+
+Checkpoints are opaque strings. A client starts without one, applies the response, and passes the returned checkpoint
+back on its next sync. Responses may overlap slightly, so applying them must be idempotent.
+"""
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+import rethinkdb as r
+
+from sondra.document.processors import TimestampOnCreate
+from sondra.exceptions import ValidationError
+
+
+def encode_checkpoint(when, key=None):
+    """Encode a timezone-aware datetime, and the primary key of the last document synced at that time if the page
+    ended part way through it, as an opaque checkpoint."""
+    cursor = {'t': when.timestamp()}
+    if key is not None:
+        cursor['k'] = key
+    payload = json.dumps(cursor).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def decode_checkpoint(checkpoint):
+    """Decode a checkpoint made by :func:`encode_checkpoint`.
+
+    Returns:
+        (datetime, key): The key is None if every document stamped at that time is yet to be synced.
+
+    Raises:
+        ValidationError if the checkpoint is malformed.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(checkpoint.encode('ascii')).decode('utf-8'))
+        return datetime.fromtimestamp(payload['t'], timezone.utc), payload.get('k', None)
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise ValidationError("Invalid sync checkpoint: {0}".format(checkpoint))
+
+
+def _created_field(coll):
+    for p in coll.document_class.processors:
+        if isinstance(p, TimestampOnCreate):
+            return p.dest_prop
+    return None
+
+
+def _apply_filters(q, filters):
+    for f in filters:
+        q = q.filter(getattr(f, 'predicate', f))  # an IndexFilter cannot use its index after between
+    return q
+
+
+def changes_since(coll, since=None, limit=None, filters=(), authorize=None):
+    """Collect the documents changed and the keys deleted since a checkpoint. See
+    :meth:`sondra.collection.Collection.sync`
+    """
+    field = coll.sync_field
+    limit = limit or coll.sync_page_size
+    conn = coll.read_connection
+
+    # Saves are stamped with the application server's clock, and a save stamped just now may not be visible yet, so
+    # stop short of the present. The next sync picks up from here.
+    upper = r.now().run(conn) - timedelta(seconds=coll.sync_lag)
+    lower, lower_key = decode_checkpoint(since) if since else (None, None)
+    if lower is not None and lower >= upper:
+        return {'checkpoint': since, 'more': False, 'inserted': [], 'updated': [], 'deleted': [], 'documents': []}
+
+    if lower is None:
+        start = r.minval
+    elif lower_key is None:
+        start = [lower, r.minval]
+    else:
+        start = [lower, lower_key]
+    q = coll.read_table().between(start, [upper, r.minval], index=coll.sync_index,
+                                  left_bound='closed' if lower_key is None else 'open', right_bound='open')
+    q = q.order_by(index=coll.sync_index)
+    q = _apply_filters(q, filters)
+    rows = list(q.limit(limit + 1).run(conn))
+
+    more = len(rows) > limit
+    upper_key = None
+    if more:
+        rows = rows[:limit]
+        upper, upper_key = rows[-1][field], rows[-1][coll.primary_key]
+
+    tombstones = coll.tombstones.between(r.minval if lower is None else lower, upper, index='deleted_at',
+                                         left_bound='closed', right_bound='open')
+    if filters:
+        # filter the deleted documents, keeping the tombstone's own fields alongside
+        tombstones = _apply_filters(
+            tombstones.has_fields('doc').map(lambda t: t['doc'].merge({'_tombstone': t.without('doc')})),
+            filters
+        ).map(lambda doc: doc['_tombstone'].merge({'doc': doc.without('_tombstone')}))
+    if authorize is None:
+        tombstones = tombstones.without('doc')
+    tombstones = list(tombstones.run(conn))
+    if authorize is not None:
+        visible = {doc.id for doc in authorize([coll.document_class(t['doc'], collection=coll, from_db=True)
+                                                for t in tombstones if 'doc' in t])}
+        tombstones = [t for t in tombstones if t['id'] in visible]
+
+    stamps = {row[coll.primary_key]: row[field] for row in rows}
+    deleted = [t['id'] for t in tombstones if t['id'] not in stamps or stamps[t['id']] < t['deleted_at']]
+    deleted_keys = set(deleted)
+    docs = [coll.document_class(row, collection=coll, from_db=True) for row in rows
+            if row[coll.primary_key] not in deleted_keys]
+
+    created_field = _created_field(coll)
+    inserted, updated = [], []
+    for doc in docs:
+        if lower is None or (created_field and doc.obj.get(created_field) and doc.obj[created_field] >= lower):
+            inserted.append(doc.id)
+        else:
+            updated.append(doc.id)
+
+    if authorize is not None:
+        allowed = {doc.id for doc in authorize(docs)}
+        docs = [doc for doc in docs if doc.id in allowed]
+        # a client may hold an earlier version of a document it can no longer see
+        deleted.extend(key for key in updated if key not in allowed)
+        inserted = [key for key in inserted if key in allowed]
+        updated = [key for key in updated if key in allowed]
+
+    return {
+        'checkpoint': encode_checkpoint(upper, upper_key),
+        'more': more,
+        'inserted': inserted,
+        'updated': updated,
+        'deleted': deleted,
+        'documents': docs,
+    }
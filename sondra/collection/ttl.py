@@ -0,0 +1,64 @@
+"""Expiry of documents in collections that set ``ttl_field``.
+
+A collection with a ``ttl_field`` indexes that field, and a document expires when the time in it, plus the
+collection's ``ttl`` if set, has passed. Expired documents are hidden from reads right away, and deleted by
+:meth:`sondra.collection.Collection.sweep_expired`, in bounded batches found with a range read on the index. A
+:class:`Sweeper` calls it periodically in a background thread::
+
+    sweeper = suite.start_sweeper(interval=60)
+"""
+import logging
+import threading
+
+
+class Sweeper(object):
+    """Periodically delete expired documents from a set of collections.
+
+    Args:
+        collections ([Collection]): Collections with a ``ttl_field``.
+        interval (float=60): Seconds between sweeps.
+        batch_size (int): The most documents deleted per query. Defaults to each collection's ``ttl_sweep_batch``.
+    """
+    def __init__(self, collections, interval=60, batch_size=None):
+        self.collections = [c for c in collections if c.ttl_field]
+        self.interval = interval
+        self.batch_size = batch_size
+        self.log = logging.getLogger(self.__class__.__name__)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def sweep(self):
+        """Delete the expired documents of every collection now.
+
+        Returns:
+            dict: The number of documents deleted, keyed by collection URL.
+        """
+        deleted = {}
+        for coll in self.collections:
+            try:
+                deleted[coll.url] = coll.sweep_expired(self.batch_size)
+            except Exception as e:
+                self.log.warning("Could not sweep {0}: {1}".format(coll.url, e))
+        return deleted
+
+    def start(self):
+        """Sweep every ``interval`` seconds in a background thread."""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='Sweeper', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.sweep()
+            finally:
+                for suite in {id(c.suite): c.suite for c in self.collections}.values():
+                    suite.release_connections()
@@ -10,7 +10,7 @@ from copy import deepcopy
 import jsonschema
 
 from sondra.api.expose import method_schema, expose_method_explicit
-from sondra.document.schema_parser import ListHandler, ForeignKey
+from sondra.document.schema_parser import ListHandler
 
 try:
     from shapely.geometry import mapping, shape
@@ -337,31 +337,44 @@ class Document(MutableMapping, metaclass=DocumentMetaclass):
         return iter(self.obj)
 
     def update(*args, **kwargs):
+        """Update properties of this document. Dotted keys update nested properties.
+
+        Saved documents are patched on the server in a single round trip rather than being saved in full. See
+        :meth:`sondra.collection.Collection.patch`.
+
+        Returns:
+            Document: the updated document.
+        """
         self, *args = args  # to conform to MutableMapping sig
 
-        def sub_update(s, v, *k):
-            if len(k) > 1:
-                return sub_update(s[k[0]], v, k[1:])
-            else:
-                s[k[0]] = v
-                return s
+        updates = OrderedDict()
+        for arg in args:
+            updates.update([arg] if isinstance(arg, tuple) else arg)
+        updates.update(kwargs)
 
-        for k, v in args:
-            if '.' in k:
-                k0, *ks = k.split('.')
-                self[k0] = sub_update(self[k0], v, *ks)
+        if self.saved:
+            updated = self.collection.patch(self.id, updates)
+            self.obj = updated.obj
+            return updated
+
+        def sub_update(s, v, k, *ks):
+            if ks:
+                s[k] = sub_update(s.get(k) or {}, v, *ks)
+            elif v is None:
+                s.pop(k, None)
             else:
-                self[k] = v
+                s[k] = v
+            return s
 
-        for k, v in kwargs.items():
+        for k, v in updates.items():
             if '.' in k:
                 k0, *ks = k.split('.')
-                self[k0] = sub_update(self[k0], v, *ks)
+                self[k0] = sub_update(self.get(k0) or {}, v, *ks)
             else:
                 self[k] = v
 
         self.save()
-        return self.collection[self.id]
+        return self
 
 
     @expose_method_explicit(
@@ -389,7 +402,7 @@ class Document(MutableMapping, metaclass=DocumentMetaclass):
             related_key (:obj:`str`, optional): The name of the key to search for this document in.
                 If none, defaults to the first matching foreign key element.
             related_index (:obj:`str`, optional): The name of the index to search for this document in.
-                If none, defaults to the first matching foreign key element.
+                If none, defaults to the index on the foreign key.
 
         Returns:
             A sondra.collection.QuerySet object
@@ -400,19 +413,11 @@ class Document(MutableMapping, metaclass=DocumentMetaclass):
 
         """
         c = self.suite[app][coll]
-        if related_index:
-            return c.query.get_all(self.id, index=related_index)
-        elif not related_key:
-            for k, v in c.document_class.specials.items():
-                if isinstance(v, ForeignKey) and v.app == self.application.slug and v.coll == self.collection.slug:
-                    related_key = k
-                    break
-            else:
-                raise KeyError("Cannot find any foreign keys to {0}/{1}".format(app, coll))
-
-        return c.filter(**{related_key: self.id})
+        qs = c.query
+        qs.query = c.reverse_query(self.collection, [self.id], related_key, related_index)
+        return qs
 
-    def raw_rel(self, app, coll, related_key=None):
+    def raw_rel(self, app, coll, related_key=None, related_index=None):
         """
         Reverse relation.  Get a raw query set of all documents in a collection that have foreign keys that point to this
             document.
@@ -422,6 +427,8 @@ class Document(MutableMapping, metaclass=DocumentMetaclass):
             coll (str): The slug of the collection to search for documents in.
             related_key (:obj:`str`, optional): The name of the key to search for this document in.
                 If none, defaults to the first matching foreign key element.
+            related_index (:obj:`str`, optional): The name of the index to search for this document in.
+                If none, defaults to the index on the foreign key.
 
         Returns:
             A sondra.collection.RawQuerySet object
@@ -432,15 +439,9 @@ class Document(MutableMapping, metaclass=DocumentMetaclass):
 
         """
         c = self.suite[app][coll]
-        if not related_key:
-            for k, v in c.document_class.specials.items():
-                if isinstance(v, ForeignKey) and v.app == self.application.slug and v.coll == self.collection.slug:
-                    related_key = k
-                    break
-            else:
-                raise KeyError("Cannot find any foreign keys to {0}/{1}".format(app, coll))
-
-        return c.raw_query.filter({related_key: self.id})
+        qs = c.raw_query
+        qs.query = c.reverse_query(self.collection, [self.id], related_key, related_index)
+        return qs
 
     def help(self, out=None, initial_heading_level=0):
         """Return full reStructuredText help for this class"""
@@ -1,5 +1,7 @@
+import threading
 from collections import OrderedDict
 from datetime import datetime
+
 from slugify import slugify
 
 
@@ -19,6 +21,25 @@ class DocumentProcessor(object):
     def run_before_delete(self, document):
         pass
 
+    def run_after_batch_delete(self, documents):
+        """Override this method to handle documents deleted in a single server-side operation.
+
+        By default this runs :meth:`run_before_delete` on each document, after the fact.
+
+        Args:
+            documents: the deleted documents, as they were before deletion.
+        """
+        for document in documents:
+            self.run_before_delete(document)
+
+    def run_before_patch(self, patch):
+        """Override this method to modify a partial update before it is sent to the server.
+
+        Args:
+            patch (dict): a nested dict of the properties being updated. Modify it in place.
+        """
+        pass
+
     def run_on_constructor(self, document):
         pass
 
@@ -32,21 +53,52 @@ class DocumentProcessor(object):
         pass
 
 
+_cascade = threading.local()
+
+
 class CascadingDelete(DocumentProcessor):
     """
     Cascades deletes from one document to a set of related documents.
+
+    Related documents are found for all deleted documents at once (see
+    :meth:`sondra.collection.Collection.reverse_query`) and deleted in a single operation. The related collection's
+    processors then run in batch form, so cascades continue down the graph. A document is only cascaded from once per delete, so cycles terminate.
     """
-    def __init__(self, app, coll, related_key=None):
+    def __init__(self, app, coll, related_key=None, related_index=None):
         self.app = app
         self.coll = coll
         self.related_key = related_key
+        self.related_index = related_index
 
     def run_before_delete(self, document):
         self.run(document)
 
-    def run(self, document):
-        document.rel(self.app, self.coll, related_key=self.related_key).drop()
+    def run_after_batch_delete(self, documents):
+        self.run_many(documents)
 
+    def run(self, document):
+        self.run_many([document])
+
+    def run_many(self, documents):
+        documents = [d for d in documents if d.id is not None]
+        if not documents:
+            return
+
+        parent = documents[0].collection
+        related = parent.suite[self.app][self.coll]
+
+        top = not hasattr(_cascade, 'visited')
+        if top:
+            _cascade.visited = set()
+        try:
+            ids = [d.id for d in documents if (parent.url, d.id) not in _cascade.visited]
+            _cascade.visited.update((parent.url, i) for i in ids)
+            if ids:
+                related.delete_query(related.reverse_query(parent, ids, self.related_key, self.related_index,
+                                                           table=related.table))
+        finally:
+            if top:
+                del _cascade.visited
 
 class CascadingOperation(DocumentProcessor):
     """
@@ -176,6 +228,9 @@ class TimestampOnUpdate(DocumentProcessor):
     def run_before_save(self, document):
         self.run(document)
 
+    def run_before_patch(self, patch):
+        patch[self.dest_prop] = datetime.utcnow()
+
     def run(self, document):
         document[self.dest_prop] = datetime.utcnow()
 
@@ -379,7 +379,7 @@ class DateTime(ValueHandler):
                 value.get('timezone', self.timezone),
             ).in_timezone(self.timezone)
         else:
-            return r.iso8601(value.isoformat(), default_timezone=self.DEFAULT_TIMEZONE).as_timezone(self.timezone)
+            return r.iso8601(value.isoformat(), default_timezone=self.DEFAULT_TIMEZONE).in_timezone(self.timezone)
 
     def to_json_repr(self, value, document, **kwargs):
         if value is None:
@@ -1,6 +1,78 @@
-from blinker import signal
+from blinker import ANY, signal
 
 pre_save = signal('document-pre-save')
 pre_delete = signal('document-pre-delete')
 post_save = signal('document-post-save')
-post_delete = signal('document-post-delete')
\ No newline at end of file
+post_delete = signal('document-post-delete')
+post_save_batch = signal('document-post-save-batch')
+post_delete_batch = signal('document-post-delete-batch')
+
+DEFERRABLE = (post_save, post_delete)
+_deferred = {s.name: {} for s in DEFERRABLE}
+
+
+def connect(sig, receiver=None, sender=ANY, deferred=False, name=None, **kwargs):
+    """Connect a receiver to a signal. Works as a decorator if the receiver is omitted.
+
+    Deferred receivers of ``post_save`` and ``post_delete`` are not called during the save or delete. In collections
+    with ``deferred_signals`` set, an event for each of them is written to the collection's outbox in the same query
+    as the write, and an :class:`sondra.collection.outbox.OutboxWorker` delivers it later, retrying failures. Events
+    for the same receiver and document are delivered in order. Deferred receivers are called with ``instance``, the
+    document as it was saved, or as it was before it was deleted.
+
+    Events name their receiver, by default by its module and qualified name, so that any process can deliver them.
+    Lambdas, nested functions and bound methods can share a qualified name, so give them an explicit ``name``.
+
+    Args:
+        sig (blinker.Signal): The signal.
+        receiver (callable): The receiver.
+        sender: Only receive the signal from this sender, usually a document class.
+        deferred (bool=False): Deliver the signal through the outbox.
+        name (str): The name events use for a deferred receiver. Defaults to :func:`receiver_name`
+        **kwargs: Passed to ``sig.connect``
+
+    Returns:
+        The receiver.
+
+    Raises:
+        ValueError: if another deferred receiver of the signal has the same name.
+    """
+    if receiver is None:
+        return lambda fn: connect(sig, fn, sender=sender, deferred=deferred, name=name, **kwargs)
+
+    if not deferred:
+        return sig.connect(receiver, sender=sender, **kwargs)
+    if sig.name not in _deferred:
+        raise ValueError("Only post_save and post_delete receivers can be deferred")
+
+    name = name or receiver_name(receiver)
+    connected = _deferred[sig.name].get(name)
+    if connected is not None and connected[0] != receiver:
+        raise ValueError("A different deferred receiver of {0} is already named {1}. Connect it with a unique "
+                         "name.".format(sig.name, name))
+    _deferred[sig.name][name] = (receiver, sender)
+    return receiver
+
+
+def disconnect(sig, receiver):
+    """Disconnect a receiver, deferred or not."""
+    deferred = _deferred.get(sig.name, {})
+    for name in [n for n, (r, _) in deferred.items() if r == receiver]:
+        del deferred[name]
+    sig.disconnect(receiver)
+
+
+def receiver_name(receiver):
+    """The default name of a deferred receiver: its module and qualified name."""
+    return '{0}.{1}'.format(receiver.__module__, getattr(receiver, '__qualname__', receiver.__name__))
+
+
+def deferred_receivers(sig, sender):
+    """The names of the deferred receivers of a signal for a sender."""
+    return [name for name, (_, s) in _deferred.get(sig.name, {}).items() if s is ANY or s is sender]
+
+
+def deferred_receiver(sig, name):
+    """A deferred receiver by name, or None if it is not connected in this process."""
+    receiver = _deferred.get(sig.name, {}).get(name)
+    return receiver[0] if receiver else None
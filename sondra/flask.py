@@ -8,6 +8,7 @@ import sys
 from jsonschema import ValidationError
 
 from .api import APIRequest
+from .utils import etag
 
 api_tree = Blueprint('api', __name__)
 
@@ -18,16 +19,29 @@ def init(app):
         CORS(api_tree, intercept_exceptions=True)
 
 
+@api_tree.record_once
+def setup_request_processors(state):
+    state.app.suite.setup_request_processors()
+
+
+@api_tree.teardown_request
+def release_connections(exc):
+    current_app.suite.release_connections()
+
+
 @api_tree.route('/schema')
 @api_tree.route(';schema')
 @api_tree.route(';format=schema')
 def suite_schema():
-    resp = Response(
-        json.dumps(current_app.suite.schema, indent=4),
-        status=200,
-        mimetype='application/json'
-    )
-    return resp
+    return schema_response(json.dumps(current_app.suite.schema, indent=4), 'application/json')
+
+
+def schema_response(body, mimetype):
+    """Respond with a schema, tagged so clients can revalidate their cached copies with If-None-Match."""
+    tag = etag(body)
+    if tag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers={'ETag': tag})
+    return Response(response=body, status=200, mimetype=mimetype, headers={'ETag': tag})
 
 @api_tree.route('/help')
 @api_tree.route(';help')
@@ -136,6 +150,8 @@ def api_request(path):
             r.validate()
 
             mimetype, response = r()
+            if r.reference.format == 'schema' and request.method == 'GET':
+                return schema_response(response, mimetype)
             resp = Response(
                 response=response,
                 status=200,
@@ -4,4 +4,5 @@ from .geojson import GeoJSON
 from .json import JSON
 from .html import HTML
 from .schema import Schema
-from .help import Help
\ No newline at end of file
+from .help import Help
+from .sse import ServerSentEvents
\ No newline at end of file
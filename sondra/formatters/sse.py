@@ -0,0 +1,64 @@
+import json
+import time
+
+from sondra.formatters.json import json_serial
+
+
+class ServerSentEvents(object):
+    """
+    This streams a changefeed as Server-Sent Events. Used when ;changes is a parameter on the last item of a URL.
+
+    Every change is sent as an event named for the change type, ``initial``, ``insert``, ``update``, ``delete``,
+    ``resumed`` or ``overflow``, whose data is a JSON object with the keys ``key``, ``old`` and ``new``. While there
+    are no changes, a comment line is sent every ``heartbeat`` seconds to keep proxies from closing the connection.
+
+    Event ids are server timestamps in milliseconds. RethinkDB cannot replay a changefeed, so a browser that reconnects
+    with ``Last-Event-ID`` is sent the current results as ``initial`` events before live changes.
+
+    Optional arguments:
+
+    * **bare_keys** (bool) - Sends bare foreign keys instead of URLs.
+    """
+    def __init__(self, heartbeat=15, retry=3000):
+        self.heartbeat = heartbeat
+        self.retry = retry
+
+    def __call__(self, reference, feed, **kwargs):
+        bare_keys = bool(kwargs.get('bare_keys', False))
+        return 'text/event-stream', self.stream(feed, bare_keys)
+
+    def event(self, change, bare_keys=False):
+        data = {
+            'key': change.key,
+            'old': change.old.json_repr(bare_keys=bare_keys) if change.old is not None else None,
+            'new': change.new.json_repr(bare_keys=bare_keys) if change.new is not None else None,
+        }
+        if change.error:
+            data['error'] = change.error
+
+        return "id: {id}\nevent: {type}\ndata: {data}\n\n".format(
+            id=int(time.time() * 1000),
+            type=change.type,
+            data=json.dumps(data, default=json_serial(bare_keys=bare_keys)))
+
+    def stream(self, feed, bare_keys=False):
+        yield "retry: {0}\n\n".format(self.retry)
+        try:
+            while True:
+                change = feed.poll(self.heartbeat)
+                yield ": heartbeat\n\n" if change is None else self.event(change, bare_keys)
+        except StopIteration:
+            return
+        finally:
+            feed.close()
+
+    async def astream(self, feed, bare_keys=False):
+        yield "retry: {0}\n\n".format(self.retry)
+        try:
+            while True:
+                change = await feed.apoll(self.heartbeat)
+                yield ": heartbeat\n\n" if change is None else self.event(change, bare_keys)
+        except StopAsyncIteration:
+            return
+        finally:
+            await feed.aclose()
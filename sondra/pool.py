@@ -0,0 +1,188 @@
+"""RethinkDB connection pooling.
+
+A RethinkDB connection is not safe to use from several threads at once, and a single connection serializes every
+query sent over it. A :class:`ConnectionPool` keeps a bounded set of connections and hands each thread its own.
+
+Most of Sondra runs queries with ``query.run(application.connection)``. ``application.connection`` is a
+:class:`PooledConnection`, which forwards to the connection checked out by the calling thread, checking one out on
+first use. Call :meth:`ConnectionPool.release_current` (or :meth:`sondra.suite.Suite.release_connections`) when the
+thread's unit of work, typically a request, is finished. A thread that exits without releasing its connection gives it
+back when its thread-local state is collected. To borrow a connection for a single operation instead::
+
+    with suite.connection_pools['default'].connection() as conn:
+        query.run(conn)
+"""
+import logging
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import rethinkdb as r
+
+
+class ConnectionPoolTimeout(Exception):
+    """Raised when no connection can be checked out of a pool before the checkout timeout."""
+
+
+class _Checkout(object):
+    """A thread's checked out connection. Gives the connection back to the pool if the thread exits holding it."""
+    def __init__(self, pool, conn):
+        self.conn = conn
+        self.release = weakref.finalize(self, pool.release, conn)
+        self.release.atexit = False
+
+
+class ConnectionPool(object):
+    """A thread-safe pool of RethinkDB connections.
+
+    Args:
+        name (str): The name of the connection in the suite's ``connection_config``.
+        min_size (int=1): The number of connections opened up front and kept open.
+        max_size (int=10): The most connections that will be open at once.
+        checkout_timeout (float=30): Seconds to wait for a connection when all of them are in use.
+        health_check_interval (float=30): Connections idle for longer than this are checked before being handed out,
+            and reconnected if they have failed.
+        **connect_kwargs: Passed to ``rethinkdb.connect``
+    """
+    def __init__(self, name, min_size=1, max_size=10, checkout_timeout=30, health_check_interval=30,
+                 **connect_kwargs):
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self.connect_kwargs = connect_kwargs
+        self.log = logging.getLogger(self.__class__.__name__ + '.' + name)
+
+        self._idle = []  # (connection, time returned to the pool)
+        self._size = 0
+        self._lock = threading.Condition()
+        self._local = threading.local()
+
+        for _ in range(self.min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def __len__(self):
+        return self._size
+
+    def _connect(self):
+        return r.connect(**self.connect_kwargs)
+
+    def _healthy(self, conn, idle_since):
+        if not conn.is_open():
+            return False
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            r.expr(True).run(conn)
+            return True
+        except r.ReqlDriverError:
+            return False
+
+    def _revive(self, conn, idle_since):
+        if self._healthy(conn, idle_since):
+            return conn
+
+        self.log.warning("Connection '{0}' failed a health check. Reconnecting.".format(self.name))
+        try:
+            return conn.reconnect(noreply_wait=False)
+        except r.ReqlDriverError:
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            raise
+
+    def acquire(self, timeout=None):
+        """Check a connection out of the pool.
+
+        Args:
+            timeout (float): Seconds to wait if all connections are in use. Defaults to ``checkout_timeout``.
+
+        Returns:
+            A RethinkDB connection, which must be given back with :meth:`release`.
+
+        Raises:
+            ConnectionPoolTimeout: if no connection became available in time.
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._lock.wait(remaining):
+                    raise ConnectionPoolTimeout(
+                        "No connection available in pool '{0}' after {1} seconds".format(self.name, timeout))
+
+            if self._idle:
+                conn, idle_since = self._idle.pop()
+            else:
+                conn, idle_since = None, None
+                self._size += 1
+
+        if conn is None:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                    self._lock.notify()
+                raise
+        else:
+            return self._revive(conn, idle_since)
+
+    def release(self, conn):
+        """Return a connection to the pool. Closed connections are discarded."""
+        with self._lock:
+            if conn.is_open():
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._size -= 1
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Borrow a connection for the duration of a ``with`` block."""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def current(self):
+        """The connection checked out by the calling thread, checking one out if there is none."""
+        checkout = getattr(self._local, 'checkout', None)
+        if checkout is None:
+            checkout = self._local.checkout = _Checkout(self, self.acquire())
+        return checkout.conn
+
+    def release_current(self):
+        """Return the calling thread's connection, if it has one, to the pool."""
+        checkout = getattr(self._local, 'checkout', None)
+        if checkout is not None:
+            del self._local.checkout
+            checkout.release()
+
+    def close(self):
+        """Close all idle connections. Connections that are checked out are closed when they are released."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _ in idle:
+            conn.close(noreply_wait=False)
+
+
+class PooledConnection(object):
+    """Stands in for a RethinkDB connection, forwarding to the connection the calling thread has checked out.
+
+    Pass it anywhere a connection is expected, e.g. ``query.run(application.connection)``.
+    """
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __getattr__(self, name):
+        return getattr(self.pool.current(), name)
+
+    def __repr__(self):
+        return '<PooledConnection {0}>'.format(self.pool.name)
@@ -1,3 +1,4 @@
+from collections import OrderedDict
 from collections.abc import Mapping
 from abc import ABCMeta
 from functools import partial
@@ -13,6 +14,10 @@ from jsonschema import Draft4Validator
 
 from sondra import help
 from sondra.api.ref import Reference
+from sondra.collection.outbox import OutboxWorker
+from sondra.collection.ttl import Sweeper
+from sondra.aio import AsyncConnectionPool
+from sondra.pool import ConnectionPool, PooledConnection
 from sondra.schema import merge
 from . import signals
 
@@ -153,8 +158,21 @@ class Suite(Mapping, metaclass=SuiteMetaclass):
         base_url (str): The base URL for the API. The Suite will be mounted off of here.
         base_url_scheme (str): http or https, automatically set.
         base_url_netloc (str): automatically set hostname of the suite.
-        connection_config (dict): For each key in connections setup keyword args to be passed to `rethinkdb.connect()`
-        connections (dict): RethinkDB connections for each key in ``connection_config``
+        connection_config (dict): For each key in connections setup keyword args to be passed to `rethinkdb.connect()`.
+            Keys of ``connection_pool_config`` may also be set here to configure a single pool. Applications and
+            collections name the connections they use in their ``connection``, ``read_connection`` and
+            ``write_connection`` attributes, so reads can be sent to a server near a secondary replica.
+        connection_pool_config (dict): Default ``min_size``, ``max_size``, ``checkout_timeout`` and
+            ``health_check_interval`` of each connection pool. See :class:`sondra.pool.ConnectionPool`.
+        connection_pools (dict): A :class:`sondra.pool.ConnectionPool` for each key in ``connection_config``
+        connections (dict): For each key in ``connection_config``, a connection that forwards to the one the calling
+            thread has checked out of the pool.
+        async_connection_pool_config (dict): Default ``size`` and ``max_in_flight`` of each asyncio connection pool.
+            See :class:`sondra.aio.AsyncConnectionPool`.
+        async_connection_pools (dict): The :class:`sondra.aio.AsyncConnectionPool` for each key in
+            ``connection_config`` that has been used from a coroutine.
+        reverse_relations (dict): ``(app, collection)`` slugs to a dict of the ``(app, collection)`` slugs of
+            collections that refer to it, to the names of the foreign key properties.
         docstring_processor_name (str): Any member of DOCSTRING_PROCESSORS: ``preformatted``, ``rst``, ``markdown``,
             ``google``, or ``numpy``.
         docstring_processor (callable): A ``lambda (str)`` that returns HTML for a docstring.
@@ -162,6 +180,9 @@ class Suite(Mapping, metaclass=SuiteMetaclass):
         log (logging.Logger): A logger object configured with the above dictconfig.
         cross_origin (bool=False): Allow cross origin API requests from the browser.
         db_prefix: (str=""): A default string to prepend to all the database names in this suite.
+        ttl_sweep_interval (float=60): Seconds between sweeps of expired documents by :meth:`start_sweeper`.
+        sweeper (Sweeper): The sweeper started by :meth:`start_sweeper`, or None.
+        outbox_worker (OutboxWorker): The worker started by :meth:`start_outbox_worker`, or None.
         schema (dict): The schema of a suite is a dict where the keys are the names of :class:`Application` objects
             registered to the suite. The values are the schemas of the named app.  See :class:`Application` for more
             details on application schemas.
@@ -182,8 +203,19 @@ class Suite(Mapping, metaclass=SuiteMetaclass):
     connection_config = {
         'default': {}
     }
+    connection_pool_config = {
+        'min_size': 1,
+        'max_size': 10,
+        'checkout_timeout': 30,
+        'health_check_interval': 30,
+    }
+    async_connection_pool_config = {
+        'size': 4,
+        'max_in_flight': 10000,
+    }
     working_directory = os.getcwd()
     db_prefix = ""
+    ttl_sweep_interval = 60
 
     @property
     def schema_url(self):
@@ -213,6 +245,7 @@ class Suite(Mapping, metaclass=SuiteMetaclass):
 
     def __init__(self, db_prefix=""):
         self.applications = {}
+        self.reverse_relations = {}
 
         self.db_prefix = db_prefix
 
@@ -227,7 +260,15 @@ class Suite(Mapping, metaclass=SuiteMetaclass):
 
         signals.pre_init.send(self.__class__, isntance=self)
 
-        self.connections = {name: r.connect(**kwargs) for name, kwargs in self.connection_config.items()}
+        self.connection_pools = {}
+        for name, kwargs in self.connection_config.items():
+            pool_kwargs = dict(self.connection_pool_config)
+            pool_kwargs.update(kwargs)
+            self.connection_pools[name] = ConnectionPool(name, **pool_kwargs)
+        self.connections = {name: PooledConnection(pool) for name, pool in self.connection_pools.items()}
+        self.async_connection_pools = {}
+        self.sweeper = None
+        self.outbox_worker = None
         for name in self.connections:
             self.log.info("Connection established to '{0}'".format(name))
 
@@ -249,6 +290,83 @@ class Suite(Mapping, metaclass=SuiteMetaclass):
         self.applications[app.slug] = app
         self.log.info('Registered application {0} to {1}'.format(app.__class__.__name__, app.url))
 
+    def setup_request_processors(self):
+        """Let each of the ``api_request_processors`` prepare for this suite. Call once the suite's applications are
+        created. The Flask blueprint and the ASGI application call it when they are set up."""
+        for p in self.api_request_processors:
+            setup = getattr(p, 'setup', None)
+            if setup is not None:
+                setup(self)
+
+    def release_connections(self):
+        """Return the connections checked out by the calling thread to their pools. Call at the end of a request."""
+        for pool in self.connection_pools.values():
+            pool.release_current()
+
+    def async_connection_pool(self, name='default'):
+        """The asyncio connection pool for a key in ``connection_config``, created on first use."""
+        if name not in self.async_connection_pools:
+            kwargs = dict(self.async_connection_pool_config)
+            kwargs.update((k, v) for k, v in self.connection_config[name].items()
+                          if k not in self.connection_pool_config)
+            self.async_connection_pools[name] = AsyncConnectionPool(name, **kwargs)
+        return self.async_connection_pools[name]
+
+    async def close_async_connections(self):
+        """Close the connections of every asyncio connection pool."""
+        for pool in self.async_connection_pools.values():
+            await pool.close()
+
+    def start_sweeper(self, interval=None, batch_size=None):
+        """Start deleting expired documents from every collection with a ``ttl_field`` in a background thread.
+
+        Args:
+            interval (float): Seconds between sweeps. Defaults to ``ttl_sweep_interval``.
+            batch_size (int): The most documents deleted per query. Defaults to each collection's ``ttl_sweep_batch``.
+
+        Returns:
+            Sweeper: see :mod:`sondra.collection.ttl`
+        """
+        if self.sweeper is None:
+            collections = [coll for app in self.values() for coll in app.values()]
+            self.sweeper = Sweeper(collections, interval or self.ttl_sweep_interval, batch_size).start()
+        return self.sweeper
+
+    def start_outbox_worker(self, workers=4, **kwargs):
+        """Start delivering deferred signals from every collection with ``deferred_signals`` in the background.
+
+        Args:
+            workers (int=4): The number of threads delivering events.
+            **kwargs: Passed to :class:`sondra.collection.outbox.OutboxWorker`
+
+        Returns:
+            OutboxWorker
+        """
+        if self.outbox_worker is None:
+            collections = [coll for app in self.values() for coll in app.values()]
+            self.outbox_worker = OutboxWorker(collections, workers=workers, **kwargs).start()
+        return self.outbox_worker
+
+    def register_relation(self, app, coll, related, related_key):
+        """Record that ``related_key`` in the ``related`` collection is a foreign key to ``app/coll``.
+
+        This is called automatically for every foreign key whenever an Application object is constructed."""
+        relations = self.reverse_relations.setdefault((app, coll), OrderedDict())
+        relations.setdefault((related.application.slug, related.slug), []).append(related_key)
+
+    def related_keys(self, target, related):
+        """The properties in the ``related`` collection that are foreign keys to the ``target`` collection.
+
+        Args:
+            target (Collection): The collection that is referred to.
+            related (Collection): The collection that holds the foreign keys.
+
+        Returns:
+            list: property names, possibly empty.
+        """
+        relations = self.reverse_relations.get((target.application.slug, target.slug), {})
+        return relations.get((related.application.slug, related.slug), [])
+
     def drop_database_objects(self):
         for app in self.values():
             app.drop_database()
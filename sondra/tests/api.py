@@ -5,7 +5,7 @@ from sondra.api.expose import expose_method
 from sondra.auth.decorators import authentication_required, authorization_required, authenticated_method, authorized_method
 from sondra.auth.request_processor import AuthRequestProcessor
 from sondra.document import ListHandler
-from sondra.document.processors import SlugPropertyProcessor
+from sondra.document.processors import SlugPropertyProcessor, TimestampOnCreate
 from sondra.document.schema_parser import ForeignKey, Geometry, DateTime, Now
 from sondra.file3 import FileUploadProcessor, LocalFileStorage
 from sondra.lazy import fk
@@ -169,6 +169,33 @@ class SimplePoint(document.Document):
     }
 
 
+class SyncedDocument(document.Document):
+    "A document that clients keep a replica of"
+    schema = S.object(
+        {
+            "name": S.string(),
+            "value": S.integer(default=0),
+            "created": S.datetime(),
+            "updated": S.datetime(),
+        },
+        required=["name"]
+    )
+    processors = (
+        TimestampOnCreate('created'),
+    )
+
+
+class ExpiringDocument(document.Document):
+    "A document that expires at a given time"
+    schema = S.object(
+        {
+            "name": S.string(),
+            "expires": S.number(),
+        },
+        required=["name"]
+    )
+
+
 class FileDocuments(collection.Collection):
     document_class = FileDocument
     primary_key = "slug"
@@ -236,6 +263,21 @@ class SimplePoints(collection.Collection):
     indexes = ("timestamp", "name", "geometry")
 
 
+class SyncedDocuments(collection.Collection):
+    "A collection that supports delta sync."
+
+    document_class = SyncedDocument
+    sync_field = "updated"
+    sync_lag = 0
+
+
+class ExpiringDocuments(collection.Collection):
+    "A collection whose documents are deleted once they expire."
+
+    document_class = ExpiringDocument
+    ttl_field = "expires"
+
+
 class ForeignKeyDocs(collection.Collection):
     "A collection of documents with foreign keys."
 
@@ -250,6 +292,8 @@ class SimpleApp(application.Application):
         SimplePoints,
         ForeignKeyDocs,
         FileDocuments,
+        SyncedDocuments,
+        ExpiringDocuments,
     )
 
     definitions = {
@@ -18,7 +18,9 @@ def test_app_collections(s):
     assert 'simple-documents' in s['simple-app']
     assert 'simple-points' in s['simple-app']
     assert 'foreign-key-docs' in s['simple-app']
-    assert len(s['simple-app']) == 4
+    assert 'synced-documents' in s['simple-app']
+    assert 'expiring-documents' in s['simple-app']
+    assert len(s['simple-app']) == 6
     assert all([isinstance(x, Collection) for x in s['simple-app'].values()])
 
     assert 'simple-documents' not in s['empty-app']
@@ -0,0 +1,84 @@
+import asyncio
+import json
+from urllib.parse import urlencode
+
+import pytest
+
+from sondra.asgi import ASGIApplication
+from sondra.suite import SuiteException
+from .api import *
+
+
+def _ignore_ex(f):
+    try:
+        f()
+    except SuiteException:
+        pass
+
+
+@pytest.fixture(scope='module')
+def app(request):
+    v = ConcreteSuite()
+    _ignore_ex(lambda: EmptyApp(v))
+    _ignore_ex(lambda: DerivedApp(v))
+    _ignore_ex(lambda: SimpleApp(v))
+    _ignore_ex(lambda: SimpleApp(v, "Alt"))
+    v.ensure_database_objects()
+    return ASGIApplication(v)
+
+
+def _call(app, method, path, query_string='', body=b''):
+    """Drive the ASGI app in-process and collect the response."""
+    sent = []
+    received = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+    async def receive():
+        return received.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': app.prefix + path,
+        'query_string': query_string.encode(),
+        'headers': [(b'content-type', b'application/json')],
+    }
+    asyncio.get_event_loop().run_until_complete(app(scope, receive, send))
+    status = sent[0]['status']
+    return status, b''.join(m.get('body', b'') for m in sent[1:])
+
+
+def test_asgi_schema(app):
+    status, body = _call(app, 'GET', ';schema')
+    assert status == 200
+    assert json.loads(body.decode())['title'] == app.suite.title
+
+    status, body = _call(app, 'GET', '/simple-app/simple-documents;schema')
+    assert status == 200
+    assert json.loads(body.decode())
+
+
+def test_asgi_add_get_delete_document(app):
+    status, body = _call(app, 'POST', '/simple-app/simple-documents', body=json.dumps({
+        'name': 'ASGI Document',
+        'value': 1,
+    }).encode())
+    assert status == 200
+    key = json.loads(body.decode())[0]
+
+    status, body = _call(app, 'GET', '/simple-app/simple-documents/' + key)
+    assert status == 200
+    assert json.loads(body.decode())['name'] == 'ASGI Document'
+
+    status, body = _call(app, 'GET', '/simple-app/simple-documents', query_string=urlencode({
+        'flt': json.dumps({'op': '==', 'lhs': 'name', 'rhs': 'ASGI Document'})}))
+    assert status == 200
+    assert len(json.loads(body.decode())) == 1
+
+    status, body = _call(app, 'DELETE', '/simple-app/simple-documents/' + key)
+    assert status == 200
+
+    status, body = _call(app, 'GET', '/simple-app/simple-documents/' + key)
+    assert status == 404
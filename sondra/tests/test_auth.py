@@ -1,4 +1,5 @@
-from sondra.auth import Auth, Credentials, User, Role
+from sondra.auth import Auth, AuthRequestProcessor, Credentials, User, Role
+from types import SimpleNamespace
 import pytest
 
 from sondra import suite
@@ -120,3 +121,133 @@ def test_renew(local_calvin):
         s['auth'].logout(token)
 
 
+
+
+def test_logged_in_users_legacy_expiry(local_calvin):
+    logins = s['auth']['logged-in-users']
+    token = s['auth'].login(local_calvin['username'], 'password')
+    try:
+        login = logins.for_token(token)
+        logins.table.get(login.id).replace(lambda doc: doc.without('exp').merge({'expires': 0}))\
+            .run(logins.write_connection)
+        assert logins.delete_expired_tokens() == 0
+
+        # the migration runs once, when the exp index is created, not at every startup
+        assert logins.ensure_indexes() == set()
+        assert 'exp' not in logins.table.get(login.id).run(logins.read_connection)
+        logins.table.index_drop('exp').run(logins.write_connection)
+        assert logins.ensure_indexes() == {'exp'}
+        migrated = logins.table.get(login.id).run(logins.read_connection)
+        assert migrated['exp'] == 0
+        assert 'expires' not in migrated
+
+        assert logins.delete_expired_tokens() == 1
+        assert logins.for_token(token) is None
+    finally:
+        s['auth'].logout(token)
+
+
+def test_token_cache(local_calvin):
+    auth = s['auth']
+    token = auth.login(local_calvin['username'], 'password')
+    try:
+        user, decoded = auth.check(token)
+        assert auth.token_cache.get(token) == (user.obj, decoded)
+
+        # every hit gets its own user document
+        cached, _ = auth.check(token)
+        assert cached is not user
+        cached['given_name'] = 'Changed'
+        assert auth.check(token)[0]['given_name'] != 'Changed'
+
+        # saving the user evicts their tokens
+        local_calvin['given_name'] = 'Cal'
+        local_calvin.save()
+        assert auth.token_cache.get(token) is None
+        assert auth.check(token)[0]['given_name'] == 'Cal'
+    finally:
+        auth.logout(token)
+
+    assert auth.token_cache.get(token) is None
+    with pytest.raises(PermissionError):
+        auth.check(token)
+
+
+def test_permission_index(local_calvin, role):
+    auth = s['auth']
+    assert auth.authorizes(local_calvin, auth['roles'], 'write')
+    assert not auth.authorizes(local_calvin, auth['users'], 'write')
+    assert local_calvin.id in auth.permission_cache
+
+    # adding a role to the user rebuilds their permissions
+    role['permissions'] = [{"application": "auth", "collection": "users", "allowed": ["write"]}]
+    role.save()
+    assert local_calvin.id not in auth.permission_cache
+    local_calvin['roles'] = local_calvin['roles'] + [role]
+    local_calvin.save()
+    assert auth.authorizes(local_calvin, auth['users'], 'write')
+    assert len(local_calvin.permissions()) == 2
+
+
+def test_request_processor_enforce_roles(local_calvin):
+    auth = s['auth']
+    token = auth.login(local_calvin['username'], 'password')
+
+    def write_users():
+        request = SimpleNamespace(
+            reference=SimpleNamespace(kind='collection', value=auth['users'], format='json', url=auth['users'].url),
+            api_arguments={'_auth': token}, headers={}, suite=s, request_method='POST',
+            additional_filters=[], document_authorizers=[])
+        return AuthRequestProcessor().process_api_request(request)
+
+    try:
+        # calvin's role grants nothing on users, which is only checked when roles are enforced
+        assert not auth.authorizes(local_calvin, auth['users'], 'write')
+        assert write_users().user.id == local_calvin.id
+
+        auth.enforce_roles = True
+        with pytest.raises(PermissionError):
+            write_users()
+    finally:
+        auth.enforce_roles = False
+        auth.logout(token)
+
+
+def test_permission_cache_bounds():
+    from sondra.auth.token_cache import PermissionCache
+    cache = PermissionCache(max_size=2, ttl=300)
+    for username in ('a', 'b', 'c'):
+        cache.put(username, username.upper())
+    assert len(cache) == 2
+    assert 'a' not in cache
+    assert cache.get('c') == 'C'
+
+    cache.ttl = 0
+    cache.put('d', 'D')
+    assert cache.get('d') is None
+
+
+def test_create_users_and_hasher():
+    from sondra.auth.hashing import HasherBusy, PasswordHasher
+    users = s['auth']['users']
+    users.create_users(*[
+        {'username': 'bulk{0}'.format(x), 'email': 'bulk{0}@nowhere.com'.format(x), 'password': 'password{0}'.format(x)}
+        for x in range(4)])
+    try:
+        token = s['auth'].login('bulk3', 'password3')
+        s['auth'].logout(token)
+        with pytest.raises(PermissionError):
+            s['auth'].login('bulk3', 'password2')
+    finally:
+        for x in range(4):
+            del s['auth']['user-credentials']['bulk{0}'.format(x)]
+            del users['bulk{0}'.format(x)]
+
+    hasher = PasswordHasher(max_workers=1, max_pending=1, admission_timeout=0.01)
+    try:
+        pending = hasher.submit('password', hasher.credentials('password')['salt'])
+        with pytest.raises(HasherBusy):
+            hasher.hash('password', '$2b$12$Ud1ikrg94Xq0n7nEILQLFu')
+        pending.result()
+    finally:
+        hasher.close()
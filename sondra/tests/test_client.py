@@ -0,0 +1,115 @@
+import pytest
+import json
+import requests
+
+from sondra.client import Client
+from sondra.client.replica import Replica
+from sondra.tests import api
+
+BASE_URL = api.ConcreteSuite.url
+
+
+def _url(*args):
+    return '/'.join((BASE_URL,) + args)
+
+
+@pytest.fixture(scope='module')
+def client(request):
+    return Client(api.ConcreteSuite(), BASE_URL)
+
+
+def test_schema_cache(tmpdir):
+    cached = Client(api.ConcreteSuite(), BASE_URL, schema_cache=str(tmpdir))
+    assert cached._schemas == {}
+
+    coll = cached['simple-app']['simple-documents']
+    assert coll.schema['primary_key'] == 'slug'
+    assert 'arg-test' in coll.methods
+    assert len(tmpdir.listdir()) == 3  # suite, application, collection
+
+    revalidated = Client(api.ConcreteSuite(), BASE_URL, schema_cache=str(tmpdir))
+    assert revalidated['simple-app']['simple-documents'].schema == coll.schema
+
+
+def test_replica_apply():
+    class RemoteCollection(object):
+        url = _url('simple-app/simple-documents')
+        schema = {'primary_key': 'slug'}
+
+    replica = Replica(RemoteCollection(), interval=None)
+    replica.apply({'checkpoint': 'a', 'documents': [{'slug': 'one', 'value': 1}, {'slug': 'two', 'value': 2}],
+                   'deleted': []})
+    assert replica.checkpoint == 'a'
+    assert replica.get('one') == {'slug': 'one', 'value': 1}
+    assert replica.filter(value=2) == [{'slug': 'two', 'value': 2}]
+
+    replica.apply({'checkpoint': 'b', 'documents': [], 'deleted': ['one']})
+    assert replica.checkpoint == 'b'
+    assert replica.get('one') is None
+    assert len(replica) == 1
+
+    replica.invalidate('two')
+    assert replica.stale
+    assert 'two' not in replica
+    replica.apply({'checkpoint': 'c', 'documents': [{'slug': 'two', 'value': 3}], 'deleted': []})
+    assert not replica.stale
+    assert replica.get('two') == {'slug': 'two', 'value': 3}
+    replica.close()
+
+
+def test_replicate(client):
+    synced_documents = _url('simple-app/synced-documents')
+    created = requests.post(synced_documents, data=json.dumps({"name": "Replicated", "value": 7}))
+    assert created.ok
+    key = created.json()[0]
+
+    try:
+        coll = client['simple-app']['synced-documents']
+        replica = coll.replicate(interval=None)
+        assert replica.get(key)['value'] == 7
+        assert [d.key for d in coll.query(name="Replicated")] == [key]
+
+        # writes through the client are queried from the server until they are pulled
+        coll[key] = {"name": "Replicated", "value": 8}
+        added = coll.append({"name": "Replicated", "value": 9})[0]
+        assert replica.stale
+        assert {d.key: d['value'] for d in coll.query(name="Replicated")} == {key: 8, added: 9}
+        assert coll[key]['value'] == 8
+
+        replica.pull()
+        assert not replica.stale
+        assert {d.key: d['value'] for d in coll.query(name="Replicated")} == {key: 8, added: 9}
+
+        requests.delete(synced_documents + '/' + key)
+        replica.pull()
+        assert key not in replica
+    finally:
+        requests.delete(synced_documents, params={'delete_all': True})
+
+
+def test_async_client():
+    import asyncio
+    from sondra.client.aio import AsyncClient
+
+    client = AsyncClient(api.ConcreteSuite(), BASE_URL, concurrency=4)
+    coll = client['simple-app']['simple-documents']
+
+    async def run():
+        keys = await coll.create_many([{'name': 'Async Client {0}'.format(x), 'value': x} for x in range(25)],
+                                      chunk_size=10)
+        try:
+            assert len(keys) == 25
+            docs = await coll.get_many(list(reversed(keys)), chunk_size=7)
+            assert [d['value'] for d in docs] == list(reversed(range(25)))
+            with pytest.raises(KeyError):
+                await coll.get_many(['no-such-document'])
+
+            results = await coll.map_method('simple_int_return', ({} for _ in range(10)), concurrency=3)
+            assert results == [{'_': 1}] * 10
+        finally:
+            await asyncio.gather(*[coll.delete(k) for k in keys])
+
+    try:
+        asyncio.get_event_loop().run_until_complete(run())
+    finally:
+        client.close()
@@ -1,8 +1,11 @@
+import json
 import pytest
+import rethinkdb as r
 
 from sondra.suite import SuiteException
 from .api import *
 from sondra.collection import Collection
+from sondra.exceptions import ValidationError
 
 def _ignore_ex(f):
     try:
@@ -81,4 +84,466 @@ def test_abstract_collection(s):
 def test_collection_help(s):
     assert s['simple-app']['simple-documents'].help()
     assert s['simple-app']['simple-points'].help()
-    assert s['simple-app']['foreign-key-docs'].help()
\ No newline at end of file
+    assert s['simple-app']['foreign-key-docs'].help()
+
+
+def test_collection_get_many(s):
+    coll = s['simple-app']['simple-documents']
+    docs = coll.create([{'name': 'Get Many {0}'.format(x)} for x in range(3)])
+    try:
+        keys = [d.id for d in reversed(docs)]
+        fetched = coll.get_many(keys)
+        assert [d.id for d in fetched] == keys
+        assert coll.get_many([]) == []
+        with pytest.raises(KeyError):
+            coll.get_many(keys + ['no-such-document'])
+    finally:
+        coll.delete(docs)
+
+
+def test_collection_apply(s):
+    from sondra.collection.operators import inc, set_if_absent
+    coll = s['simple-app']['simple-documents']
+    doc = coll.create({'name': 'Apply Operators'})
+    try:
+        assert coll.apply(doc.id, {'value': inc(2)})['value'] == 2
+        assert coll.apply(doc.id, {'value': inc(-1)})['value'] == 1
+        assert coll.apply(doc.id, {'defaultValue': set_if_absent('Ignored')})['defaultValue'] == 'Default Value 1'
+        with pytest.raises(ValidationError):
+            coll.apply(doc.id, {'value': 1})
+    finally:
+        coll.delete(doc)
+
+
+def test_collection_patch_many(s):
+    from sondra.collection.operators import inc
+    coll = s['simple-app']['simple-documents']
+    first, second = coll.create([{'name': 'Patch Many 1'}, {'name': 'Patch Many 2'}])
+    try:
+        ret = coll.patch_many({first.id: {'value': inc(1)}, second.id: {'value': inc(5), 'name': 'Patched'}})
+        assert ret['replaced'] == 2
+        assert coll[first.id]['value'] == 1
+        assert (coll[second.id]['value'], coll[second.id]['name']) == (5, 'Patched')
+        with pytest.raises(KeyError):
+            coll.patch_many({first.id: {'value': inc(1)}, 'no-such-document': {'value': inc(1)}})
+        assert coll[first.id]['value'] == 2
+    finally:
+        coll.delete([first, second])
+
+
+def test_collection_async(s):
+    import asyncio
+    coll = s['simple-app']['simple-documents']
+
+    async def roundtrip():
+        docs = [coll.doc({'name': 'Async {0}'.format(x)}) for x in range(3)]
+        await coll.asave(docs)
+        assert all(d.id for d in docs)
+        try:
+            fetched = await asyncio.gather(*[coll.aget(d.id) for d in docs])
+            assert [d.id for d in fetched] == [d.id for d in docs]
+            names = [d['name'] async for d in coll.query.filter({'name': 'Async 1'}).aiter()]
+            assert names == ['Async 1']
+        finally:
+            await coll.adelete(docs)
+        with pytest.raises(KeyError):
+            await coll.aget(docs[0].id)
+        await s.close_async_connections()
+
+    asyncio.get_event_loop().run_until_complete(roundtrip())
+
+
+def test_buffered_writer(s):
+    import threading
+    coll = s['simple-app']['simple-documents']
+
+    futures = []
+    with coll.buffered_writer(max_batch=7, max_delay_ms=10) as writer:
+        def produce(n):
+            for x in range(10):
+                futures.append(writer.save({'name': 'Buffered {0} {1}'.format(n, x)}))
+
+        producers = [threading.Thread(target=produce, args=(n,)) for n in range(4)]
+        for t in producers:
+            t.start()
+        for t in producers:
+            t.join()
+
+    keys = [f.result() for f in futures]
+    try:
+        assert len(set(keys)) == 40
+        assert len(coll.get_many(keys)) == 40
+        with pytest.raises(ValueError):
+            writer.save({'name': 'Too late'})
+    finally:
+        coll.delete(keys)
+
+
+def test_buffered_writer_errors(s):
+    from sondra.collection.buffered_writer import BufferedWriteError
+    coll = s['simple-app']['simple-documents']
+    existing = coll.create({'name': 'Existing'})
+
+    with coll.buffered_writer(max_batch=10, max_delay_ms=50) as writer:
+        duplicate = writer.save({'id': existing.id, 'name': 'Duplicate'})
+        fresh = [writer.save({'name': 'Fresh {0}'.format(x)}) for x in range(3)]
+
+    keys = [f.result() for f in fresh]
+    try:
+        with pytest.raises(BufferedWriteError):
+            duplicate.result()
+        assert len(coll.get_many(keys)) == 3
+        assert coll[existing.id]['name'] == 'Existing'
+    finally:
+        coll.delete(keys + [existing.id])
+
+
+def test_save_many(s):
+    coll = s['simple-app']['simple-documents']
+
+    def generate():
+        for x in range(25):
+            if x % 5:
+                yield {'name': 'Save Many {0}'.format(x)}
+            else:
+                yield {'id': 'save-many-{0}'.format(x), 'name': 'Save Many {0}'.format(x)}
+
+    results = list(coll.save_many(generate(), chunk_size=4, concurrency=2))
+    keys = [k for ret in results for k in ret['keys']]
+    try:
+        assert [ret['start'] for ret in results] == list(range(0, 25, 4))
+        assert sum(ret['inserted'] for ret in results) == 25
+        assert keys[10] == 'save-many-10'
+        assert coll[keys[11]]['name'] == 'Save Many 11'
+    finally:
+        coll.delete(keys)
+
+
+def test_collection_changes(s):
+    from sondra.collection.changes import Change
+    from sondra.collection.operators import inc
+    coll = s['simple-app']['simple-documents']
+    doc = coll.create({'name': 'Watched', 'value': 0})
+    try:
+        with coll.query.get_all(doc.id).changes(include_initial=True) as feed:
+            initial = next(feed)
+            assert initial.type == Change.INITIAL
+            assert initial.key == doc.id
+
+            coll.apply(doc.id, {'value': inc(1)})
+            update = next(feed)
+            assert update.type == Change.UPDATE
+            assert (update.old['value'], update.new['value']) == (0, 1)
+
+            coll.delete(doc.id)
+            delete = next(feed)
+            assert delete.type == Change.DELETE
+            assert delete.new is None
+    finally:
+        if doc.id in coll:
+            coll.delete(doc)
+
+
+def test_collection_changes_authorized(s):
+    from sondra.collection.changes import Change
+    coll = s['simple-app']['simple-documents']
+    hidden = coll.create({'name': 'Hidden', 'value': 0})
+    shown = coll.create({'name': 'Shown', 'value': 0})
+    authorize = lambda docs: [d for d in docs if d['name'] != 'Hidden']
+    try:
+        with coll.changes(coll.table.get_all(hidden.id, shown.id), include_initial=True, authorize=authorize) as feed:
+            initial = feed.poll(timeout=5)
+            assert initial.type == Change.INITIAL
+            assert initial.key == shown.id
+
+            hidden['value'] = 1
+            hidden.save()
+            shown['value'] = 1
+            shown.save()
+            change = feed.poll(timeout=5)
+            assert change.type == Change.UPDATE
+            assert change.key == shown.id
+
+            shown['name'] = 'Hidden'
+            shown.save()
+            change = feed.poll(timeout=5)
+            assert change.type == Change.DELETE
+            assert change.key == shown.id
+    finally:
+        coll.delete([hidden, shown])
+
+
+def test_collection_sync(s):
+    import time
+    coll = s['simple-app']['synced-documents']
+    kept, changed, dropped = coll.create([{'name': 'Kept'}, {'name': 'Changed'}, {'name': 'Dropped'}])
+    try:
+        time.sleep(0.1)
+        first = coll.sync()
+        assert set(first['inserted']) >= {kept.id, changed.id, dropped.id}
+        assert not first['more']
+
+        changed['value'] = 1
+        changed.save()
+        dropped.delete()
+        added = coll.create({'name': 'Added'})
+        time.sleep(0.1)
+
+        second = coll.sync(first['checkpoint'])
+        assert second['inserted'] == [added.id]
+        assert second['updated'] == [changed.id]
+        assert second['deleted'] == [dropped.id]
+        assert [d['value'] for d in second['documents'] if d.id == changed.id] == [1]
+
+        third = coll.sync(second['checkpoint'])
+        assert not (third['inserted'] or third['updated'] or third['deleted'])
+    finally:
+        coll.delete()
+
+
+def test_collection_sync_pages_within_one_timestamp(s):
+    import time
+    coll = s['simple-app']['synced-documents']
+    docs = coll.create([{'name': 'Bulk {0}'.format(i)} for i in range(5)])
+    try:
+        first = coll.sync()
+        coll.patch_query(coll.table, {'value': 1})  # stamps every document with the same time
+        time.sleep(0.1)
+
+        seen, checkpoint = [], first['checkpoint']
+        for _ in range(10):
+            page = coll.sync(checkpoint, limit=2)
+            seen.extend(page['updated'])
+            checkpoint = page['checkpoint']
+            if not page['more']:
+                break
+        assert sorted(seen) == sorted(d.id for d in docs)
+    finally:
+        coll.delete()
+
+
+def test_collection_sync_filters_deletes(s):
+    import time
+    coll = s['simple-app']['synced-documents']
+    mine, theirs = coll.create([{'name': 'Mine'}, {'name': 'Theirs'}])
+    try:
+        time.sleep(0.1)
+        first = coll.sync()
+        coll.delete([mine, theirs])
+        time.sleep(0.1)
+        delta = coll.sync(first['checkpoint'], filters=[{'name': 'Mine'}])
+        assert delta['deleted'] == [mine.id]
+    finally:
+        coll.delete()
+
+
+def test_collection_sync_backfill(s):
+    coll = s['simple-app']['synced-documents']
+    coll.table.insert({'id': 'unstamped', 'name': 'Unstamped'}).run(coll.write_connection)
+    try:
+        # documents are only stamped when sync is first enabled, not on every startup
+        assert coll.ensure_indexes() == set()
+        assert 'updated' not in coll.table.get('unstamped').run(coll.read_connection)
+
+        coll.table.index_drop(coll.sync_index).run(coll.write_connection)
+        assert coll.ensure_indexes() == {coll.sync_index}
+        assert 'updated' in coll.table.get('unstamped').run(coll.read_connection)
+    finally:
+        coll.delete()
+
+
+def test_collection_sync_authorized(s):
+    import time
+    coll = s['simple-app']['synced-documents']
+    authorize = lambda docs: [d for d in docs if d['name'] != 'Hidden']
+    shown, hidden = coll.create([{'name': 'Shown'}, {'name': 'Hidden'}])
+    try:
+        time.sleep(0.1)
+        first = coll.sync(authorize=authorize)
+        assert shown.id in first['inserted']
+        assert hidden.id not in first['inserted']
+        assert hidden.id not in [d.id for d in first['documents']]
+
+        shown['name'] = 'Hidden'
+        shown.save()
+        hidden.delete()
+        time.sleep(0.1)
+        delta = coll.sync(first['checkpoint'], authorize=authorize)
+        assert delta['deleted'] == [shown.id]
+        assert delta['documents'] == []
+    finally:
+        coll.delete()
+
+
+def test_collection_ttl(s):
+    import time
+    coll = s['simple-app']['expiring-documents']
+    now = time.time()
+    fresh, stale, forever = coll.create([
+        {'name': 'Fresh', 'expires': now + 3600},
+        {'name': 'Stale', 'expires': now - 1},
+        {'name': 'Forever'},
+    ])
+    try:
+        assert coll.expired(stale)
+        assert not coll.expired(fresh)
+        assert not coll.expired(forever)
+
+        assert stale.id not in coll
+        with pytest.raises(KeyError):
+            coll.get_many([fresh.id, stale.id])
+        assert {d.id for d in coll.q(coll.table)} == {fresh.id, forever.id}
+
+        assert coll.sweep_expired(batch_size=1) == 1
+        assert coll.table.get(stale.id).run(coll.application.connection) is None
+        assert coll.sweep_expired() == 0
+        assert coll.table.count().run(coll.application.connection) == 2
+    finally:
+        coll.delete()
+
+
+def test_index_filter(s):
+    from sondra.api.query_set import IndexFilter, QuerySet
+    coll = s['simple-app']['simple-documents']
+    coll.create([{'name': 'Indexed A', 'value': 1}, {'name': 'Indexed B', 'value': 2}, {'name': 'Indexed C', 'value': 3}])
+    try:
+        by_name = IndexFilter('name', 'Indexed A', 'Indexed B')
+        q = QuerySet(coll).get_query({}, filters=[by_name, r.row['value'] > 1])
+        assert 'get_all' in str(q)
+        assert [d['name'] for d in coll.q(q)] == ['Indexed B']
+
+        q = QuerySet(coll).get_query({'keys': json.dumps(['indexed-a', 'indexed-c'])}, filters=[by_name])
+        assert [d['name'] for d in coll.q(q)] == ['Indexed A']
+    finally:
+        coll.delete(['indexed-a', 'indexed-b', 'indexed-c'])
+
+
+def test_deferred_signals(s):
+    from sondra.collection.outbox import OutboxWorker
+    from sondra.document import signals as doc_signals
+
+    coll = s['simple-app']['simple-documents']
+    coll.deferred_signals = True
+    coll._create_outbox_table()
+    saved, deleted, failures = [], [], []
+
+    def on_save(sender, instance):
+        if failures:
+            raise RuntimeError(failures.pop())
+        saved.append(instance['value'])
+
+    def on_delete(sender, instance):
+        deleted.append(instance.id)
+
+    doc_signals.connect(doc_signals.post_save, on_save, sender=coll.document_class, deferred=True)
+    doc_signals.connect(doc_signals.post_delete, on_delete, sender=coll.document_class, deferred=True)
+    worker = OutboxWorker([coll], backoff=0)
+    try:
+        doc = coll.create({'name': 'Deferred', 'value': 1})
+        doc['value'] = 2
+        doc.save(conflict='replace')
+        assert saved == []
+        assert coll.outbox.count().run(coll.write_connection) == 2
+
+        failures.append('try again')
+        worker.drain()
+        assert saved == []
+        assert coll.outbox.filter({'attempts': 1}).count().run(coll.write_connection) == 1
+
+        worker.drain()
+        assert saved == [1, 2]
+
+        coll.delete([doc])
+        worker.drain()
+        assert deleted == [doc.id]
+        assert coll.outbox.count().run(coll.write_connection) == 0
+
+        first = lambda sender, instance: None
+        doc_signals.connect(doc_signals.post_save, first, deferred=True)
+        try:
+            with pytest.raises(ValueError):
+                doc_signals.connect(doc_signals.post_save, lambda sender, instance: None, deferred=True)
+        finally:
+            doc_signals.disconnect(doc_signals.post_save, first)
+
+        failures.extend(['dead'] * 2)
+        worker.max_attempts = 2
+        doc = coll.create({'name': 'Dead Letter', 'value': 3})
+        worker.drain()
+        worker.drain()
+        assert saved == [1, 2]
+        assert len(worker.failed(coll)) == 1
+        assert worker.requeue_failed(coll) == 1
+        worker.drain()
+        assert saved == [1, 2, 3]
+        assert worker.failed(coll) == []
+    finally:
+        doc_signals.disconnect(doc_signals.post_save, on_save)
+        doc_signals.disconnect(doc_signals.post_delete, on_delete)
+        r.db(coll.application.db).table_drop(coll.outbox_table_name).run(coll.write_connection)
+        del coll.deferred_signals
+        coll.delete(doc)
+
+
+def test_post_save_batch(s):
+    from sondra.document import signals as doc_signals
+
+    coll = s['simple-app']['simple-documents']
+    batches, singles = [], []
+
+    def on_batch(sender, docs):
+        batches.append([d['name'] for d in docs])
+
+    def on_save(sender, instance):
+        singles.append(instance['name'])
+
+    doc_signals.post_save_batch.connect(on_batch, sender=coll.document_class)
+    doc_signals.post_save.connect(on_save, sender=coll.document_class)
+    try:
+        coll.create([{'name': 'Batch A'}, {'name': 'Batch B'}])
+        assert batches == [['Batch A', 'Batch B']]
+        assert singles == ['Batch A', 'Batch B']
+    finally:
+        doc_signals.post_save_batch.disconnect(on_batch)
+        doc_signals.post_save.disconnect(on_save)
+        coll.delete(['batch-a', 'batch-b'])
+
+
+def test_signals_skipped_for_other_senders(s):
+    from unittest import mock
+    from sondra.document import signals as doc_signals
+
+    coll = s['simple-app']['simple-documents']
+    other = s['simple-app']['expiring-documents'].document_class
+    received = []
+
+    def on_save(sender, instance):
+        received.append(instance)
+
+    doc_signals.post_save.connect(on_save, sender=other)
+    try:
+        with mock.patch.object(doc_signals.post_save, 'send') as send:
+            doc = coll.create({'name': 'Unwatched'})
+            assert not send.called
+        assert received == []
+    finally:
+        doc_signals.post_save.disconnect(on_save)
+        coll.delete(doc)
+
+
+def test_bulk_writes_in_batches(s):
+    coll = s['simple-app']['simple-documents']
+    docs = coll.create([{'name': 'Bulk {0}'.format(x)} for x in range(5)])
+    selection = coll.table.get_all(*[d.id for d in docs])
+    coll.bulk_write_batch = 2
+    try:
+        ret = coll.patch_query(selection, {'value': 7}, return_changes=True)
+        assert ret['replaced'] == 5
+        assert len(ret['changes']) == 5
+
+        ret = coll.delete_query(selection, return_changes=True)
+        assert ret['deleted'] == 5
+        assert {c['old_val']['id'] for c in ret['changes']} == {d.id for d in docs}
+    finally:
+        del coll.bulk_write_batch
+        selection.delete().run(coll.write_connection)
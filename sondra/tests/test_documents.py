@@ -1,3 +1,4 @@
+import jsonschema
 import pytest
 
 from sondra.suite import SuiteException
@@ -118,6 +119,41 @@ def test_document_update(s, simple_document):
     assert updated['value'] == 1024
 
 
+def test_document_patch(s, simple_document):
+    updated = simple_document.update(value=2048)
+    assert updated['value'] == 2048
+    assert updated['name'] == simple_document['name']
+    assert simple_document['value'] == 2048
+    assert s['simple-app']['simple-documents'][simple_document.id]['value'] == 2048
+
+    with pytest.raises(jsonschema.ValidationError):
+        simple_document.update(value="not an integer")
+
+    with pytest.raises(KeyError):
+        s['simple-app']['simple-documents'].patch('no-such-document', {'value': 1})
+
+
+def test_document_patch_processors(s, simple_document):
+    from sondra.document import signals as doc_signals
+    coll = s['simple-app']['simple-documents']
+    coll.table.get(simple_document.id).replace(lambda d: d.without('slug')).run(coll.write_connection)
+
+    patched = []
+    receiver = lambda sender, key=None, **kwargs: patched.append(key)
+    doc_signals.pre_save.connect(receiver, sender=SimpleDocument)
+    try:
+        updated = simple_document.update({'name': 'Renamed Document', 'extra.a': 1, 'extra.b': 2})
+    finally:
+        doc_signals.pre_save.disconnect(receiver)
+    assert patched == [simple_document.id]
+    assert updated['slug'] == 'renamed-document'
+    assert coll[simple_document.id]['slug'] == 'renamed-document'
+
+    updated = simple_document.update({'extra.a': None})
+    assert updated['extra'] == {'b': 2}
+    assert coll[simple_document.id]['extra'] == {'b': 2}
+
+
 def test_foreign_key_doc_creation(s, foreign_key_document):
     single = foreign_key_document.fetch('simple_document')
     multiple = foreign_key_document.fetch('rest')
@@ -130,6 +166,26 @@ def test_foreign_key_doc_creation(s, foreign_key_document):
     assert all([isinstance(x, SimpleDocument) for x in foreign_key_document['rest']])
 
 
+
+def test_foreign_key_reverse_relation(s, simple_document, foreign_key_document):
+    fk_docs = s['simple-app']['foreign-key-docs']
+    assert {'simple_document', 'rest'} <= set(fk_docs.table.index_list().run(fk_docs.application.connection))
+
+    related = list(simple_document.rel('simple-app', 'foreign-key-docs'))
+    assert [d.id for d in related] == [foreign_key_document.id]
+
+    related = list(simple_document.rel('simple-app', 'foreign-key-docs', related_key='rest'))
+    assert [d.id for d in related] == [foreign_key_document.id]
+
+    # reverse relations are read with the collection's read mode
+    fk_docs.read_mode = 'outdated'
+    try:
+        related = simple_document.rel('simple-app', 'foreign-key-docs')
+        assert 'outdated' in str(related.query)
+        assert [d.id for d in related] == [foreign_key_document.id]
+    finally:
+        del fk_docs.read_mode
+
 def test_simple_point_creation(s, simple_point):
     assert simple_point['geometry']
 
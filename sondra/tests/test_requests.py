@@ -639,5 +639,96 @@ def test_flt__has_fields(docs):
     assert len(results) == 10  # should pick up the point at (0.0, 33.2) and (-10.1, 33.2)
 
 
+def test_flt__update_and_delete(docs):
+    simple_documents = _url('simple-app/simple-documents')
+    flt = json.dumps({"op": ">=", "lhs": "value", "rhs": 5})
+
+    unrestricted = requests.patch(simple_documents, data=json.dumps({"defaultValue": "Everything"}))
+    assert unrestricted.status_code == 403
+
+    patch = requests.patch(simple_documents, params={"flt": flt}, data=json.dumps({"defaultValue": "Patched"}))
+    assert patch.ok
+    assert patch.json()['replaced'] == 5
+
+    patched = requests.get(simple_documents, params={
+        "flt": json.dumps({"lhs": "defaultValue", "rhs": "Patched"})
+    })
+    assert len(patched.json()) == 5
+
+    delete = requests.delete(simple_documents, params={"flt": flt})
+    assert delete.ok
+    assert delete.json()['deleted'] == 5
+    assert len(requests.get(simple_documents).json()) == 5
+
+
+def test_read_mode(docs):
+    simple_documents = _url('simple-app/simple-documents')
+
+    outdated = requests.get(simple_documents + ';read_mode=outdated')
+    assert outdated.ok
+    assert len(outdated.json()) == 10
+
+    key = outdated.json()[0]['id']
+    doc = requests.get(_url('simple-app/simple-documents', key) + ';read_mode=majority')
+    assert doc.ok
+    assert doc.json()['id'] == key
+
+    assert not requests.get(simple_documents + ';read_mode=eventually').ok
+    assert not requests.delete(simple_documents + ';read_mode=outdated', params={'delete_all': True}).ok
+
+
+def test_changes(docs):
+    simple_documents = _url('simple-app/simple-documents')
+    flt = json.dumps({"op": "==", "lhs": "name", "rhs": "Streamed"})
+
+    feed = requests.get(simple_documents + ';changes', params={'flt': flt}, stream=True)
+    assert feed.ok
+    assert feed.headers['Content-Type'].startswith('text/event-stream')
+    lines = feed.iter_lines(decode_unicode=True)
+    assert next(lines).startswith('retry:')
+
+    assert requests.post(simple_documents, data=json.dumps({"name": "Ignored", "value": 100})).ok
+    assert requests.post(simple_documents, data=json.dumps({"name": "Streamed", "value": 101})).ok
+
+    event = {}
+    for line in lines:
+        if not line:
+            if event:
+                break
+            continue
+        k, _, v = line.partition(': ')
+        event[k] = v
+    feed.close()
+
+    assert event['event'] == 'insert'
+    assert json.loads(event['data'])['new']['value'] == 101
+
+    assert not requests.get(simple_documents + ';changes', params={'limit': 1}).ok
+
+
+def test_sync():
+    synced_documents = _url('simple-app/synced-documents')
+    assert requests.post(synced_documents, data=json.dumps({"name": "Synced"})).ok
+
+    ret = requests.get(synced_documents + ';sync')
+    assert ret.ok
+    ret = ret.json()
+    assert {'checkpoint', 'more', 'inserted', 'updated', 'deleted', 'documents'} <= set(ret)
+
+    assert requests.get(synced_documents + ';sync', params={'since': ret['checkpoint']}).ok
+    assert not requests.get(synced_documents + ';sync', params={'since': 'not a checkpoint'}).ok
+    assert not requests.get(_url('simple-app/simple-documents') + ';sync').ok
+    assert requests.delete(synced_documents, params={'delete_all': True}).ok
+
+def test_schema_etag():
+    schema_url = _url('simple-app/simple-documents;schema')
+    first = requests.get(schema_url)
+    assert first.ok
+    assert first.headers['ETag']
+
+    revalidated = requests.get(schema_url, headers={'If-None-Match': first.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert not revalidated.content
+
 def test_files():
     pass
\ No newline at end of file
@@ -52,4 +52,46 @@ def test_suite_schema(s):
 
 def test_help(s):
     """Make sure that the help method returns something, even in edge cases"""
-    assert isinstance(s.help(), str)
\ No newline at end of file
+    assert isinstance(s.help(), str)
+
+
+def test_connection_pool(s):
+    """Make sure each thread gets its own pooled connection and gives it back"""
+    import threading
+    from sondra.pool import ConnectionPoolTimeout
+
+    pool = s.connection_pools['default']
+    mine = pool.current()
+    assert s.connections['default'].is_open()
+
+    theirs = []
+    t = threading.Thread(target=lambda: (theirs.append(pool.current()), pool.release_current()))
+    t.start()
+    t.join()
+    assert theirs[0] is not mine
+
+    s.release_connections()
+    borrowed = [pool.acquire() for _ in range(pool.max_size)]
+    with pytest.raises(ConnectionPoolTimeout):
+        pool.acquire(timeout=0.1)
+    for conn in borrowed:
+        pool.release(conn)
+
+
+def test_connection_pool_thread_exit(s):
+    """Make sure threads that exit without releasing their connections give them back"""
+    import gc
+    import threading
+
+    pool = s.connection_pools['default']
+    s.release_connections()
+    threads = [threading.Thread(target=pool.current) for _ in range(pool.max_size + 2)]
+    for t in threads:
+        t.start()
+        t.join()
+    gc.collect()
+
+    assert len(pool) <= pool.max_size
+    borrowed = [pool.acquire(timeout=1) for _ in range(pool.max_size)]
+    for conn in borrowed:
+        pool.release(conn)
@@ -1,5 +1,6 @@
 import importlib
 import inspect
+import itertools
 import re
 from collections import OrderedDict
 from copy import deepcopy
@@ -230,4 +231,21 @@ def deprecated(func):
 def utc_timestamp():
     now = datetime.datetime.utcnow()
     return now.replace(tzinfo=pytz.utc)
-    
\ No newline at end of file
+    
+
+
+def chunks(iterable, size):
+    """Split an iterable into lists of at most ``size`` items, consuming it lazily."""
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def etag(body):
+    """A strong ETag for a response body."""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return '"' + hashlib.sha1(body).hexdigest() + '"'